@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+broker_pool.py
+Publishing to and subscribing from several MQTT brokers.
+
+One Mosquitto instance runs a single-threaded event loop, so one broker caps the
+ingest rate of the whole fleet. With a list of brokers (--broker host[:port],host[:port],...):
+
+  publishers  each device (sensor CN, or whole electrolyser with --shard-by el) is
+              assigned to one broker by consistent hashing (HashRing: 160 virtual nodes
+              per broker, MD5 of the key), so every process computes the same assignment
+              without coordination, and a series always travels through one broker.
+              BrokerPool watches the brokers: a broker whose clients have all been
+              disconnected for grace_s (5 s) leaves the ring and only its
+              devices move (reconnect to their new owner); a broker that answers a TCP
+              probe again (or one added with add_broker()) rejoins and takes its keys back.
+              QoS 1 messages still queued for a dead broker are lost with its
+              connection; consumers see them as sequence gaps.
+  consumers   MultiBrokerClient connects to every broker, subscribes to the same topics
+              on each and merges the streams into one on_message callback (called under
+              a lock, so handlers written for a single paho network thread stay correct).
+              Its publish() routes by topic through the same hash ring.
+
+make_mqtt_client() (plant_sim.py) returns a MultiBrokerClient when given several
+brokers, or a ShardedClient when given a BrokerPool and a shard key; with one broker
+nothing changes.
+
+Run (print the assignment of the plant's devices):
+  python3 clients/python/broker_pool.py --broker 127.0.0.1:8883,127.0.0.1:8884,127.0.0.1:8885
+"""
+
+import time
+import socket
+import bisect
+import hashlib
+import argparse
+from threading import Thread, Event, Lock, RLock
+
+from topic_alias import combined_stats
+
+
+def parse_brokers(spec, default_port=8883):
+    """'a,b:8884' or a list of strings / (host, port) -> [(host, port), ...]"""
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    brokers = []
+    for item in items:
+        if isinstance(item, tuple):
+            host, port = item
+        else:
+            host, sep, port = item.strip().rpartition(":")
+            if not sep or not port.isdigit():
+                host, port = item.strip(), default_port
+        broker = (host, int(port))
+        if broker not in brokers:
+            brokers.append(broker)
+    if not brokers:
+        raise ValueError("no broker given")
+    return brokers
+
+
+def broker_name(broker):
+    return f"{broker[0]}:{broker[1]}"
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes=(), vnodes=160):
+        self.vnodes = vnodes
+        self.points = []  # sorted hashes
+        self.owners = []  # node at the same index
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            h = _hash(f"{broker_name(node)}#{i}")
+            j = bisect.bisect(self.points, h)
+            self.points.insert(j, h)
+            self.owners.insert(j, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(h, n) for h, n in zip(self.points, self.owners) if n != node]
+        self.points = [h for h, _ in keep]
+        self.owners = [n for _, n in keep]
+
+    def owner(self, key):
+        if not self.points:
+            return None
+        j = bisect.bisect(self.points, _hash(key))
+        return self.owners[j if j < len(self.points) else 0]
+
+
+class ShardedClient:
+    """A device's publisher: a client connected to the broker that owns its key; moved on rebalance."""
+
+    def __init__(self, pool, key, factory):
+        self.__dict__.update(pool=pool, key=key, factory=factory, lock=Lock(), client=None, broker=None,
+                             retired=None, moves=0, down_since=None)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            self.__dict__[name] = value
+        else:
+            setattr(self.client, name, value)
+
+    def connect_to(self, broker):
+        client = self.factory(*broker)
+        with self.lock:
+            old, self.client, self.broker = self.client, client, broker
+            self.down_since = None
+        if old is not None:
+            self.moves += 1
+            try:
+                old.loop_stop()
+                old.disconnect()
+            except Exception:
+                pass
+            # only the replaced client's topic-alias counters are kept, not the client
+            retired = combined_stats([self.retired, old] if self.retired else [old])
+            if retired["clients"]:
+                self.retired = retired
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        return self.client.publish(topic, payload, qos=qos, retain=retain, **kwargs)
+
+    def connections(self):
+        """The current client plus the counters of those it replaced (topic-alias statistics survive a move)."""
+        return [self.client] + ([self.retired] if self.retired else [])
+
+    def loop_stop(self):
+        self.pool.release(self)
+        self.client.loop_stop()
+
+    def disconnect(self):
+        self.client.disconnect()
+
+
+class BrokerPool:
+    def __init__(self, brokers, vnodes=160, grace_s=5.0, check_s=1.0, probe_timeout=1.0):
+        self.brokers = list(brokers)
+        self.ring = HashRing(self.brokers, vnodes)
+        self.down = set()
+        self.grace_s = grace_s
+        self.check_s = check_s
+        self.probe_timeout = probe_timeout
+        self.lock = RLock()
+        self.clients = []
+        self.rebalances = 0
+        self.stop_event = Event()
+        self.thread = None
+
+    def owner(self, key):
+        with self.lock:
+            return self.ring.owner(key)
+
+    def client(self, key, factory):
+        """ShardedClient for key; factory(host, port) returns a connected client."""
+        sc = ShardedClient(self, key, factory)
+        while True:
+            broker = self.owner(key)
+            if broker is None:
+                raise ConnectionError(f"no broker reachable for {key}")
+            try:
+                sc.connect_to(broker)
+                break
+            except OSError as e:
+                print(f"[brokers] {broker_name(broker)} unreachable for {key}: {e}")
+                self.mark_down(broker, rebalance=False)
+        with self.lock:
+            self.clients.append(sc)
+        self.start()
+        return sc
+
+    def release(self, sc):
+        with self.lock:
+            if sc in self.clients:
+                self.clients.remove(sc)
+
+    def add_broker(self, broker):
+        with self.lock:
+            if broker not in self.brokers:
+                self.brokers.append(broker)
+            self.down.discard(broker)
+            self.ring.add(broker)
+        print(f"[brokers] {broker_name(broker)} joined")
+        self.rebalance()
+
+    def mark_down(self, broker, rebalance=True):
+        with self.lock:
+            if broker in self.down:
+                return
+            self.down.add(broker)
+            self.ring.remove(broker)
+        print(f"[brokers] {broker_name(broker)} left the ring")
+        if rebalance:
+            self.rebalance()
+
+    def rebalance(self):
+        """Move every device whose owner changed; returns the number moved."""
+        with self.lock:
+            moves = [(sc, self.ring.owner(sc.key)) for sc in self.clients]
+            moves = [(sc, b) for sc, b in moves if b is not None and b != sc.broker]
+            self.rebalances += 1
+        moved = 0
+        for sc, broker in moves:
+            try:
+                sc.connect_to(broker)
+                moved += 1
+            except OSError as e:
+                print(f"[brokers] moving {sc.key} to {broker_name(broker)} failed: {e}")
+                self.mark_down(broker, rebalance=False)
+        if moves:
+            print(f"[brokers] rebalanced: {moved} of {len(self.clients)} devices moved, "
+                  f"{len(self.ring.nodes)} brokers in the ring")
+        return moved
+
+    def probe(self, broker):
+        try:
+            socket.create_connection(broker, timeout=self.probe_timeout).close()
+            return True
+        except OSError:
+            return False
+
+    def check(self, now=None):
+        """One health pass: drop brokers whose devices all lost their connection, re-add reachable ones."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            by_broker = {}
+            for sc in self.clients:
+                connected = sc.client.is_connected()
+                if connected:
+                    sc.down_since = None
+                elif sc.down_since is None:
+                    sc.down_since = now
+                by_broker.setdefault(sc.broker, []).append(sc)
+            dead = [b for b, scs in by_broker.items() if b not in self.down and
+                    all(sc.down_since is not None and now - sc.down_since >= self.grace_s for sc in scs)]
+            down = list(self.down)
+        for broker in dead:
+            self.mark_down(broker, rebalance=False)
+        back = [b for b in down if self.probe(b)]
+        for broker in back:
+            with self.lock:
+                self.down.discard(broker)
+                self.ring.add(broker)
+            print(f"[brokers] {broker_name(broker)} reachable again")
+        if dead or back:
+            self.rebalance()
+
+    def start(self):
+        if self.thread is None and len(self.brokers) > 1:
+            self.thread = Thread(target=self._monitor, name="broker-pool", daemon=True)
+            self.thread.start()
+
+    def _monitor(self):
+        while not self.stop_event.wait(self.check_s):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[brokers] health check failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def assignment(self):
+        with self.lock:
+            return {sc.key: broker_name(sc.broker) for sc in self.clients}
+
+
+class MultiBrokerClient:
+    """Consumer side: one client per broker, streams merged into one on_message."""
+
+    def __init__(self, brokers, factory, vnodes=160):
+        self.__dict__.update(clients={}, ring=HashRing(brokers, vnodes), lock=Lock(), user_on_message=None)
+        for broker in brokers:
+            try:
+                c = factory(*broker)
+            except OSError as e:
+                print(f"[brokers] {broker_name(broker)} unreachable: {e}")
+                continue
+            c.on_message = self._on_message
+            self.clients[broker] = c
+        if not self.clients:
+            raise ConnectionError("no broker reachable")
+
+    def __getattr__(self, name):
+        return getattr(next(iter(self.clients.values())), name)
+
+    def __setattr__(self, name, value):
+        if name == "on_message":
+            self.__dict__["user_on_message"] = value
+        elif name in self.__dict__:
+            self.__dict__[name] = value
+        else:
+            for c in self.clients.values():
+                setattr(c, name, value)
+
+    def _on_message(self, client, userdata, msg):
+        if self.user_on_message:
+            with self.lock:
+                self.user_on_message(client, userdata, msg)
+
+    def subscribe(self, *args, **kwargs):
+        return [c.subscribe(*args, **kwargs) for c in self.clients.values()]
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        c = self.clients.get(self.ring.owner(topic)) or next(iter(self.clients.values()))
+        return c.publish(topic, payload, qos=qos, retain=retain, **kwargs)
+
+    def connections(self):
+        return list(self.clients.values())
+
+    def is_connected(self):
+        return any(c.is_connected() for c in self.clients.values())
+
+    def loop_stop(self):
+        for c in self.clients.values():
+            c.loop_stop()
+
+    def disconnect(self):
+        for c in self.clients.values():
+            c.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1:8883,127.0.0.1:8884", help="comma-separated host[:port] list")
+    parser.add_argument("--shard-by", choices=("sensor", "el"), default="sensor", help="unit of assignment")
+    parser.add_argument("--drop", default=None, metavar="HOST:PORT", help="also show the assignment without this broker")
+    args = parser.parse_args()
+
+    from plant_sim import SENSOR_TOPICS, sensor_cn
+
+    brokers = parse_brokers(args.broker)
+    keys = [f"sensor-plant-A-irradiance_{i}" for i in (1, 2)]
+    for el in ("EL1", "EL2"):
+        keys += [sensor_cn(el, s) for s in SENSOR_TOPICS] if args.shard_by == "sensor" else [el]
+    ring = HashRing(brokers)
+    before = {k: ring.owner(k) for k in keys}
+    counts = {b: sum(1 for o in before.values() if o == b) for b in brokers}
+    for b, n in counts.items():
+        print(f"{broker_name(b)}: {n} devices")
+    if args.drop:
+        ring.remove(parse_brokers(args.drop)[0])
+        after = {k: ring.owner(k) for k in keys}
+        moved = [k for k in keys if after[k] != before[k]]
+        print(f"without {args.drop}: {len(moved)} of {len(keys)} devices move")
+    for k in keys:
+        print(f"  {k} -> {broker_name(before[k])}")
+
+if __name__ == "__main__":
+    main()
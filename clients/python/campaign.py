@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+campaign.py
+Monte Carlo fault campaigns: many headless plant simulations in parallel, written
+out as labeled columnar datasets for training and benchmarking fault detectors.
+
+A scenario file (JSON, see scenarios/fault_campaign.json) describes the runs:
+
+  {"name": "mixed", "runs": 16, "seed": 42, "duration_s": 300,
+   "physics_dt": 0.01, "dt": 1.0, "sensor_rates": {"stack_current": 10}, "stack_model": "linear",
+   "injections": [
+     {"el": "EL1", "fault": "gas_crossover", "start": [30, 120], "duration": [20, 60], "severity": [0.5, 1.5]},
+     {"el": ["EL1", "EL2"], "fault": "random", "start": [150, 250], "duration": 30, "probability": 0.5}]}
+
+Numbers may be given as [lo, hi] (drawn uniformly per run), "el"/"fault" as a list
+(one drawn per run, "random" = any fault), "probability" makes an injection optional.
+Every run has its own seed (derived from "seed" and the run index, or listed in
+"seeds"), which drives both the scenario draws and the simulator's noise, so a run
+is reproducible from the manifest alone.
+
+Runs are headless: PlantSimulator with capture clients instead of MQTT, driven by
+MultiRateScheduler on a virtual clock (as fast as the CPU allows). Each run writes
+run_NNNN.elc with one row per published sample:
+
+  t       float64  sample timestamp (start_time + sim seconds)
+  series  uint16   index into header["series"] ("EL1/stack/current", "irradiance/1", "EL1/status", ...)
+  value   float64  reading (status: 1.0 = TRIPPED)
+  seq     uint32   sequence_id
+  label   uint32   ground truth: bit (1 << fault id) set for every fault active on that
+                   EL when the sample was taken (plant_sim.FAULT_NAMES ids). An
+                   injection acts on the physics steps in [start, end), so it shows
+                   in the samples taken in (start, end].
+
+.elc layout: b"ELCOLS01", uint32 header length, JSON header (columns with offset,
+length, type and codec, series names, fault bits, run metadata), then each column
+as a little-endian array, zlib-compressed by default. read_columns() loads only the
+requested columns; with numpy, np.frombuffer() on the decoded bytes is zero-copy.
+
+Run:
+  python3 clients/python/campaign.py scenarios/fault_campaign.json --out datasets/mixed --jobs 4
+  python3 clients/python/campaign.py --inspect datasets/mixed/run_0000.elc
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import random
+import pathlib
+import argparse
+from array import array
+from threading import Event
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MAGIC = b"ELCOLS01"
+COLUMNS = (("t", "d"), ("series", "H"), ("value", "d"), ("seq", "I"), ("label", "I"))
+TOPIC_PREFIX = "electrolyser/plant-A/"
+
+
+# --- columnar format ---
+def write_columns(path, columns, header, codec="zlib"):
+    """columns: list of (name, array); header: extra JSON metadata stored with them."""
+    blobs, meta, offset = [], [], 0
+    for name, arr in columns:
+        if sys.byteorder == "big":
+            arr = array(arr.typecode, arr)
+            arr.byteswap()
+        raw = arr.tobytes()
+        blob = zlib.compress(raw, 6) if codec == "zlib" else raw
+        meta.append({"name": name, "type": arr.typecode, "itemsize": arr.itemsize, "rows": len(arr),
+                     "codec": codec, "offset": offset, "length": len(blob)})
+        blobs.append(blob)
+        offset += len(blob)
+    head = json.dumps({**header, "version": 1, "columns": meta}).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(head)))
+        f.write(head)
+        for blob in blobs:
+            f.write(blob)
+    return len(MAGIC) + 4 + len(head) + offset
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not an .elc column file")
+    (n,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(n))
+    return header, len(MAGIC) + 4 + n
+
+
+def read_columns(path, names=None):
+    """Returns (header, {name: array}) for the requested columns (all if names is None)."""
+    out = {}
+    with open(path, "rb") as f:
+        header, base = read_header(f)
+        for col in header["columns"]:
+            if names is not None and col["name"] not in names:
+                continue
+            f.seek(base + col["offset"])
+            blob = f.read(col["length"])
+            arr = array(col["type"])
+            if arr.itemsize != col["itemsize"]:
+                raise ValueError(f"column {col['name']}: itemsize {col['itemsize']} unsupported here")
+            arr.frombytes(zlib.decompress(blob) if col["codec"] == "zlib" else blob)
+            if sys.byteorder == "big":
+                arr.byteswap()
+            out[col["name"]] = arr
+    return header, out
+
+
+# --- scenario ---
+def draw(rng, spec, default=None):
+    if spec is None:
+        return default
+    if isinstance(spec, list) and len(spec) == 2 and all(isinstance(x, (int, float)) for x in spec):
+        return rng.uniform(spec[0], spec[1])
+    return spec
+
+
+def realize(scenario, index, fault_names):
+    """Concrete seed and injection list for run `index`."""
+    seeds = scenario.get("seeds")
+    seed = seeds[index] if seeds else random.Random(f"{scenario.get('seed', 0)}/{index}").getrandbits(32)
+    rng = random.Random(seed)
+    injections = []
+    for spec in scenario.get("injections", []):
+        if rng.random() >= spec.get("probability", 1.0):
+            continue
+        el = spec.get("el", "EL1")
+        el = rng.choice(el) if isinstance(el, list) else el
+        fault = spec["fault"]
+        if fault == "random":
+            fault = rng.choice(fault_names)
+        elif isinstance(fault, list):
+            fault = rng.choice(fault)
+        start = float(draw(rng, spec.get("start"), 0.0))
+        duration = float(draw(rng, spec.get("duration"), scenario["duration_s"]))
+        injections.append({"el": el, "fault": fault, "start": round(start, 3),
+                           "end": round(start + duration, 3),
+                           "severity": round(float(draw(rng, spec.get("severity"), 1.0)), 4)})
+    return seed, injections
+
+
+class Capture:
+    """Stands in for a device's MQTT client and appends each published sample to the columns."""
+
+    def __init__(self, recorder, labels_key):
+        self.recorder = recorder
+        self.labels_key = labels_key
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.recorder.add(topic, json.loads(payload), self.labels_key)
+
+
+class Recorder:
+    def __init__(self):
+        self.cols = {name: array(tc) for name, tc in COLUMNS}
+        self.series = {}
+        self.labels = {}  # EL (or "PLANT") -> current fault bitmask
+
+    def add(self, topic, p, labels_key):
+        name = topic[len(TOPIC_PREFIX):] if topic.startswith(TOPIC_PREFIX) else topic
+        idx = self.series.get(name)
+        if idx is None:
+            idx = self.series[name] = len(self.series)
+        value = p.get("value")
+        if value is None:
+            value = 1.0 if p.get("status") == "TRIPPED" else 0.0
+        c = self.cols
+        c["t"].append(p["timestamp"])
+        c["series"].append(idx)
+        c["value"].append(value)
+        c["seq"].append(p.get("sequence_id", 0))
+        c["label"].append(self.labels.get(labels_key, 0))
+
+
+def run_one(scenario, index, out_dir):
+    """Simulate one run and write its .elc file; returns the manifest entry."""
+    import plant_sim as ps
+    from scheduler import VirtualClock
+
+    fault_names = [n for n in ps.FAULT_NAMES if n != "none"]
+    seed, injections = realize(scenario, index, fault_names)
+    random.seed(seed)
+    t0 = time.perf_counter()
+
+    sim = ps.PlantSimulator(dt=scenario.get("dt", 1.0), physics_dt=scenario.get("physics_dt", 0.01),
+                            sensor_rates=scenario.get("sensor_rates"),
+                            stack_model=scenario.get("stack_model", "linear"),
+                            cell_area_cm2=scenario.get("cell_area_cm2", 1.0), topic_aliases=False)
+    rec = Recorder()
+    for el in sim.electrolysers.values():
+        el.fault_injector.verbose = False
+        cap = Capture(rec, el.el)
+        for sensor in ps.SENSOR_TOPICS:
+            el.clients[ps.sensor_cn(el.el, sensor)] = cap
+        el.clients["monitor-local"] = cap
+    sim.irr_clients = {i: Capture(rec, "PLANT") for i in (1, 2)}
+
+    clock = VirtualClock()
+    sched = sim.build_scheduler()
+    sched.clock, sched.sleep = clock, clock.sleep
+    start_time = scenario.get("start_time", 1700000000.0)
+    sched.wall_clock = lambda: start_time
+
+    duration = scenario["duration_s"]
+    stop = Event()
+    pending = sorted(injections, key=lambda inj: inj["start"])
+    running = []
+    drift_bit = 1 << ps.FAULT_IRRADIANCE_DRIFT
+    state = {"t": 0.0}
+
+    def relabel():
+        for el in sim.electrolysers.values():
+            rec.labels[el.el] = sum(1 << f for f in el.fault_injector.snapshot())
+        # irradiance samples carry the plant-wide drift fault (driven by EL1's injector)
+        rec.labels["PLANT"] = rec.labels["EL1"] & drift_bit
+
+    def step(dt):
+        t = state["t"]
+        changed = False
+        while pending and pending[0]["start"] <= t:
+            inj = pending.pop(0)
+            targets = sim.electrolysers.values() if inj["el"] == "PLANT" else [sim.electrolysers[inj["el"]]]
+            for el in targets:
+                el.fault_injector.set_fault(inj["fault"], True, inj["severity"])
+            running.append((inj, targets))
+            changed = True
+        for item in [r for r in running if r[0]["end"] <= t]:
+            running.remove(item)
+            for el in item[1]:
+                el.fault_injector.set_fault(item[0]["fault"], False)
+            changed = True
+        if changed:
+            relabel()
+        sim.step(dt)
+        state["t"] = t + dt
+        if state["t"] >= duration:
+            stop.set()
+
+    relabel()
+    sched.run(step, stop)
+
+    path = pathlib.Path(out_dir) / f"run_{index:04d}.elc"
+    series = [name for name, _ in sorted(rec.series.items(), key=lambda kv: kv[1])]
+    header = {"run": index, "seed": seed, "injections": injections, "series": series,
+              "faults": {n: ps.FAULT_NAMES[n] for n in fault_names},
+              "scenario": scenario.get("name"), "start_time": start_time, "duration_s": duration}
+    size = write_columns(path, [(name, rec.cols[name]) for name, _ in COLUMNS], header,
+                         codec=scenario.get("codec", "zlib"))
+    labels = rec.cols["label"]
+    return {"run": index, "file": path.name, "seed": seed, "injections": injections,
+            "rows": len(labels), "labeled_rows": sum(1 for x in labels if x), "bytes": size,
+            "sim_s": duration, "cpu_s": round(time.perf_counter() - t0, 3)}
+
+
+def run_campaign(scenario, out_dir, jobs=None):
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    runs = len(scenario["seeds"]) if scenario.get("seeds") else scenario.get("runs", 1)
+    results = []
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_one, scenario, i, str(out)) for i in range(runs)]
+        for fut in as_completed(futures):
+            r = fut.result()
+            results.append(r)
+            print(f"run {r['run']:4d}: {r['rows']} rows ({r['labeled_rows']} labeled), "
+                  f"{r['bytes'] / 1024:.1f} KiB, {r['cpu_s']:.2f} s, "
+                  f"{', '.join(i['el'] + ':' + i['fault'] for i in r['injections']) or 'no faults'}")
+    results.sort(key=lambda r: r["run"])
+    manifest = {"scenario": scenario, "created": time.time(), "wall_s": round(time.time() - t0, 3),
+                "columns": [name for name, _ in COLUMNS], "runs": results}
+    with open(out / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def inspect(path):
+    header, cols = read_columns(path)
+    print(f"{path}: run {header['run']} seed {header['seed']}, {len(cols['t'])} rows, "
+          f"{len(header['series'])} series")
+    for inj in header["injections"]:
+        print(f"  {inj['el']} {inj['fault']} {inj['start']:.1f}-{inj['end']:.1f} s severity {inj['severity']}")
+    counts = {}
+    for mask in cols["label"]:
+        counts[mask] = counts.get(mask, 0) + 1
+    names = {v: k for k, v in header["faults"].items()}
+    for mask, n in sorted(counts.items()):
+        faults = [names[b] for b in names if mask & (1 << b)] or ["normal"]
+        print(f"  {'+'.join(faults):<40}{n:>9} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenario", nargs="?", help="scenario JSON file")
+    parser.add_argument("--out", default="datasets/campaign", help="output directory (.elc files + manifest.json)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--runs", type=int, default=None, help="override the scenario's run count")
+    parser.add_argument("--inspect", metavar="FILE", help="print a summary of one .elc file and exit")
+    args = parser.parse_args()
+
+    if args.inspect:
+        inspect(args.inspect)
+        return
+    if not args.scenario:
+        parser.error("scenario file required")
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+    if args.runs is not None:
+        scenario["runs"] = args.runs
+        scenario.pop("seeds", None)
+    manifest = run_campaign(scenario, args.out, args.jobs)
+    rows = sum(r["rows"] for r in manifest["runs"])
+    size = sum(r["bytes"] for r in manifest["runs"])
+    print(f"{len(manifest['runs'])} runs, {rows} rows, {size / 1024:.1f} KiB in {manifest['wall_s']:.1f} s "
+          f"-> {os.path.join(args.out, 'manifest.json')}")
+
+if __name__ == "__main__":
+    main()
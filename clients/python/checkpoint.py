@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+checkpoint.py
+Periodic checkpoints of the plant simulator state, for warm restarts.
+
+Without a checkpoint every restart re-randomizes the twins (U_rev, R_ohm, ...), empties
+the tanks to ambient pressure, resets the irradiance phase and starts all sequence ids
+at 0 again, which consumers see as a counter reset. A checkpoint holds everything
+PlantSimulator.get_state() returns:
+  - plant: irradiance phase t, last irradiance values, irradiance sequence counters,
+    state of the global random generator (the simulator's noise source), node pressures
+    of the plant gas network (headers, buffers, storage; see gas_network.py)
+  - per twin: stack parameters, electrical/thermal/flow state, tank inventory,
+    sequence counters, trip state, fault timer, active faults with their severities
+    and the KPI running totals
+
+Layout: b"ELCKPT01", uint32 body length, uint32 CRC-32 of the body, then the state
+as zlib-compressed JSON (a few kB). Files are written to <path>.tmp and renamed, so
+a crash mid-write leaves the previous checkpoint in place.
+
+Checkpointer takes a snapshot on the simulator thread (dicts of plain values, tens of
+microseconds) and encodes/writes it on a background thread, so the physics loop never
+waits on the disk; if a write is still in progress the next snapshot replaces the
+queued one. On a clean shutdown a final checkpoint is written synchronously.
+
+Sequence ids continue across a restart. After a crash the checkpoint is up to one
+interval old, so ids published since then would be reused; resume() therefore
+advances every counter by the number of samples the publish rate allows between
+the checkpoint and the restart (consumers see a gap covering the downtime, never
+duplicates).
+
+Run (via plant_sim.py):
+  python3 clients/python/plant_sim.py --checkpoint state/plant.ckpt --checkpoint-interval 10
+  python3 clients/python/checkpoint.py --inspect state/plant.ckpt
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import argparse
+from threading import Thread, Condition
+
+MAGIC = b"ELCKPT01"
+VERSION = 1
+
+
+def encode(state):
+    body = zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 6)
+    return MAGIC + struct.pack("<II", len(body), zlib.crc32(body)) + body
+
+
+def decode(data):
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a plant checkpoint")
+    n, crc = struct.unpack_from("<II", data, len(MAGIC))
+    body = data[len(MAGIC) + 8:len(MAGIC) + 8 + n]
+    if len(body) != n or zlib.crc32(body) != crc:
+        raise ValueError("checkpoint is truncated or corrupt")
+    state = json.loads(zlib.decompress(body))
+    if state.get("version") != VERSION:
+        raise ValueError(f"unsupported checkpoint version {state.get('version')!r}")
+    return state
+
+
+def save(state, path):
+    """Atomically replace path with the encoded state; returns the file size."""
+    data = encode(state)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def resume(sim, path, now=None):
+    """Restore sim from the checkpoint at path; returns the state, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    t0 = time.perf_counter()
+    state = load(path)
+    if now is None:
+        now = time.time()
+    # after a clean shutdown the counters are exact; otherwise skip what may have been sent since
+    skip_s = 0.0 if state.get("clean") else max(0.0, now - state["saved_at"])
+    sim.set_state(state, skip_s=skip_s)
+    faults = {el: s["faults"] for el, s in state["electrolysers"].items() if s["faults"]}
+    how = "clean shutdown" if state.get("clean") else f"unclean, sequence ids advanced by {skip_s:.1f} s"
+    print(f"[checkpoint] resumed from {path} in {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"(saved {now - state['saved_at']:.1f} s ago, {how})" + (f", active faults {faults}" if faults else ""))
+    return state
+
+
+class Checkpointer:
+    def __init__(self, sim, path):
+        self.sim = sim
+        self.path = str(path)
+        self.cond = Condition()
+        self.pending = None
+        self.closed = False
+        self.writes = 0
+        self.coalesced = 0  # snapshots replaced before they were written
+        self.last_bytes = 0
+        self.last_write_ms = 0.0
+        self.thread = Thread(target=self._writer, name="checkpoint-writer", daemon=True)
+        self.thread.start()
+
+    def snapshot(self, clean=False):
+        state = self.sim.get_state()
+        state.update(version=VERSION, saved_at=time.time(), clean=clean)
+        return state
+
+    def task(self, ts=None):
+        """Scheduler task: snapshot now, write in the background."""
+        state = self.snapshot()
+        with self.cond:
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = state
+            self.cond.notify()
+
+    def _write(self, state):
+        t0 = time.perf_counter()
+        try:
+            self.last_bytes = save(state, self.path)
+            self.writes += 1
+        except OSError as e:
+            print(f"[checkpoint] write to {self.path} failed: {e}")
+        self.last_write_ms = (time.perf_counter() - t0) * 1000
+
+    def _writer(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.pending is None:
+                    return
+                state, self.pending = self.pending, None
+            self._write(state)
+
+    def close(self):
+        """Stop the writer and write a final, clean checkpoint."""
+        with self.cond:
+            self.closed = True
+            self.pending = None
+            self.cond.notify_all()
+        self.thread.join()
+        self._write(self.snapshot(clean=True))
+        print(f"[checkpoint] {self.writes} writes to {self.path}, last {self.last_bytes} B in "
+              f"{self.last_write_ms:.1f} ms ({self.coalesced} coalesced)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inspect", required=True, metavar="PATH", help="print a summary of a checkpoint file")
+    args = parser.parse_args()
+
+    state = load(args.inspect)
+    print(f"{args.inspect}: {os.path.getsize(args.inspect)} B, version {state['version']}, "
+          f"saved {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['saved_at']))}, "
+          f"{'clean' if state['clean'] else 'periodic'}")
+    print(f"  plant: t={state['t']:.2f} s, irradiance {state['irradiance']}, seq {state['irr_seq']}")
+    for el, s in state["electrolysers"].items():
+        print(f"  {el}: I={s['I_stack']:.3f} A, V={s['V_stack']:.3f} V, T={s['stack_temp']:.2f} C, "
+              f"tank {s['tank_pressure_bar']:.4f} bar, tripped={s['tripped']}, faults {s['faults'] or {}}, "
+              f"seq {sum(s['seq'].values())} samples")
+    if state.get("gas"):
+        print(f"  gas network: {len(state['gas'])} nodes, {max(state['gas']) / 1e5:.3f} bar max")
+
+if __name__ == "__main__":
+    main()
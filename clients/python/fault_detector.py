@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+fault_detector.py
+Streaming fault-signature detection engine.
+
+Replaces the single-sample threshold checks in scripts/test_faults.py with
+incremental per-sensor state that is updated in O(1) per message:
+  - EWMA mean/variance (smoothed level and short-term noise)
+  - Welford running mean/variance (long-run baseline, for flatline detection)
+  - stuck-value counter (consecutive identical readings)
+  - jump register (how many of the last 8 steps moved more than a threshold)
+  - cross-sensor state per EL: cell spread, smoothed H2/O2 ratio, plant irradiance
+
+All 15 fault signatures are evaluated as messages arrive. Only signatures that
+depend on the updated sensor are re-evaluated. A signature must hold for --hold
+seconds (sample time) to raise and be absent for --clear seconds to clear. Raise
+and clear events are published to electrolyser/detections/<EL>:
+
+  {"el": "EL1", "fault": "gas_crossover", "active": true, "timestamp": <sample ts>,
+   "detected_at": <wall ts>, "evidence": {"h2_o2_ratio": 2.3}}
+
+Run:
+  python3 clients/python/fault_detector.py --hold 2 --clear 3
+"""
+
+import json
+import time
+import argparse
+from threading import Lock
+
+# same names as plant_sim.FAULT_NAMES / scripts/test_faults.FAULTS
+FAULTS = [
+    "membrane_pinhole", "gas_crossover", "cell_flooding", "cell_dryout",
+    "pump_failure", "dcdc_failure", "solar_transient", "level_sensor",
+    "irradiance_drift", "voltage_sensor_drift", "temp_sensor_failure",
+    "loose_bolt", "o2_blockage", "telemetry_dropout", "over_pressure"
+]
+
+STUCK_SAMPLES = 5  # identical consecutive readings before a sensor counts as stuck
+JUMP_THRESHOLDS = {"tank_pressure": 0.5}  # |step| that counts as a jump, per sensor
+
+
+class SensorState:
+    __slots__ = ("value", "ts", "ewma", "ewvar", "n", "mean", "m2", "stuck", "jumps")
+
+    def __init__(self):
+        self.value = None
+        self.ts = 0.0
+        self.ewma = 0.0
+        self.ewvar = 0.0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.stuck = 0
+        self.jumps = 0  # 8-bit shift register of recent jumps
+
+    def update(self, v, ts, alpha, jump_threshold=None):
+        prev = self.value
+        if prev is None:
+            self.ewma = v
+        else:
+            d = v - self.ewma
+            self.ewma += alpha * d
+            self.ewvar = (1.0 - alpha) * (self.ewvar + alpha * d * d)
+            self.stuck = self.stuck + 1 if v == prev else 0
+            if jump_threshold is not None:
+                self.jumps = ((self.jumps << 1) | (abs(v - prev) > jump_threshold)) & 0xFF
+        # Welford
+        self.n += 1
+        delta = v - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (v - self.mean)
+        self.value = v
+        self.ts = ts
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+
+class ElState:
+    __slots__ = ("el", "sensors", "cells", "ratio", "last_seen", "last_ts", "pending", "clearing", "active")
+
+    def __init__(self, el):
+        self.el = el
+        self.sensors = {}
+        self.cells = {}  # cell number -> latest voltage
+        self.ratio = SensorState()  # smoothed H2/O2 flow ratio
+        self.last_seen = 0.0  # wall clock of last message (dropout detection)
+        self.last_ts = 0.0  # sample time of last message
+        self.pending = {}  # fault -> sample ts when the signature first held
+        self.clearing = {}  # fault -> sample ts when an active signature first stopped holding
+        self.active = {}  # fault -> sample ts raised
+
+    def v(self, sensor):
+        s = self.sensors.get(sensor)
+        return s.value if s is not None else None
+
+    def smooth(self, sensor):
+        s = self.sensors.get(sensor)
+        return s.ewma if s is not None and s.n else None
+
+    def cell_stats(self):
+        vals = sorted(self.cells.values())
+        if not vals:
+            return None
+        return vals[0], vals[len(vals) // 2], vals[-1]
+
+
+class FaultDetector:
+    def __init__(self, hold_s=2.0, clear_s=3.0, dropout_s=5.0, alpha=0.2, i_ref=1.8, pair_s=0.1,
+                 on_event=None):
+        self.hold_s = hold_s
+        self.clear_s = clear_s
+        self.dropout_s = dropout_s
+        self.alpha = alpha
+        self.i_ref = i_ref
+        self.pair_s = pair_s  # max timestamp difference for H2/O2 samples to form a ratio
+        self.on_event = on_event
+        self.els = {}
+        self.irradiance = {}  # plant-level sensor -> SensorState
+        self.messages = 0
+
+        # signature -> (sensors that trigger re-evaluation, predicate(el) -> evidence dict or None)
+        self.signatures = {
+            "membrane_pinhole": (("cells",), self.sig_membrane_pinhole),
+            "gas_crossover": (("h2_flow_rate", "o2_flow_rate"), self.sig_gas_crossover),
+            "cell_flooding": (("cells",), self.sig_cell_flooding),
+            "cell_dryout": (("cells",), self.sig_cell_dryout),
+            "pump_failure": (("water_flow", "stack_current"), self.sig_pump_failure),
+            "dcdc_failure": (("stack_current",), self.sig_dcdc_failure),
+            "solar_transient": (("stack_current",), self.sig_solar_transient),
+            "level_sensor": (("tank_pressure",), self.sig_level_sensor),
+            "voltage_sensor_drift": (("cells",), self.sig_voltage_sensor_drift),
+            "temp_sensor_failure": (("stack_temperature",), self.sig_temp_sensor_failure),
+            "loose_bolt": (("stack_current",), self.sig_loose_bolt),
+            "o2_blockage": (("h2_flow_rate", "o2_flow_rate", "stack_pressure"), self.sig_o2_blockage),
+            "over_pressure": (("tank_pressure", "stack_pressure"), self.sig_over_pressure),
+        }
+        self.by_input = {}
+        for name, (inputs, fn) in self.signatures.items():
+            for i in inputs:
+                self.by_input.setdefault(i, []).append((name, fn))
+        # irradiance_drift is plant-wide (reported on PLANT); telemetry_dropout comes from sweep()
+
+    # --- signatures (return evidence when the fault pattern is present) ---
+    def sig_membrane_pinhole(self, el):
+        cs = el.cell_stats()
+        if cs and len(el.cells) >= 3 and cs[2] - cs[1] > 0.3:
+            return {"cell_spread_V": round(cs[2] - cs[1], 3)}
+
+    def sig_gas_crossover(self, el):
+        r = el.ratio.ewma if el.ratio.n >= 3 else None
+        cs = el.cell_stats()
+        pinhole = cs is not None and cs[2] - cs[1] > 0.3  # a pinhole also lifts H2 flow
+        if r is not None and not pinhole and (2.2 < r <= 4.0 or 0.0 < r < 1.9):
+            return {"h2_o2_ratio": round(r, 3)}
+
+    def sig_cell_flooding(self, el):
+        cs = el.cell_stats()
+        cur = el.v("stack_current")
+        if not cs or cur is None or cur <= 0.1 or cs[2] < 1.6:
+            return None
+        # a flooded cell sags to ~1.3-1.45 V; readings near 0 V are a sensor problem, not flooding
+        low = [v for v in el.cells.values() if 0.5 < v < 1.45]
+        if low:
+            return {"min_cell_V": min(low), "max_cell_V": cs[2]}
+
+    def sig_cell_dryout(self, el):
+        cs = el.cell_stats()
+        cur = el.v("stack_current")
+        # all cells high at normal current (an over-current transient lifts them too)
+        if cs and len(el.cells) >= 3 and cs[0] > 2.2 and (cur is None or cur < 2.0 * self.i_ref):
+            return {"min_cell_V": cs[0]}
+
+    def sig_pump_failure(self, el):
+        water, cur = el.v("water_flow"), el.v("stack_current")
+        if water is not None and cur is not None and water < 0.1 and cur > 0.5:
+            return {"water_flow": water, "stack_current": cur}
+
+    def _irradiance(self):
+        vals = [s.ewma for s in self.irradiance.values() if s.n]
+        return min(vals) if vals else None
+
+    def sig_dcdc_failure(self, el):
+        cur, irr = el.smooth("stack_current"), self._irradiance()
+        if cur is not None and irr is not None and cur < 0.1 and irr > 150.0:
+            return {"stack_current": round(cur, 4), "irradiance": round(irr, 1)}
+
+    def sig_solar_transient(self, el):
+        s = el.sensors.get("stack_current")
+        # a PV-fed stack cannot legitimately run far above its reference current
+        if s is not None and s.value > 5.0 * self.i_ref:
+            return {"stack_current": s.value, "expected_max": 5.0 * self.i_ref}
+
+    def sig_level_sensor(self, el):
+        s = el.sensors.get("tank_pressure")
+        if s is not None and s.value < 30.0 and bin(s.jumps).count("1") >= 3:
+            return {"tank_pressure_jumps": bin(s.jumps).count("1"), "tank_pressure": s.value}
+
+    def sig_voltage_sensor_drift(self, el):
+        cs = el.cell_stats()
+        if not cs:
+            return None
+        for cell, v in el.cells.items():
+            s = el.sensors.get(f"cell_{cell}_voltage")
+            if s is not None and s.stuck >= STUCK_SAMPLES and abs(v - cs[1]) > 1.0:
+                return {"cell": cell, "stuck_value_V": v, "median_cell_V": cs[1]}
+
+    def sig_temp_sensor_failure(self, el):
+        s = el.sensors.get("stack_temperature")
+        if s is None:
+            return None
+        # flatline at an implausible value, or a reading that used to move and no longer does
+        if (s.value <= 0.0 and s.stuck >= 1) or (s.stuck >= 4 * STUCK_SAMPLES and s.variance > 1e-6):
+            return {"stack_temperature": s.value, "stuck_samples": s.stuck + 1}
+
+    def sig_loose_bolt(self, el):
+        cur, irr = el.smooth("stack_current"), self._irradiance()
+        s = el.sensors.get("stack_current")
+        # PV can supply I_ref above ~100 W/m2; a steady current well below it points at contact resistance
+        if cur is not None and irr is not None and irr > 150.0 and 0.1 < cur < 0.85 * self.i_ref \
+                and s.ewvar < (0.1 * self.i_ref) ** 2:
+            return {"stack_current": round(cur, 4), "expected": self.i_ref}
+
+    def sig_o2_blockage(self, el):
+        r = el.ratio.ewma if el.ratio.n >= 3 else None
+        if r is not None and r > 4.0:
+            return {"h2_o2_ratio": round(r, 3), "stack_pressure": el.v("stack_pressure")}
+
+    def sig_over_pressure(self, el):
+        tank, stack = el.v("tank_pressure"), el.v("stack_pressure")
+        if (tank is not None and tank > 35.0) or (stack is not None and stack > 30.0):
+            return {"tank_pressure": tank, "stack_pressure": stack}
+
+    def sig_irradiance_drift(self, plant):
+        a, b = self.irradiance.get("irradiance_1"), self.irradiance.get("irradiance_2")
+        if a is not None and b is not None and a.n >= 3 and b.n >= 3 and abs(a.ewma - b.ewma) > 150.0:
+            return {"irradiance_1": round(a.ewma, 1), "irradiance_2": round(b.ewma, 1)}
+
+    # --- state machine ---
+    def _emit(self, el, fault, active, ts, evidence=None):
+        event = {"el": el, "fault": fault, "active": active, "timestamp": ts, "detected_at": time.time()}
+        if evidence:
+            event["evidence"] = evidence
+        if self.on_event:
+            self.on_event(event)
+        return event
+
+    def _evaluate(self, el, name, fn, ts, events):
+        evidence = fn(el)
+        if evidence is not None:
+            el.clearing.pop(name, None)
+            if name in el.active:
+                return
+            first = el.pending.setdefault(name, ts)
+            if ts - first >= self.hold_s:
+                del el.pending[name]
+                el.active[name] = ts
+                events.append(self._emit(el.el, name, True, ts, evidence))
+        else:
+            el.pending.pop(name, None)
+            if name in el.active:
+                first = el.clearing.setdefault(name, ts)
+                if ts - first >= self.clear_s:
+                    del el.clearing[name]
+                    del el.active[name]
+                    events.append(self._emit(el.el, name, False, ts))
+
+    def _el(self, name):
+        el = self.els.get(name)
+        if el is None:
+            el = self.els[name] = ElState(name)
+        return el
+
+    def process(self, topic, payload, recv_ts=None):
+        """Feed one decoded telemetry message; returns the list of raise/clear events it caused."""
+        value = payload.get("value")
+        sensor = payload.get("sensor")
+        ts = payload.get("timestamp")
+        if not isinstance(value, (int, float)) or not sensor or not isinstance(ts, (int, float)):
+            return []
+        self.messages += 1
+        events = []
+        name = payload.get("el")
+
+        if sensor.startswith("irradiance_"):
+            s = self.irradiance.get(sensor)
+            if s is None:
+                s = self.irradiance[sensor] = SensorState()
+            s.update(value, ts, self.alpha)
+            plant = self._el("PLANT")
+            plant.last_seen = recv_ts if recv_ts is not None else time.time()
+            self._evaluate(plant, "irradiance_drift", self.sig_irradiance_drift, ts, events)
+            return events
+
+        if not name:
+            return []
+        el = self._el(name)
+        el.last_seen = recv_ts if recv_ts is not None else time.time()
+        el.last_ts = ts
+        if el.active.pop("telemetry_dropout", None) is not None:
+            events.append(self._emit(name, "telemetry_dropout", False, ts))
+
+        s = el.sensors.get(sensor)
+        if s is None:
+            s = el.sensors[sensor] = SensorState()
+        s.update(value, ts, self.alpha, JUMP_THRESHOLDS.get(sensor))
+
+        key = sensor
+        if sensor.startswith("cell_"):
+            el.cells[payload.get("cell") or int(sensor.split("_")[1])] = value
+            key = "cells"
+        elif sensor in ("h2_flow_rate", "o2_flow_rate"):
+            # only pair samples taken together; h2_new / o2_old is meaningless while flows ramp
+            h2, o2 = el.sensors.get("h2_flow_rate"), el.sensors.get("o2_flow_rate")
+            if h2 is not None and o2 is not None and abs(h2.ts - o2.ts) <= self.pair_s \
+                    and o2.value > 1e-3 and h2.value > 1e-3:
+                el.ratio.update(h2.value / o2.value, ts, self.alpha)
+
+        for fault, fn in self.by_input.get(key, ()):
+            self._evaluate(el, fault, fn, ts, events)
+        return events
+
+    def sweep(self, now=None):
+        """Time-based signatures: an EL that stops reporting while the rest of the plant still does."""
+        if now is None:
+            now = time.time()
+        events = []
+        fresh = [e for e in self.els.values() if now - e.last_seen < self.dropout_s]
+        if not fresh:
+            return events  # nothing is reporting: broker/consumer problem, not a per-EL dropout
+        for el in self.els.values():
+            if el.el == "PLANT" or "telemetry_dropout" in el.active:
+                continue
+            if now - el.last_seen >= self.dropout_s:
+                el.active["telemetry_dropout"] = el.last_ts
+                events.append(self._emit(el.el, "telemetry_dropout", True, el.last_ts,
+                                         {"silent_s": round(now - el.last_seen, 1)}))
+        return events
+
+    def active(self):
+        return {name: sorted(el.active) for name, el in self.els.items() if el.active}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds a signature must hold before raising")
+    parser.add_argument("--clear", type=float, default=3.0, help="seconds a signature must be absent before clearing")
+    parser.add_argument("--dropout", type=float, default=5.0, help="silence (s) that counts as telemetry dropout")
+    parser.add_argument("--i-ref", type=float, default=1.8, help="expected stack current at full PV (A)")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="fault-detector")
+
+    def publish(event):
+        print(f"[{'RAISE' if event['active'] else 'CLEAR'}] {event['el']} {event['fault']} {event.get('evidence', '')}")
+        client.publish(f"electrolyser/detections/{event['el']}", json.dumps(event), qos=1)
+
+    det = FaultDetector(hold_s=args.hold, clear_s=args.clear, dropout_s=args.dropout,
+                        i_ref=args.i_ref, on_event=publish)
+
+    lock = Lock()  # process() runs on the MQTT network thread, sweep() on this one
+
+    def on_message(c, userdata, msg):
+        recv_ts = time.time()
+        try:
+            payload = json.loads(msg.payload)
+        except ValueError:
+            return
+        if isinstance(payload, dict):
+            with lock:
+                det.process(msg.topic, payload, recv_ts)
+
+    client.on_message = on_message
+    client.subscribe("electrolyser/plant-A/#", qos=1)
+    print("Fault detector running...")
+    try:
+        while True:
+            time.sleep(0.5)
+            with lock:
+                det.sweep()
+    except KeyboardInterrupt:
+        print("Stopping detector")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+gas_network.py
+Plant gas network: stacks, buffer tanks, headers and storage connected by pipes and
+valves, solved together every physics step.
+
+Nodes are gas volumes (ideal gas at a fixed temperature, n = pV/RT) or boundary nodes
+held at a set pressure (atmosphere, back-pressure regulated vent, high-pressure line).
+Edges carry a molar flow (mol/s) from u to v:
+  valve    q = G * opening * (p_u - p_v)                    linear, both directions
+  pipe     q = k * (p_u² - p_v²) / sqrt(|p_u² - p_v²| + e)  isothermal (Weymouth-type) gas pipe
+  check    valve that only passes u -> v
+  relief   q = G * max(0, p_u - p_set)                      opens above its set pressure
+Sources add mol/s at a node (stack production).
+
+Each step is implicit (backward Euler) in the node pressures:
+  C_i (p_i - p_i_old) / dt = src_i + sum of edge flows into i,   C_i = V_i / (R T_i)
+The flow laws are nonlinear, so the step is solved by Newton iterations. Each edge
+contributes its tangent conductance dq/dp; between two free nodes it is symmetrized
+as the mean of the u and v derivatives (they differ only by (p_u - p_v) / (p_u + p_v)
+for a pipe), so the Jacobian is a weighted graph Laplacian plus the positive diagonal
+C/dt: sparse, symmetric and diagonally dominant. The Newton correction is solved by
+conjugate gradients with a Jacobi preconditioner over the edge list; the residual uses
+the exact flows, so a converged step conserves moles. Work per iteration is
+O(nodes + edges) and the iteration counts do not grow with the plant, so hundreds of
+stacks stay cheap: with the small physics step a few Newton and CG iterations do.
+
+build_plant_network() lays out the default plant, per electrolyser:
+  <EL>/h2 (stack cathode, 10 mL) -pipe- <EL>/tank (buffer, 50 L) -valve- h2_header (5 L)
+      -pipe- storage (500 L) -valve- offtake (boundary: downstream compressor suction)
+  <EL>/tank -relief 30 bar- atmosphere;   <EL>/hp (boundary: high-pressure line)
+      -regulator valve (closed)- <EL>/tank
+  <EL>/o2 (anode separator, 2 mL) -valve o2_outlet- o2_vent (boundary: back-pressure
+      regulated at 1.2 bar);   <EL>/o2 -relief (water seal, +11.5 mbar)- atmosphere
+
+Run (scaling benchmark):
+  python3 clients/python/gas_network.py --stacks 200 --steps 200
+"""
+
+import math
+import time
+import argparse
+
+R_GAS = 8.31446261815324  # J/(mol·K)
+ATM_PA = 101325.0
+BAR = 1e5
+
+
+class Node:
+    __slots__ = ("name", "index", "volume", "temperature", "fixed", "p", "src", "cap")
+
+    def __init__(self, name, index, volume, temperature, pressure, fixed):
+        self.name, self.index = name, index
+        self.volume, self.temperature = volume, temperature
+        self.fixed = fixed  # boundary: pressure is held
+        self.p = pressure
+        self.src = 0.0  # mol/s
+        self.cap = volume / (R_GAS * temperature) if volume else 0.0  # mol/Pa
+
+
+class Edge:
+    __slots__ = ("name", "kind", "u", "v", "g", "opening", "p_set", "eps", "q")
+
+    def __init__(self, name, kind, u, v, g, opening=1.0, p_set=0.0, eps=1e6):
+        self.name, self.kind = name, kind
+        self.u, self.v = u, v  # node indices; positive flow u -> v
+        self.g = g  # mol/(s·Pa), the pipe law included (q = g * sqrt(p_u² - p_v²) away from zero)
+        self.opening = opening
+        self.p_set = p_set
+        self.eps = eps  # pipe regularization (Pa²), keeps the law smooth at zero flow
+        self.q = 0.0
+
+    def flow(self, pu, pv):
+        if self.kind == "valve":
+            return self.g * self.opening * (pu - pv)
+        if self.kind == "check":
+            return self.g * self.opening * (pu - pv) if pu > pv else 0.0
+        if self.kind == "relief":
+            return self.g * (pu - self.p_set) if pu > self.p_set else 0.0
+        d = pu * pu - pv * pv
+        return self.g * self.opening * d / math.sqrt(abs(d) + self.eps)
+
+    def conductance(self, pu, pv):
+        """Tangent conductances (dq/dp_u, -dq/dp_v), both >= 0."""
+        if self.kind == "valve":
+            g = self.g * self.opening
+            return g, g
+        if self.kind == "check":
+            g = self.g * self.opening if pu > pv else 0.0
+            return g, g
+        if self.kind == "relief":
+            return (self.g if pu > self.p_set else 0.0), 0.0
+        d = abs(pu * pu - pv * pv)
+        dq = self.g * self.opening * (0.5 * d + self.eps) / (d + self.eps) ** 1.5  # dq / d(p_u²-p_v²)
+        return 2.0 * pu * dq, 2.0 * pv * dq
+
+
+class GasNetwork:
+    def __init__(self, tol_pa=0.5, max_newton=20, max_cg=200):
+        self.nodes = []
+        self.edges = []
+        self.by_name = {}
+        self.edge_by_name = {}
+        self.tol_pa = tol_pa
+        self.max_newton = max_newton
+        self.max_cg = max_cg
+        self.col = None  # solver layout, built on the first step
+        self.iterations = (0, 0)  # (Newton, CG) of the last step
+
+    # --- construction ---
+    def add_node(self, name, volume=0.0, temperature=298.15, pressure=ATM_PA, fixed=False):
+        node = Node(name, len(self.nodes), volume, temperature, pressure, fixed)
+        if not fixed and volume <= 0.0:
+            raise ValueError(f"gas node {name} needs a volume (or fixed=True)")
+        self.nodes.append(node)
+        self.by_name[name] = node
+        self.col = None
+        return node
+
+    def add_edge(self, name, kind, u, v, g, **kw):
+        if kind not in ("valve", "pipe", "check", "relief"):
+            raise ValueError(f"unknown edge kind {kind!r}")
+        edge = Edge(name, kind, self.by_name[u].index, self.by_name[v].index, g, **kw)
+        self.edges.append(edge)
+        self.edge_by_name[name] = edge
+        self.col = None
+        return edge
+
+    # --- inputs / readings ---
+    def set_source(self, node, mol_s):
+        self.by_name[node].src = mol_s
+
+    def set_opening(self, edge, opening):
+        self.edge_by_name[edge].opening = opening
+
+    def set_pressure(self, node, pa):
+        self.by_name[node].p = pa
+
+    def pressure(self, node):
+        return self.by_name[node].p
+
+    def moles(self, node):
+        n = self.by_name[node]
+        return n.p * n.cap
+
+    def flow(self, edge):
+        return self.edge_by_name[edge].q
+
+    def get_state(self):
+        return [n.p for n in self.nodes]
+
+    def set_state(self, pressures):
+        for n, p in zip(self.nodes, pressures):
+            n.p = p
+
+    # --- solver ---
+    def _build(self):
+        """Column of each free node, and the edges that form the off-diagonal of the matrix."""
+        self.free = [n.index for n in self.nodes if not n.fixed]
+        col = {i: c for c, i in enumerate(self.free)}
+        self.col = [col.get(n.index) for n in self.nodes]  # None for boundary nodes
+        # edges between two free nodes: (edge index, column u, column v)
+        self.links = [(k, col[e.u], col[e.v]) for k, e in enumerate(self.edges) if e.u in col and e.v in col]
+
+    def step(self, dt):
+        if self.col is None:
+            self._build()
+        nodes, edges, free, col = self.nodes, self.edges, self.free, self.col
+        p_all = [n.p for n in nodes]
+        p_old = [p_all[i] for i in free]
+        cdt = [nodes[i].cap / dt for i in free]
+        src = [nodes[i].src for i in free]
+        newton = cg_total = 0
+        for newton in range(1, self.max_newton + 1):
+            # residual of C (p - p_old) / dt = src + inflow with the exact flow laws, and the
+            # diagonal of the Newton matrix C/dt + L (boundary pressures do not move)
+            res = [cd * (p_all[i] - po) - sc for cd, i, po, sc in zip(cdt, free, p_old, src)]
+            diag = list(cdt)
+            g = []
+            for e in edges:
+                pu, pv = p_all[e.u], p_all[e.v]
+                q = e.q = e.flow(pu, pv)
+                gu, gv = e.conductance(pu, pv)
+                cu, cv = col[e.u], col[e.v]
+                if cu is not None and cv is not None:
+                    # symmetrized so the matrix stays symmetric for CG
+                    gu = gv = 0.5 * (gu + gv)
+                g.append(gu)
+                if cu is not None:
+                    res[cu] += q
+                    diag[cu] += gu
+                if cv is not None:
+                    res[cv] -= q
+                    diag[cv] += gv
+            dp, its = self._cg(diag, [-r for r in res], g)
+            cg_total += its
+            for c, i in enumerate(free):
+                p_all[i] += dp[c]
+            if max(map(abs, dp), default=0.0) < self.tol_pa:
+                break
+        for c, i in enumerate(free):
+            nodes[i].p = p_all[i]
+        for e in edges:
+            e.q = e.flow(p_all[e.u], p_all[e.v])
+        self.iterations = (newton, cg_total)
+
+    def _cg(self, diag, rhs, g):
+        """Jacobi-preconditioned conjugate gradients for A x = rhs, A = diag - offdiagonal conductances."""
+        links = [(g[k], a, b) for k, a, b in self.links if g[k]]
+
+        def matvec(x):
+            out = [dg * xi for dg, xi in zip(diag, x)]
+            for w, a, b in links:
+                out[a] -= w * x[b]
+                out[b] -= w * x[a]
+            return out
+
+        x = [0.0] * len(rhs)
+        r = list(rhs)
+        z = [ri / dg for ri, dg in zip(r, diag)]
+        d = list(z)
+        rz = sum(ri * zi for ri, zi in zip(r, z))
+        # z = r / diag is each node's residual in Pa, so small volumes are held to the same
+        # accuracy as large ones; the Newton loop corrects what is left
+        tol = 0.1 * self.tol_pa
+        its = 0
+        while its < self.max_cg and max(map(abs, z), default=0.0) > tol:
+            its += 1
+            ad = matvec(d)
+            dad = sum(a * b for a, b in zip(d, ad))
+            if dad <= 0.0:
+                break
+            alpha = rz / dad
+            x = [xi + alpha * di for xi, di in zip(x, d)]
+            r = [ri - alpha * ai for ri, ai in zip(r, ad)]
+            z = [ri / dg for ri, dg in zip(r, diag)]
+            rz_new = sum(ri * zi for ri, zi in zip(r, z))
+            d = [zi + (rz_new / rz) * di for zi, di in zip(z, d)]
+            rz = rz_new
+        return x, its
+
+
+def build_plant_network(el_ids, h2_flow_nominal=4e-5, tank_volume_m3=0.05, temperature_k=298.15):
+    """Default plant layout (see module docstring); h2_flow_nominal (mol/s per stack) sizes the pipes."""
+    net = GasNetwork()
+    q = h2_flow_nominal
+    net.add_node("atmosphere", fixed=True, pressure=ATM_PA)
+    net.add_node("o2_vent", fixed=True, pressure=1.2 * BAR)  # back-pressure regulated O2 vent header
+    net.add_node("offtake", fixed=True, pressure=ATM_PA)  # compressor suction downstream of storage
+    net.add_node("h2_header", volume=0.005, temperature=temperature_k)
+    net.add_node("storage", volume=0.5, temperature=temperature_k)
+    n = len(el_ids)
+    # header -> storage pipe and storage offtake sized for all stacks at nominal flow
+    net.add_edge("header_to_storage", "pipe", "h2_header", "storage", g=n * q / math.sqrt(2 * ATM_PA * 2000.0))
+    # the offtake draws about half the nominal production at 1 barg, so storage fills slowly
+    net.add_edge("offtake", "valve", "storage", "offtake", g=0.5 * n * q / BAR)
+    for el in el_ids:
+        net.add_node(f"{el}/h2", volume=1e-5, temperature=temperature_k)
+        net.add_node(f"{el}/o2", volume=2e-6, temperature=temperature_k, pressure=1.2 * BAR)
+        net.add_node(f"{el}/tank", volume=tank_volume_m3, temperature=temperature_k)
+        net.add_node(f"{el}/hp", fixed=True, pressure=40.0 * BAR)
+        # stack -> buffer: short, wide pipe (~1 Pa at nominal flow); buffer -> header: ~400 Pa
+        net.add_edge(f"{el}/h2_outlet", "pipe", f"{el}/h2", f"{el}/tank", g=q / math.sqrt(2 * ATM_PA * 1.0))
+        net.add_edge(f"{el}/tank_valve", "valve", f"{el}/tank", "h2_header", g=q / 400.0)
+        # buffer protection: lifts at 30 bar, sized so a failed regulator still drives it to ~38 bar
+        net.add_edge(f"{el}/tank_relief", "relief", f"{el}/tank", "atmosphere", g=4e-6, p_set=30.0 * BAR)
+        net.add_edge(f"{el}/regulator", "valve", f"{el}/hp", f"{el}/tank", g=1.6e-5, opening=0.0)
+        # O2 separator (2 mL gas space) -> vent header: 10 mbar at nominal O2 flow, so the outlet
+        # flow follows production within ~0.05 s; a water seal lifts 11.5 mbar above the header,
+        # which caps what a blocked outlet can pass and sends the rest to atmosphere
+        net.add_edge(f"{el}/o2_outlet", "valve", f"{el}/o2", "o2_vent", g=(q / 2) / (0.01 * BAR))
+        net.add_edge(f"{el}/o2_relief", "relief", f"{el}/o2", "atmosphere", g=(q / 2) / (0.0005 * BAR),
+                     p_set=1.2115 * BAR)
+    return net
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stacks", type=int, default=200, help="electrolysers in the benchmark network")
+    parser.add_argument("--steps", type=int, default=200, help="physics steps")
+    parser.add_argument("--dt", type=float, default=0.01, help="physics step (s)")
+    args = parser.parse_args()
+
+    els = [f"EL{i + 1}" for i in range(args.stacks)]
+    net = build_plant_network(els)
+    for el in els:
+        net.set_source(f"{el}/h2", 4e-5)
+        net.set_source(f"{el}/o2", 2e-5)
+    net.set_opening("EL1/regulator", 1.0)  # one failed regulator, spreading through the header
+    t0 = time.perf_counter()
+    for _ in range(args.steps):
+        net.step(args.dt)
+    per_step = (time.perf_counter() - t0) / args.steps
+    print(f"{len(net.nodes)} nodes, {len(net.edges)} edges: {per_step * 1000:.2f} ms/step "
+          f"(last step {net.iterations[0]} Newton / {net.iterations[1]} CG iterations)")
+    for name in ("EL1/tank", "EL1/h2", "h2_header", "storage", f"{els[-1]}/tank", f"{els[-1]}/o2"):
+        print(f"  {name:>12}: {net.pressure(name) / BAR:8.4f} bar")
+
+if __name__ == "__main__":
+    main()
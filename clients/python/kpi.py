@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+kpi.py
+Incremental plant KPIs, computed at the edge instead of at query time in Grafana/Flux.
+
+KpiCalculator integrates stack power, charge, produced H2 (from the H2 flow) and
+stored H2 (from the tank inventory) as samples arrive, and reports per EL:
+  stack/power          W      instantaneous V_stack * I_stack
+  energy               kWh    cumulative electrical energy
+  h2_yield             kg     cumulative H2 produced
+  h2_stored            kg     H2 added to the tank since start
+  specific_energy      kWh/kg cumulative energy / cumulative yield
+  stack_efficiency     %      LHV of the H2 produced / electrical energy, over the last report interval
+  faraday_efficiency   %      H2 produced / N*Q/2F, over the last report interval
+
+KPIs are published as sensor-shaped payloads (schemas/sensor_reading_v1.json) to
+electrolyser/plant-A/<EL>/kpi/<name>, so Telegraf stores them like any other series.
+
+The same calculator runs inside plant_sim.py (fed every physics step) or as a
+subscriber for real hardware feeds (fed from the raw telemetry topics; held values
+are integrated over the time between samples, gaps longer than --max-gap are skipped).
+
+Run:
+  python3 clients/python/kpi.py --interval 10
+"""
+
+import json
+import time
+import argparse
+
+FARADAY = 96485.33212  # C/mol
+R_GAS = 8.31446261815324  # J/(mol·K)
+H2_LHV_J_PER_MOL = 241.83e3  # lower heating value
+H2_MOLAR_MASS_KG = 2.01588e-3
+# flows are reported in L/min at 25 °C, 1 atm (same reference as plant_sim.py)
+MOLAR_VOLUME_L = R_GAS * 298.15 / 101325.0 * 1000.0
+
+# KPI name -> (topic suffix under electrolyser/plant-A/<EL>/, unit, rounding digits)
+KPI_TOPICS = {
+    "stack_power": ("kpi/stack/power", "W", 4),
+    "energy": ("kpi/energy", "kWh", 6),
+    "h2_yield": ("kpi/h2_yield", "kg", 8),
+    "h2_stored": ("kpi/h2_stored", "kg", 8),
+    "specific_energy": ("kpi/specific_energy", "kWh/kg", 3),
+    "stack_efficiency": ("kpi/stack_efficiency", "%", 2),
+    "faraday_efficiency": ("kpi/faraday_efficiency", "%", 2),
+}
+
+
+class KpiCalculator:
+    def __init__(self, el, n_cells=5, tank_volume_m3=0.05, tank_temperature_k=298.15, max_gap_s=10.0):
+        self.el = el
+        self.n_cells = n_cells
+        self.tank_volume_m3 = tank_volume_m3
+        self.tank_temperature_k = tank_temperature_k
+        self.max_gap_s = max_gap_s
+        # held inputs
+        self.voltage = None
+        self.current = None
+        self.h2_flow_Lpm = None
+        self.tank_moles = None
+        self.tank_moles0 = None
+        self.cells = {}  # subscriber mode: cell -> voltage, V_stack is their sum
+        self.last_ts = None
+        # running totals
+        self.seconds = 0.0
+        self.skipped_s = 0.0  # time not integrated (gaps, missing inputs)
+        self.charge_C = 0.0
+        self.energy_J = 0.0
+        self.h2_mol = 0.0
+        # totals at the previous report(), for interval KPIs
+        self.mark = (0.0, 0.0, 0.0)
+
+    # held inputs and totals carried across a simulator restart (see checkpoint.py)
+    STATE_FIELDS = ("voltage", "current", "h2_flow_Lpm", "tank_moles", "tank_moles0", "last_ts",
+                    "seconds", "skipped_s", "charge_C", "energy_J", "h2_mol")
+
+    def get_state(self):
+        state = {f: getattr(self, f) for f in self.STATE_FIELDS}
+        state["mark"] = list(self.mark)
+        state["cells"] = [[c, v] for c, v in self.cells.items()]
+        return state
+
+    def set_state(self, state):
+        for f in self.STATE_FIELDS:
+            setattr(self, f, state[f])
+        self.mark = tuple(state["mark"])
+        self.cells = {c: v for c, v in state["cells"]}
+
+    def integrate(self, dt):
+        """Accumulate the held inputs over dt seconds."""
+        if dt <= 0.0:
+            return
+        if self.current is None or self.voltage is None:
+            self.skipped_s += dt
+            return
+        self.seconds += dt
+        self.charge_C += self.current * dt
+        self.energy_J += self.voltage * self.current * dt
+        if self.h2_flow_Lpm is not None:
+            self.h2_mol += self.h2_flow_Lpm / MOLAR_VOLUME_L / 60.0 * dt
+
+    def set_tank_moles(self, moles):
+        if self.tank_moles0 is None:
+            self.tank_moles0 = moles
+        self.tank_moles = moles
+
+    def step(self, dt, v_stack, i_stack, h2_flow_Lpm, tank_moles=None):
+        """Simulator mode: values at the end of a physics step of length dt."""
+        self.voltage, self.current, self.h2_flow_Lpm = v_stack, i_stack, h2_flow_Lpm
+        if tank_moles is not None:
+            self.set_tank_moles(tank_moles)
+        self.integrate(dt)
+
+    def observe(self, sensor, value, ts, cell=None):
+        """Subscriber mode: one raw reading; the previous values are held until ts."""
+        if self.last_ts is not None and ts > self.last_ts:
+            gap = ts - self.last_ts
+            if gap <= self.max_gap_s:
+                self.integrate(gap)
+            else:
+                self.skipped_s += gap
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+        if sensor.startswith("cell_"):
+            self.cells[cell or int(sensor.split("_")[1])] = value
+            if len(self.cells) >= self.n_cells:
+                self.voltage = sum(self.cells.values())
+        elif sensor == "stack_current":
+            self.current = value
+        elif sensor == "h2_flow_rate":
+            self.h2_flow_Lpm = value
+        elif sensor == "tank_pressure":
+            # ideal gas, as in the simulator's tank model
+            self.set_tank_moles(value * 1e5 * self.tank_volume_m3 / (R_GAS * self.tank_temperature_k))
+
+    def report(self):
+        """Current KPI values; interval KPIs cover the time since the previous report()."""
+        out = {}
+        if self.voltage is not None and self.current is not None:
+            out["stack_power"] = self.voltage * self.current
+        out["energy"] = self.energy_J / 3.6e6
+        out["h2_yield"] = self.h2_mol * H2_MOLAR_MASS_KG
+        if self.tank_moles is not None:
+            out["h2_stored"] = (self.tank_moles - self.tank_moles0) * H2_MOLAR_MASS_KG
+        if out["h2_yield"] > 1e-9:
+            out["specific_energy"] = out["energy"] / out["h2_yield"]
+
+        q0, e0, h0 = self.mark
+        dq, de, dh = self.charge_C - q0, self.energy_J - e0, self.h2_mol - h0
+        if de > 1e-9:
+            out["stack_efficiency"] = 100.0 * dh * H2_LHV_J_PER_MOL / de
+        if dq > 1e-9:
+            out["faraday_efficiency"] = 100.0 * dh / (self.n_cells * dq / (2.0 * FARADAY))
+        self.mark = (self.charge_C, self.energy_J, self.h2_mol)
+        return out
+
+    def payloads(self, ts, seq):
+        """Sensor-shaped KPI payloads for report(); seq(name) returns the next sequence id."""
+        for name, value in self.report().items():
+            suffix, unit, ndigits = KPI_TOPICS[name]
+            yield f"electrolyser/plant-A/{self.el}/{suffix}", {
+                "el": self.el,
+                "sensor": f"kpi_{name}",
+                "unit": unit,
+                "timestamp": ts,
+                "value": round(value, ndigits),
+                "sequence_id": seq(name),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--interval", type=float, default=10.0, help="KPI publish interval (s)")
+    parser.add_argument("--cells", type=int, default=5, help="cells per stack")
+    parser.add_argument("--tank-volume", type=float, default=0.05, help="H2 tank volume (m3)")
+    parser.add_argument("--max-gap", type=float, default=10.0, help="longest sample gap (s) integrated over")
+    args = parser.parse_args()
+
+    from threading import Lock
+    from plant_sim import make_mqtt_client
+
+    calcs = {}
+    seqs = {}
+    lock = Lock()
+
+    def seq(el):
+        def nxt(name):
+            n = seqs.get((el, name), 0)
+            seqs[(el, name)] = n + 1
+            return n
+        return nxt
+
+    def on_message(c, userdata, msg):
+        if "/kpi/" in msg.topic:
+            return  # our own output (or the simulator's)
+        try:
+            p = json.loads(msg.payload)
+        except ValueError:
+            return
+        if not isinstance(p, dict):
+            return
+        el, sensor, value, ts = p.get("el"), p.get("sensor"), p.get("value"), p.get("timestamp")
+        if not el or el == "PLANT" or not sensor or not isinstance(value, (int, float)) \
+                or not isinstance(ts, (int, float)):
+            return
+        with lock:
+            calc = calcs.get(el)
+            if calc is None:
+                calc = calcs[el] = KpiCalculator(el, n_cells=args.cells, tank_volume_m3=args.tank_volume,
+                                                 max_gap_s=args.max_gap)
+            calc.observe(sensor, value, ts, p.get("cell"))
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="kpi-engine")
+    client.on_message = on_message
+    client.subscribe("electrolyser/plant-A/#", qos=1)
+    print("KPI engine running...")
+    try:
+        while True:
+            time.sleep(args.interval)
+            ts = time.time()
+            with lock:
+                out = [(el, list(calc.payloads(ts, seq(el)))) for el, calc in calcs.items()]
+            for el, msgs in out:
+                for topic, payload in msgs:
+                    client.publish(topic, json.dumps(payload), qos=1)
+                vals = {p["sensor"][4:]: p["value"] for _, p in msgs}
+                print(f"{el}: {vals}")
+    except KeyboardInterrupt:
+        print("Stopping KPI engine")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == "__main__":
+    main()
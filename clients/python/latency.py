@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+latency.py
+End-to-end latency instrumentation: publisher `timestamp` -> consumer receive time.
+
+Delays are recorded per topic class (EL and cell/irradiance indices folded, e.g.
+"cell/+/voltage", "stack/current", "irradiance/+") into HDR-style log-linear
+histograms: exact below 2**sub_bits microseconds, then 2**(sub_bits-1) buckets per
+power of two (~0.8 % relative error with the default sub_bits=7), so p50/p99/p999
+stay accurate from microseconds to minutes with a fixed, small memory footprint.
+
+Clock skew: publisher and consumer on the same host share a clock, so delays must
+never be negative. A loopback probe (the consumer publishes its own timestamps to
+electrolyser/monitor/latency_probe and receives them back) measures the broker path
+with a single clock; publisher delays consistently below the probe floor indicate
+skew between publisher and consumer clocks.
+
+Run alongside a load test, then inspect the dump:
+  python3 clients/python/latency.py --duration 120 --out latency.json
+"""
+
+import json
+import math
+import time
+import argparse
+
+PROBE_TOPIC = "electrolyser/monitor/latency_probe"
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+
+class LatencyHistogram:
+    def __init__(self, sub_bits=7, max_value_us=3600 * 1_000_000):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half_count = 1 << (sub_bits - 1)
+        self.counts = [0] * (self._index(max_value_us) + 1)
+        self.max_value_us = max_value_us
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self.negative = 0  # samples with a negative delay (recorded as 0)
+        self.min_negative_us = 0
+        self.overflow = 0  # samples above max_value_us (recorded at the top bucket)
+
+    def _index(self, v):
+        if v < self.sub_count:
+            return v
+        shift = v.bit_length() - self.sub_bits
+        top = v >> shift  # in [half_count, sub_count)
+        return self.sub_count + (shift - 1) * self.half_count + (top - self.half_count)
+
+    def _value_at(self, idx):
+        """Highest value that maps to bucket idx."""
+        if idx < self.sub_count:
+            return idx
+        shift = (idx - self.sub_count) // self.half_count + 1
+        top = (idx - self.sub_count) % self.half_count + self.half_count
+        return ((top + 1) << shift) - 1
+
+    def record_us(self, v):
+        if v < 0:
+            self.negative += 1
+            if v < self.min_negative_us:
+                self.min_negative_us = v
+            v = 0
+        elif v > self.max_value_us:
+            self.overflow += 1
+            v = self.max_value_us
+        self.counts[self._index(v)] += 1
+        self.total += 1
+        self.sum_us += v
+        if self.min_us is None or v < self.min_us:
+            self.min_us = v
+        if v > self.max_us:
+            self.max_us = v
+
+    def record(self, seconds):
+        self.record_us(int(round(seconds * 1_000_000)))
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        self.negative += other.negative
+        self.min_negative_us = min(self.min_negative_us, other.min_negative_us)
+        self.overflow += other.overflow
+
+    def percentile_us(self, p):
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(p / 100.0 * self.total))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self._value_at(i), self.max_us)
+        return self.max_us
+
+    def summary(self):
+        ms = lambda us: round(us / 1000.0, 3)
+        out = {"count": self.total}
+        if not self.total:
+            return out
+        out.update({
+            "min_ms": ms(self.min_us),
+            "mean_ms": ms(self.sum_us / self.total),
+            **{f"{name}_ms": ms(self.percentile_us(p)) for name, p in PERCENTILES},
+            "max_ms": ms(self.max_us),
+            "negative": self.negative,
+        })
+        if self.negative:
+            out["min_negative_ms"] = ms(self.min_negative_us)
+        if self.overflow:
+            out["overflow"] = self.overflow
+        return out
+
+
+def topic_class(topic):
+    """electrolyser/plant-A/EL1/cell/3/voltage -> cell/+/voltage"""
+    parts = topic.split("/")[2:]
+    if parts and parts[0].startswith("EL"):
+        parts = parts[1:]
+    return "/".join("+" if p.isdigit() else p for p in parts) or topic
+
+
+class LatencyRecorder:
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.classes = {}  # topic class -> LatencyHistogram
+        self.probe = LatencyHistogram(sub_bits)
+        self.started = time.time()
+
+    def _hist(self, cls):
+        h = self.classes.get(cls)
+        if h is None:
+            h = self.classes[cls] = LatencyHistogram(self.sub_bits)
+        return h
+
+    def record(self, cls, latency_s):
+        self._hist(cls).record(latency_s)
+
+    def record_message(self, topic, payload, recv_ts=None):
+        """Record publish->receive delay for a decoded payload; recv_ts should be taken on arrival."""
+        if recv_ts is None:
+            recv_ts = time.time()
+        if topic == PROBE_TOPIC:
+            ts = payload.get("probe_ts")
+            if isinstance(ts, (int, float)):
+                self.probe.record(recv_ts - ts)
+            return
+        ts = payload.get("timestamp")
+        if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+            self._hist(topic_class(topic)).record(recv_ts - ts)
+
+    def skew_check(self):
+        """
+        Compare the publisher-clock delays with the single-clock probe floor.
+        skew_estimate_ms > 0 means publisher timestamps run ahead of the consumer clock
+        by at least that much (delays cannot be shorter than the broker round trip).
+        """
+        if not self.classes:
+            return {"status": "no data"}
+        total = LatencyHistogram(self.sub_bits)
+        for h in list(self.classes.values()):
+            total.merge(h)
+        res = {"negative_samples": total.negative}
+        if self.probe.total:
+            floor_us = self.probe.min_us
+            pub_min_us = total.min_negative_us if total.negative else total.min_us
+            res["probe_floor_ms"] = round(floor_us / 1000.0, 3)
+            res["publisher_min_ms"] = round(pub_min_us / 1000.0, 3)
+            res["skew_estimate_ms"] = round(max(0, floor_us - pub_min_us) / 1000.0, 3)
+        if total.negative:
+            res["status"] = "skewed: publisher clock ahead of consumer"
+        elif self.probe.total and res["skew_estimate_ms"] > 1.0:
+            res["status"] = "suspect: publisher delays below probe floor"
+        else:
+            res["status"] = "ok"
+        return res
+
+    def report(self):
+        classes = dict(self.classes)
+        total = LatencyHistogram(self.sub_bits)
+        for h in classes.values():
+            total.merge(h)
+        return {
+            "started": self.started,
+            "duration_s": round(time.time() - self.started, 3),
+            "all": total.summary(),
+            "classes": {c: h.summary() for c, h in sorted(classes.items())},
+            "probe": self.probe.summary(),
+            "clock": self.skew_check(),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary_lines(self):
+        rep = self.report()
+        lines = [f"{'class':<22}{'count':>9}{'p50':>10}{'p99':>10}{'p999':>10}{'max':>10}  (ms)"]
+        for cls, s in list(rep["classes"].items()) + [("ALL", rep["all"]), ("probe (loopback)", rep["probe"])]:
+            if s.get("count"):
+                lines.append(f"{cls:<22}{s['count']:>9}{s['p50_ms']:>10}{s['p99_ms']:>10}{s['p999_ms']:>10}{s['max_ms']:>10}")
+        lines.append(f"clock: {rep['clock']}")
+        return lines
+
+
+def send_probe(client):
+    client.publish(PROBE_TOPIC, json.dumps({"probe_ts": time.time()}), qos=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--duration", type=float, default=60.0, help="measurement duration (s)")
+    parser.add_argument("--probe-interval", type=float, default=1.0, help="loopback probe period (s)")
+    parser.add_argument("--out", default="latency.json", help="JSON dump written at the end of the run")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    rec = LatencyRecorder()
+
+    def on_message(client, userdata, msg):
+        recv_ts = time.time()
+        try:
+            rec.record_message(msg.topic, json.loads(msg.payload), recv_ts)
+        except (ValueError, AttributeError):
+            pass
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="latency-monitor")
+    client.on_message = on_message
+    client.subscribe([("electrolyser/plant-A/#", 1), (PROBE_TOPIC, 1)])
+    print(f"Measuring latency for {args.duration:.0f} s...")
+    end = time.time() + args.duration
+    try:
+        while time.time() < end:
+            send_probe(client)
+            time.sleep(args.probe_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+    rec.dump(args.out)
+    for line in rec.summary_lines():
+        print(line)
+    print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
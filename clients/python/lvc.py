@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+lvc.py
+In-memory last-value cache with a short-horizon query API.
+
+Subscribes to electrolyser/plant-A/# and keeps, per topic:
+  - the latest payload (any shape, including status/trip events)
+  - a bounded recent window of (timestamp, value) for numeric readings, stored in
+    array-backed ring buffers (array('d')), so memory is fixed per series and
+    lookups are a binary search over contiguous doubles.
+
+New subscribers and dashboards get the whole plant state in one request instead of
+waiting for fresh messages, and "now" panels no longer need InfluxDB.
+
+HTTP/JSON API (keep-alive; X-Query-Time-us reports server-side query time):
+  GET /series                                   -> list of cached topics
+  GET /latest[?prefix=electrolyser/plant-A/EL1] -> {topic: payload} snapshot
+  GET /latest?series=<topic>                    -> latest payload for one topic
+  GET /point?series=<topic>&t=<epoch>           -> last sample at or before t
+  GET /range?series=<topic>&start=<epoch>&end=<epoch>[&limit=N] -> {"t": [...], "v": [...]}
+
+Run:
+  python3 clients/python/lvc.py --http-port 8088 --window 3600
+  curl 'http://127.0.0.1:8088/latest?prefix=electrolyser/plant-A/EL1'
+"""
+
+import json
+import time
+import argparse
+from array import array
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class RingSeries:
+    """Fixed-capacity (timestamp, value) ring buffer, ordered by timestamp."""
+
+    __slots__ = ("capacity", "ts", "vals", "start", "size", "out_of_order")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array("d", bytes(8 * capacity))
+        self.vals = array("d", bytes(8 * capacity))
+        self.start = 0  # physical index of the oldest sample
+        self.size = 0
+        self.out_of_order = 0
+
+    def _phys(self, i):
+        i += self.start
+        return i - self.capacity if i >= self.capacity else i
+
+    def append(self, t, v):
+        if self.size and t < self.ts[self._phys(self.size - 1)]:
+            self.out_of_order += 1  # the window stays sorted; late samples only update "latest"
+            return
+        if self.size < self.capacity:
+            j = self._phys(self.size)
+            self.size += 1
+        else:
+            j = self.start
+            self.start = self.start + 1 if self.start + 1 < self.capacity else 0
+        self.ts[j] = t
+        self.vals[j] = v
+
+    def _bisect(self, t, inclusive=True):
+        """Number of samples with timestamp <= t (inclusive) or < t."""
+        lo, hi = 0, self.size
+        ts, phys = self.ts, self._phys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x = ts[phys(mid)]
+            if x < t or (inclusive and x == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def point(self, t):
+        i = self._bisect(t) - 1
+        if i < 0:
+            return None
+        j = self._phys(i)
+        return self.ts[j], self.vals[j]
+
+    def range(self, start, end, limit=None):
+        lo = self._bisect(start, inclusive=False) if start is not None else 0
+        hi = self._bisect(end) if end is not None else self.size
+        if limit is not None and hi - lo > limit:
+            lo = hi - limit  # most recent samples win
+        out_t, out_v = [], []
+        for i in range(lo, hi):
+            j = self._phys(i)
+            out_t.append(self.ts[j])
+            out_v.append(self.vals[j])
+        return out_t, out_v
+
+
+class LastValueCache:
+    def __init__(self, window=3600):
+        self.window = window
+        self.lock = Lock()
+        self.latest = {}  # topic -> payload dict
+        self.series = {}  # topic -> RingSeries
+        self.messages = 0
+
+    def update(self, topic, payload, recv_ts=None):
+        ts = payload.get("timestamp")
+        if not isinstance(ts, (int, float)):
+            ts = recv_ts if recv_ts is not None else time.time()
+        value = payload.get("value")
+        with self.lock:
+            self.messages += 1
+            prev = self.latest.get(topic)
+            if prev is None or ts >= prev.get("timestamp", 0):
+                self.latest[topic] = payload
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                ring = self.series.get(topic)
+                if ring is None:
+                    ring = self.series[topic] = RingSeries(self.window)
+                ring.append(float(ts), float(value))
+
+    def on_message(self, client, userdata, msg):
+        recv_ts = time.time()
+        try:
+            payload = json.loads(msg.payload)
+        except ValueError:
+            return
+        if isinstance(payload, dict):
+            self.update(msg.topic, payload, recv_ts)
+
+    # --- queries ---
+    def topics(self):
+        with self.lock:
+            return sorted(self.latest)
+
+    def snapshot(self, prefix=None):
+        with self.lock:
+            if prefix is None:
+                return dict(self.latest)
+            return {t: p for t, p in self.latest.items() if t.startswith(prefix)}
+
+    def get_latest(self, topic):
+        with self.lock:
+            return self.latest.get(topic)
+
+    def point(self, topic, t):
+        with self.lock:
+            ring = self.series.get(topic)
+            return ring.point(t) if ring else None
+
+    def range(self, topic, start=None, end=None, limit=None):
+        with self.lock:
+            ring = self.series.get(topic)
+            if ring is None:
+                return None
+            return ring.range(start, end, limit)
+
+
+def make_handler(cache):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: no TCP setup per dashboard query
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _reply(self, code, obj, query_us):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("X-Query-Time-us", f"{query_us:.1f}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            t0 = time.perf_counter()
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            num = lambda k: float(q[k]) if k in q else None
+            try:
+                series = q.get("series")
+                if url.path == "/series":
+                    code, res = 200, cache.topics()
+                elif url.path == "/latest":
+                    if series:
+                        res = cache.get_latest(series)
+                        code = 200 if res is not None else 404
+                    else:
+                        code, res = 200, cache.snapshot(q.get("prefix"))
+                elif url.path == "/point" and series:
+                    p = cache.point(series, num("t") if "t" in q else time.time())
+                    code, res = (200, {"t": p[0], "v": p[1]}) if p else (404, None)
+                elif url.path == "/range" and series:
+                    r = cache.range(series, num("start"), num("end"),
+                                    int(q["limit"]) if "limit" in q else None)
+                    code, res = (200, {"t": r[0], "v": r[1]}) if r else (404, None)
+                else:
+                    code, res = 400, {"error": "unknown query"}
+            except ValueError as e:
+                code, res = 400, {"error": str(e)}
+            self._reply(code, res, (time.perf_counter() - t0) * 1e6)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--http-host", default="127.0.0.1", help="HTTP listen address")
+    parser.add_argument("--http-port", type=int, default=8088, help="HTTP listen port")
+    parser.add_argument("--window", type=int, default=3600, help="samples kept per series")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    cache = LastValueCache(window=args.window)
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="last-value-cache")
+    client.on_message = cache.on_message
+    client.subscribe("electrolyser/plant-A/#", qos=1)
+
+    server = ThreadingHTTPServer((args.http_host, args.http_port), make_handler(cache))
+    print(f"Last-value cache on http://{args.http_host}:{args.http_port} (window {args.window} samples/series)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping cache")
+    finally:
+        server.server_close()
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+mqtt_reactor.py
+One network thread (or a few) for all per-device MQTT clients.
+
+client.loop_start() gives every paho client its own network thread, plus a socket pair
+to wake it: with one mTLS identity per sensor that is ~15 threads per electrolyser, and
+thousands of threads (8 MB stack reservations, GIL hand-offs) for a large plant. The
+reactor keeps the identities (one TLS connection per device) but serves every socket
+from `threads` I/O threads, each a selectors loop driven by paho's external-loop hooks:
+
+  on_socket_open / on_socket_close                  register / unregister the socket
+  on_socket_register_write / ..._unregister_write   add / drop write interest when
+                                                    publish() queues packets
+  readable -> loop_read(), writable -> loop_write(), every misc_s -> loop_misc() (keepalive)
+
+Selector changes requested from other threads (publish() on the simulator thread,
+reconnects) are queued to the owning I/O thread and wake it through one socket pair.
+Every publish() also marks its client for a write-interest check on the I/O thread:
+paho only asks for write interest when it believes none is registered, and that belief
+can be stale while loop_write() is dropping it. Only marked clients are checked, so a
+wake-up costs O(ready + marked) sockets, not O(all).
+A dropped connection is re-established from a separate reconnect thread with
+exponential backoff (1 s doubling to 120 s, as paho's loop_forever), so a broker that
+is slow to answer a TCP connect or TLS handshake never stalls the other sockets.
+
+ReactorClient is a paho Client whose loop_start()/loop_stop() attach it to / detach it
+from a reactor, so code written for the threaded interface runs unchanged;
+make_mqtt_client(..., reactor=r) (plant_sim.py) creates one. Callbacks (on_connect,
+on_message) run on the I/O thread, as they would on paho's network thread. paho creates
+its internal wake-up socket pair only in loop() / loop_start(), which ReactorClient
+replaces, so a device costs one fd (its connection).
+
+Run (thread count and memory for N idle clients against a broker):
+  python3 clients/python/mqtt_reactor.py --clients 500 --broker 127.0.0.1
+  python3 clients/python/mqtt_reactor.py --clients 500 --threaded
+"""
+
+import time
+import heapq
+import socket
+import argparse
+import selectors
+import threading
+from threading import Thread, Event, Lock, Condition
+from paho.mqtt import client as mqtt
+
+
+class ReactorClient(mqtt.Client):
+    """paho client served by a shared MqttReactor instead of its own network thread."""
+
+    def __init__(self, reactor, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reactor = reactor
+        self.io_loop = None  # IoLoop serving this client while attached
+        self.stopping = False  # disconnect() requested: no reconnect when the socket closes
+        self.reconnect_delay = 0.0
+
+    def loop_start(self):
+        self.stopping = False
+        self.reactor.attach(self)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force=False):
+        self.reactor.detach(self)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def disconnect(self, reasoncode=None, properties=None):
+        self.stopping = True
+        return super().disconnect(reasoncode, properties)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        info = super().publish(topic, payload, qos, retain, properties)
+        loop = self.io_loop
+        if loop is not None:
+            loop.kick(self)  # after the packet is queued, so the I/O thread's check sees it
+        return info
+
+
+class IoLoop:
+    """One selector thread; all selector calls happen on it."""
+
+    def __init__(self, reactor, name):
+        self.reactor = reactor
+        self.selector = selectors.DefaultSelector()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.lock = Lock()
+        self.calls = []  # (fn, args) queued by other threads
+        self.clients = set()
+        self.assigned = 0  # clients attached to this loop (updated by the attaching thread)
+        self.fds = {}  # client -> fd registered for it
+        self.pending = set()  # TLS clients with decrypted bytes buffered (invisible to select)
+        self.writing = set()  # clients registered for EVENT_WRITE
+        self.kicked = set()  # clients that published from another thread since the last pass (under lock)
+        self.stop_event = Event()
+        self.thread = Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the I/O thread (now, when called from it)."""
+        if threading.get_ident() == self.thread.ident:
+            fn(*args)
+            return
+        with self.lock:
+            self.calls.append((fn, args))
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # a wake-up is already pending, or the loop is gone
+
+    def kick(self, client):
+        """Check client's write interest on the next pass (any thread, including a callback
+        running inside loop_write())."""
+        with self.lock:
+            first = not self.kicked
+            self.kicked.add(client)
+        if first:
+            try:
+                self.wake_w.send(b"\0")
+            except (BlockingIOError, OSError):
+                pass  # a wake-up is already pending, or the loop is gone
+
+    def _run_calls(self):
+        with self.lock:
+            calls, self.calls = self.calls, []
+        for fn, args in calls:
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[reactor] {fn.__name__} failed: {e}")
+
+    def hook(self, client):
+        """Install paho's socket callbacks (any thread): from now on publish() never writes inline."""
+        client.on_socket_open = lambda c, userdata, sock: self.call(self.register, c, sock)
+        client.on_socket_close = lambda c, userdata, sock: self.call(self.unregister, c)
+        client.on_socket_register_write = lambda c, userdata, sock: self.call(self.want_write, c, sock, True)
+        client.on_socket_unregister_write = lambda c, userdata, sock: self.call(self.want_write, c, sock, False)
+
+    # --- selector changes (I/O thread) ---
+    def add(self, client):
+        self.clients.add(client)
+        sock = client.socket()
+        if sock is not None:  # connected before loop_start(), as make_mqtt_client does
+            self.register(client, sock)
+        elif not client.stopping:
+            self.reactor.schedule_reconnect(client)
+
+    def remove(self, client, done=None):
+        for name in ("on_socket_open", "on_socket_close", "on_socket_register_write", "on_socket_unregister_write"):
+            setattr(client, name, None)
+        self.unregister(client, closed=False)
+        self.clients.discard(client)
+        if done is not None:
+            done.set()
+
+    def register(self, client, sock):
+        if client not in self.clients:
+            return
+        self.unregister(client, closed=False)
+        writing = client.want_write()
+        self.selector.register(sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0), client)
+        self.fds[client] = sock.fileno()
+        if writing:
+            self.writing.add(client)
+
+    def unregister(self, client, closed=True):
+        fd = self.fds.pop(client, None)
+        self.pending.discard(client)
+        self.writing.discard(client)
+        if fd is not None:
+            try:
+                self.selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+        if closed and client in self.clients and not client.stopping:
+            self.reactor.schedule_reconnect(client)
+
+    def want_write(self, client, sock, on):
+        fd = self.fds.get(client)
+        if fd is None or fd != sock.fileno():
+            return  # stale request for a socket that has been replaced
+        self._set_write(client, fd, on)
+
+    def _set_write(self, client, fd, on):
+        if on == (client in self.writing):
+            return
+        if on:
+            self.writing.add(client)
+        else:
+            self.writing.discard(client)
+        self.selector.modify(fd, selectors.EVENT_READ | (selectors.EVENT_WRITE if on else 0), client)
+
+    # --- event loop ---
+    def run(self):
+        misc_s = self.reactor.misc_s
+        next_misc = time.monotonic() + misc_s
+        while not self.stop_event.is_set():
+            timeout = 0.0 if self.pending else max(0.0, next_misc - time.monotonic())
+            ready = self.selector.select(timeout)
+            for key, events in ready:
+                if key.data is None:
+                    try:
+                        self.wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._serve(key.data, key.fd, events)
+            for client in list(self.pending):
+                self.pending.discard(client)
+                if self.fds.get(client) is not None:
+                    self._serve(client, self.fds[client], selectors.EVENT_READ)
+            # loop_write() checks want_write() before it drops write interest; a publish() on
+            # another thread in between does not ask again, so re-check the clients that published
+            with self.lock:
+                kicked, self.kicked = self.kicked, set()
+            for client in kicked:
+                fd = self.fds.get(client)
+                if fd is not None and client.want_write():
+                    self._set_write(client, fd, True)
+            self._run_calls()
+            now = time.monotonic()
+            if now >= next_misc:
+                next_misc = now + misc_s
+                for client in list(self.clients):
+                    if client.socket() is not None:
+                        client.loop_misc()
+                    if client.is_connected():
+                        client.reconnect_delay = 0.0  # backoff restarts once a CONNACK got through
+        self.selector.close()
+        self.wake_r.close()
+        self.wake_w.close()
+
+    def _serve(self, client, fd, events):
+        try:
+            if events & selectors.EVENT_READ:
+                client.loop_read()
+            # the read may have closed (and reconnect replaced) the socket
+            if events & selectors.EVENT_WRITE and self.fds.get(client) == fd:
+                client.loop_write()
+                # paho skips its unregister callback when it thinks interest was never
+                # registered (re-registered by the pass above): drop it here as well
+                if self.fds.get(client) == fd and not client.want_write():
+                    self._set_write(client, fd, False)
+            sock = client.socket()
+            if sock is not None and self.fds.get(client) == fd and getattr(sock, "pending", None) and sock.pending():
+                self.pending.add(client)
+        except Exception as e:
+            print(f"[reactor] {client._client_id.decode(errors='replace')}: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        self.call(lambda: None)
+
+
+class MqttReactor:
+    def __init__(self, threads=1, misc_s=1.0, reconnect_min_s=1.0, reconnect_max_s=120.0):
+        if threads < 1:
+            raise ValueError("threads must be >= 1")
+        self.misc_s = misc_s
+        self.reconnect_min_s = reconnect_min_s
+        self.reconnect_max_s = reconnect_max_s
+        self.loops = [IoLoop(self, f"mqtt-io-{i}") for i in range(threads)]
+        self.lock = Lock()
+        self.retry = Condition(self.lock)
+        self.reconnects = []  # heap of (due, n, client)
+        self.seq = 0
+        self.reconnect_thread = None
+        self.stopped = False
+
+    def attach(self, client):
+        """Serve client from the least-loaded I/O thread."""
+        with self.lock:
+            loop = min(self.loops, key=lambda l: l.assigned)
+            loop.assigned += 1
+            client.io_loop = loop
+        # queued in order: the socket is registered before any write interest published later
+        loop.hook(client)
+        loop.call(loop.add, client)
+
+    def detach(self, client):
+        """Stop serving client; returns once its I/O thread no longer touches it."""
+        loop = client.io_loop
+        if loop is None:
+            return
+        with self.lock:
+            client.io_loop = None
+            loop.assigned -= 1
+        done = Event()
+        loop.call(loop.remove, client, done)
+        if threading.get_ident() != loop.thread.ident:
+            done.wait(5.0)
+
+    def schedule_reconnect(self, client):
+        delay = client.reconnect_delay = min(self.reconnect_max_s,
+                                             max(self.reconnect_min_s, 2.0 * client.reconnect_delay))
+        with self.lock:
+            self.seq += 1
+            heapq.heappush(self.reconnects, (time.monotonic() + delay, self.seq, client))
+            if self.reconnect_thread is None:
+                self.reconnect_thread = Thread(target=self._reconnect_loop, name="mqtt-reconnect", daemon=True)
+                self.reconnect_thread.start()
+            self.retry.notify()
+
+    def _reconnect_loop(self):
+        while True:
+            with self.lock:
+                while not self.stopped and (not self.reconnects or self.reconnects[0][0] > time.monotonic()):
+                    self.retry.wait(self.reconnects[0][0] - time.monotonic() if self.reconnects else None)
+                if self.stopped:
+                    return
+                _, _, client = heapq.heappop(self.reconnects)
+            if client.io_loop is None or client.stopping or client.socket() is not None:
+                continue  # detached, disconnecting, or already back
+            try:
+                client.reconnect()  # blocking TCP connect + TLS handshake; on_socket_open registers it
+            except Exception as e:
+                print(f"[reactor] reconnect of {client._client_id.decode(errors='replace')} failed: {e}")
+                self.schedule_reconnect(client)
+
+    def stats(self):
+        return {"io_threads": len(self.loops), "clients": sum(l.assigned for l in self.loops),
+                "sockets": sum(len(l.fds) for l in self.loops)}
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.retry.notify()
+        for loop in self.loops:
+            loop.stop()
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200, help="number of device connections")
+    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--cn", default="monitor-local", help="certificate identity used for every connection")
+    parser.add_argument("--io-threads", type=int, default=1, help="reactor I/O threads")
+    parser.add_argument("--threaded", action="store_true", help="one paho network thread per client instead")
+    parser.add_argument("--seconds", type=float, default=5.0, help="publish once per second for this long")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    reactor = None if args.threaded else MqttReactor(args.io_threads)
+    threads0, rss0 = threading.active_count(), rss_kb()
+    clients = []
+    for i in range(args.clients):
+        clients.append(make_mqtt_client(args.cn, broker_host=args.broker, broker_port=args.port,
+                                        client_id=f"reactor-bench-{i}", reactor=reactor))
+    time.sleep(1.0)
+    connected = sum(1 for c in clients if c.is_connected())
+    for _ in range(int(args.seconds)):
+        for i, c in enumerate(clients):
+            c.publish(f"electrolyser/bench/reactor/{i}", "1", qos=1)
+        time.sleep(1.0)
+    print(f"{'threaded' if args.threaded else f'reactor ({args.io_threads} I/O threads)'}: "
+          f"{connected}/{len(clients)} connected, +{threading.active_count() - threads0} threads, "
+          f"+{(rss_kb() - rss0) / 1024:.1f} MB RSS")
+    for c in clients:
+        c.loop_stop()
+        c.disconnect()
+    if reactor:
+        reactor.stop()
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,17 @@ Professional digital twin for two-electrolyser plant (EL1, EL2) + 2 irradiance s
 Features:
 - PV irradiance day-cycle (sine) + optional random weather events
 - Buck converter "controller" that aims to drive a reference current (I_ref) while keeping V_stack <= V_max
-- Electrolyser stack simplified model: V_stack = N*(U_rev + R_ohm * I_stack)
-- H2 production via Faraday's law; integrator -> tank pressure using ideal gas law
-- Per-device MQTT connections using existing certs/clients CN directories
+- Electrolyser stack model: linear V_stack = N*(U_rev + R_ohm * I_stack) (default), or a
+  polarization curve (activation/ohmic/concentration, temperature dependent) evaluated from
+  per-twin lookup tables (--stack-model polarization, see polarization.py)
+- H2 production via Faraday's law; integrator -> tank pressure using ideal gas law, or (default)
+  a plant gas network: stacks, buffer tanks, shared H2 header, storage and O2 vent header
+  solved together each physics step, so over-pressure and O2 blockage spread through the
+  piping (--gas-network shared|isolated, see gas_network.py)
+- Per-device MQTT connections using existing certs/clients CN directories, optionally spread over
+  several brokers by consistent hashing (--broker a:8883,b:8884, see broker_pool.py); their
+  sockets are served by one shared I/O thread instead of a paho thread each (--io-threads,
+  see mqtt_reactor.py)
 - Publishes sensor JSON payloads to topics:
   electrolyser/plant-A/ELx/cell/<n>/voltage
   electrolyser/plant-A/ELx/stack/current
@@ -21,9 +29,31 @@ Features:
   electrolyser/plant-A/ELx/...
   electrolyser/plant-A/irradiance/1, /2
 - Safety rules and trip events published to electrolyser/plant-A/<EL>/status
+- Derived KPIs (power, energy, H2 yield, specific energy, efficiencies) integrated every
+  physics step and published at a low rate to electrolyser/plant-A/<EL>/kpi/... (see kpi.py)
+- MQTT v5 topic aliases on every publisher (first publish per connection carries the topic,
+  later ones only a 2-byte alias); bytes on wire with/without aliases are reported
+- Checkpoint / warm restart (--checkpoint): twin and plant state, active faults, RNG state and
+  sequence counters saved periodically to a compact binary file and restored at startup
+- On-demand profiling over electrolyser/control/profile: sampled stacks (collapsed, for
+  flamegraphs) or cProfile of the running loop for N seconds, result announced on
+  electrolyser/control/profile/result (see profiler.py)
+- Multi-rate scheduling: physics integrated at a fine fixed step (--physics-dt, default 10 ms),
+  each sensor published at its own rate (--dt base period, --fast-rate/--slow-rate, --sensor-rate)
+- Phase-spread publishing: each sensor gets a fixed offset within its period, so a tick's
+  messages go out spread over the tick instead of in one burst (--publish-spread even|hash|none,
+  --publish-jitter); timestamps stay the exact sample times (see scheduler.py)
 
 Run:
   python3 clients/python/plant_sim.py
+  python3 clients/python/plant_sim.py --physics-dt 0.01 --fast-rate 10 --slow-rate 0.2
+  python3 clients/python/plant_sim.py --sensor-rate stack_current=20 --sensor-rate tank_pressure=0.5
+  python3 clients/python/plant_sim.py --stack-model polarization --cell-area 1.0
+  python3 clients/python/plant_sim.py --checkpoint state/plant.ckpt --checkpoint-interval 10
+  python3 clients/python/plant_sim.py --broker 127.0.0.1:8883,127.0.0.1:8884 --shard-by sensor
+  python3 clients/python/plant_sim.py --gas-network isolated
+  python3 clients/python/plant_sim.py --publish-spread even --publish-jitter 0.05
+  python3 clients/python/plant_sim.py --io-threads 2
 """
 
 import math
@@ -33,9 +63,20 @@ import ssl
 import pathlib
 import random
 import argparse
+import threading
 from threading import Thread, Event, Lock
 from paho.mqtt import client as mqtt
 
+from scheduler import MultiRateScheduler, SPREAD_MODES, parse_rate_overrides
+from kpi import KPI_TOPICS, KpiCalculator
+from polarization import PolarizationModel
+from topic_alias import TopicAliasPublisher, combined_stats
+from broker_pool import BrokerPool, MultiBrokerClient, parse_brokers
+from mqtt_reactor import MqttReactor, ReactorClient
+from gas_network import build_plant_network
+from profiler import LiveProfiler, PROFILE_TOPIC
+import checkpoint
+
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 
 # Fault Definitions
@@ -74,14 +115,17 @@ FAULT_NAMES = {
     "telemetry_dropout": FAULT_TELEMETRY_DROPOUT,
     "over_pressure": FAULT_OVER_PRESSURE
 }
+FAULT_IDS = {fid: name for name, fid in FAULT_NAMES.items()}
 
 class FaultInjector:
     def __init__(self):
         self.active_faults = set()
         self.lock = Lock()
         self.params = {} # Store fault-specific params if needed
+        self.verbose = True
 
-    def set_fault(self, fault_name, active=True):
+    def set_fault(self, fault_name, active=True, severity=1.0):
+        # severity scales the fault's effect; 1.0 is the nominal behaviour described below
         fid = FAULT_NAMES.get(fault_name)
         if fid is None:
             print(f"Unknown fault: {fault_name}")
@@ -89,19 +133,41 @@ class FaultInjector:
         with self.lock:
             if active:
                 self.active_faults.add(fid)
-                print(f"Fault activated: {fault_name}")
+                self.params[fid] = severity
+                if self.verbose:
+                    print(f"Fault activated: {fault_name}" + (f" (severity {severity:g})" if severity != 1.0 else ""))
             else:
                 self.active_faults.discard(fid)
-                print(f"Fault cleared: {fault_name}")
+                self.params.pop(fid, None)
+                if self.verbose:
+                    print(f"Fault cleared: {fault_name}")
+
+    def severity(self, fault_id):
+        return self.params.get(fault_id, 1.0)
 
     def is_active(self, fault_id):
         with self.lock:
             return fault_id in self.active_faults
 
+    def snapshot(self):
+        # one lock acquisition per physics step instead of one per fault check
+        with self.lock:
+            return frozenset(self.active_faults)
+
     def clear_all(self):
         with self.lock:
             self.active_faults.clear()
 
+    def get_state(self):
+        # by name, so checkpoints survive renumbering of the fault ids
+        with self.lock:
+            return {FAULT_IDS[fid]: self.params.get(fid, 1.0) for fid in sorted(self.active_faults)}
+
+    def set_state(self, faults):
+        with self.lock:
+            self.active_faults = {FAULT_NAMES[name] for name in faults}
+            self.params = {FAULT_NAMES[name]: severity for name, severity in faults.items()}
+
 # Constants (tweakable)
 FARADAY = 96485.33212  # C/mol
 U_REV = 1.23  # V per cell
@@ -113,6 +179,20 @@ R_GAS = 8.31446261815324  # J/(mol·K)
 H2_MOLAR_MASS = 2.01588  # g/mol (not used directly)
 ATM_PRESSURE_PA = 101325.0  # Pa
 
+# derived constants (hoisted out of the physics step)
+V_MOLAR_M3 = (R_GAS * TANK_TEMPERATURE_K) / ATM_PRESSURE_PA  # m3/mol at tank temperature, 1 atm
+# PV model: panel array I_sc ~5 A at 1000 W/m2, usable voltage ~40 V, derated 10 %
+PV_POWER_PER_WM2 = 5.0 / 1000.0 * 40.0 * 0.9  # W per W/m2 of irradiance
+
+STACK_MODELS = ("linear", "polarization")
+GAS_NETWORKS = ("shared", "isolated")
+
+# twin attributes saved in a checkpoint (besides seq, cell voltages, faults and KPI totals)
+TWIN_STATE_FIELDS = ("U_rev", "R_ohm", "I_stack", "V_stack", "stack_temp", "stack_temp_reading", "stack_pressure",
+                     "h2_flow_Lpm", "o2_flow_Lpm", "water_flow", "eff_variation", "tank_moles",
+                     "tank_pressure_pa", "tank_pressure_bar", "h2_captured_mol", "tripped", "trip_reason",
+                     "fault_timer")
+
 # default control params
 I_REF = 1.8  # desired stack current A (can be scaled by PV availability)
 V_MAX_PER_CELL = 2.2  # trip if per-cell > this
@@ -134,8 +214,53 @@ SENSORS_PER_EL = [
     ("water_flow", None),
 ]
 
+# per-EL sensor -> (topic suffix under electrolyser/plant-A/<EL>/, unit, rounding digits)
+SENSOR_TOPICS = {
+    **{f"cell_{n}_voltage": (f"cell/{n}/voltage", "V", 4) for n in range(1, N_CELLS + 1)},
+    "stack_current": ("stack/current", "A", 4),
+    "stack_temperature": ("stack/temperature", "C", 3),
+    "stack_pressure": ("stack/pressure", "bar", 3),
+    "h2_flow_rate": ("h2/flow_rate", "L/min", 4),
+    "o2_flow_rate": ("o2/flow_rate", "L/min", 4),
+    "tank_pressure": ("tank/pressure", "bar", 4),
+    "water_flow": ("water_flow", "L/min", 3),
+}
+
+# twin attribute backing each non-cell sensor
+SENSOR_ATTRS = {
+    "stack_current": "I_stack",
+    "stack_temperature": "stack_temp_reading",
+    "stack_pressure": "stack_pressure",
+    "h2_flow_rate": "h2_flow_Lpm",
+    "o2_flow_rate": "o2_flow_Lpm",
+    "tank_pressure": "tank_pressure_bar",
+    "water_flow": "water_flow",
+}
+
+# signals that follow the current dynamics (tau ~ 2 s) vs. slow thermal / fill signals;
+# used by --fast-rate / --slow-rate
+FAST_SENSORS = ("stack_current",) + tuple(f"cell_{n}_voltage" for n in range(1, N_CELLS + 1))
+SLOW_SENSORS = ("stack_temperature", "tank_pressure")
+KPI_RATE = 0.1  # Hz, default publish rate of the derived KPI topics (override with --sensor-rate kpi=HZ)
+# sensors sampled at the same instants when publishes are phase-spread: consumers pair them by
+# timestamp (the fault detector's H2/O2 flow ratio)
+PHASE_GROUPS = {"h2_flow_rate": "gas_flow", "o2_flow_rate": "gas_flow"}
+
+def sensor_cn(el, sensor):
+    return f"sensor-{el}-{sensor}"
+
 # MQTT helper: create a client for each CN
-def make_mqtt_client(cn: str, broker_host="127.0.0.1", broker_port=8883, client_id=None):
+def make_mqtt_client(cn: str, broker_host="127.0.0.1", broker_port=8883, client_id=None, topic_aliases=False,
+                     pool=None, shard_key=None, reactor=None):
+    # several brokers ("host:port,host:port"): a publisher sharded through pool, or a merged subscriber
+    if pool is not None:
+        return pool.client(shard_key or cn, lambda host, port: make_mqtt_client(
+            cn, host, port, client_id=client_id, topic_aliases=topic_aliases, reactor=reactor))
+    brokers = parse_brokers(broker_host, broker_port)
+    if len(brokers) > 1:
+        return MultiBrokerClient(brokers, lambda host, port: make_mqtt_client(
+            cn, host, port, client_id=client_id, topic_aliases=topic_aliases, reactor=reactor))
+    broker_host, broker_port = brokers[0]
     ca = ROOT / "certs/ca/ca.crt"
     cert = ROOT / f"certs/clients/{cn}/client.crt"
     key = ROOT / f"certs/clients/{cn}/client.key"
@@ -143,10 +268,17 @@ def make_mqtt_client(cn: str, broker_host="127.0.0.1", broker_port=8883, client_
     if client_id is None:
         client_id = cn
     
-    client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
+    # with a reactor, loop_start() hands the socket to its shared I/O thread (see mqtt_reactor.py)
+    if reactor is not None:
+        client = ReactorClient(reactor, client_id=client_id, protocol=mqtt.MQTTv5)
+    else:
+        client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
     client.tls_set(ca_certs=str(ca), certfile=str(cert), keyfile=str(key),
                    tls_version=ssl.PROTOCOL_TLS_CLIENT)
     client.tls_insecure_set(False)
+    if topic_aliases:
+        # wrapped before connect() so the CONNACK's TopicAliasMaximum is seen
+        client = TopicAliasPublisher(client)
     client.connect(broker_host, broker_port, keepalive=30)
     client.loop_start()
     return client
@@ -157,16 +289,19 @@ def publish_json(client, topic, obj):
     client.publish(topic, payload, qos=1)
 
 class ElectrolyserTwin:
-    def __init__(self, el_id, cert_cn_prefix="sensor", initial_irradiance=800.0):
+    def __init__(self, el_id, cert_cn_prefix="sensor", initial_irradiance=800.0, stack_model="linear",
+                 cell_area_cm2=1.0):
         self.el = el_id  # "EL1" or "EL2" or "PLANT"
         self.cell_count = N_CELLS
         self.N = N_CELLS
         self.U_rev = U_REV * random.uniform(0.98, 1.02)
         self.R_ohm = R_OHM * random.uniform(0.95, 1.05)
+        self.set_stack_model(stack_model, cell_area_cm2)
         self.I_stack = 0.0
         self.V_stack = self.N * (self.U_rev + self.R_ohm * 0.0)
         self.cell_voltages = [self.V_stack / self.N] * self.N
-        self.stack_temp = 45.0 + random.uniform(-1.0, 1.0)
+        self.stack_temp = 45.0 + random.uniform(-1.0, 1.0)  # true stack temperature (drives the model)
+        self.stack_temp_reading = self.stack_temp  # what the temperature sensor reports
         self.stack_pressure = 1.2 + random.uniform(-0.05, 0.05)
         self.h2_flow_Lpm = 0.0
         self.o2_flow_Lpm = 0.0
@@ -175,9 +310,12 @@ class ElectrolyserTwin:
         self.tank_moles = 0.0  # moles in tank
         # start with ambient or small pressure
         self.tank_pressure_pa = ATM_PRESSURE_PA
+        self.tank_pressure_bar = self.tank_pressure_pa / 1e5
+        self.h2_captured_mol = 0.0  # H2 sent to storage since start (KPI h2_stored with a gas network)
+        self.gas = None  # plant GasNetwork this stack feeds (None: own isolated tank)
         self.cert_prefix = cert_cn_prefix
         self.clients = {}  # per-device mqtt clients keyed by CN
-        self.seq = 0
+        self.seq = {}  # per-sensor sequence counters (sensor name or "status" -> next id)
         # state flags
         self.tripped = False
         self.trip_reason = None
@@ -187,8 +325,43 @@ class ElectrolyserTwin:
 
         # compute initial tank moles from pressure using ideal gas (n = PV/RT)
         self.tank_moles = (self.tank_pressure_pa * TANK_VOLUME_M3) / (R_GAS * TANK_TEMPERATURE_K)
-
-    def connect_clients(self, broker_host="127.0.0.1", broker_port=8883):
+        self.kpi = KpiCalculator(el_id, n_cells=self.N, tank_volume_m3=TANK_VOLUME_M3,
+                                 tank_temperature_k=TANK_TEMPERATURE_K)
+
+    def set_stack_model(self, stack_model, cell_area_cm2=1.0):
+        if stack_model == "polarization":
+            # the table is built on first use, so a restored U_rev / R_ohm does not cost a second build
+            self.pol_table = None
+            self.cell_voltage_at = self._cell_voltage_first
+        elif stack_model == "linear":
+            self.cell_voltage_at = self._cell_voltage_linear
+        else:
+            raise ValueError(f"unknown stack model {stack_model!r} (expected one of {STACK_MODELS})")
+        self.stack_model = stack_model
+        self.cell_area_cm2 = cell_area_cm2
+
+    def get_state(self):
+        state = {f: getattr(self, f) for f in TWIN_STATE_FIELDS}
+        state["seq"] = dict(self.seq)
+        state["cell_voltages"] = list(self.cell_voltages)
+        state["faults"] = self.fault_injector.get_state()
+        state["kpi"] = self.kpi.get_state()
+        return state
+
+    def set_state(self, state):
+        for f in TWIN_STATE_FIELDS:
+            if f in state:  # fields added later keep their defaults with an older checkpoint
+                setattr(self, f, state[f])
+        self.seq = dict(state["seq"])
+        self.cell_voltages = list(state["cell_voltages"])
+        self.fault_injector.set_state(state["faults"])
+        self.kpi.set_state(state["kpi"])
+        # the stack model itself comes from the command line; its table carries U_rev / R_ohm
+        if self.stack_model == "polarization":
+            self.set_stack_model(self.stack_model, self.cell_area_cm2)
+
+    def connect_clients(self, broker_host="127.0.0.1", broker_port=8883, topic_aliases=False, pool=None,
+                        shard_by="sensor", reactor=None):
         # create a client for each sensor CN (one per sensor type)
         # CN naming MUST match your cert dir names
         for sensor_name, cell_no in SENSORS_PER_EL:
@@ -198,7 +371,9 @@ class ElectrolyserTwin:
             else:
                 cn = f"sensor-{self.el}-{sensor_name}"
             try:
-                c = make_mqtt_client(cn, broker_host=broker_host, broker_port=broker_port)
+                c = make_mqtt_client(cn, broker_host=broker_host, broker_port=broker_port,
+                                     topic_aliases=topic_aliases, pool=pool,
+                                     shard_key=self.el if shard_by == "el" else cn, reactor=reactor)
                 self.clients[cn] = c
             except Exception as e:
                 print(f"[{self.el}] Error creating client {cn}: {e}")
@@ -211,6 +386,20 @@ class ElectrolyserTwin:
             except Exception:
                 pass
 
+    def _cell_voltage_linear(self, current):
+        return self.U_rev + self.R_ohm * current
+
+    def _cell_voltage_first(self, current):
+        # same per-twin spread as the linear model, baked into this twin's table
+        model = PolarizationModel(area_cm2=self.cell_area_cm2, u_scale=self.U_rev / U_REV,
+                                  r_scale=self.R_ohm / R_OHM)
+        self.pol_table = model.build_table()
+        self.cell_voltage_at = self._cell_voltage_table
+        return self._cell_voltage_table(current)
+
+    def _cell_voltage_table(self, current):
+        return self.pol_table.cell_voltage(current, self.stack_temp)
+
     def update_from_pv(self, irradiance_wpm2, dt_seconds):
         """
         Determine available PV power roughly proportional to irradiance.
@@ -219,16 +408,12 @@ class ElectrolyserTwin:
          - else reduce current proportionally
         Also simulate small PV coupling losses.
         """
-        # PV model: current capability scales with irradiance
-        # Simplified: I_sc scales linearly to irradiance; assume panel array short-circuit ~5A@1000W/m2
-        panel_isc_per_panel = 5.0  # A at 1000 W/m2
-        isc = panel_isc_per_panel * (irradiance_wpm2 / 1000.0)
-        # assume usable PV voltage around 40V and we step-down to 10V, so available power:
-        pv_voltage = 40.0
-        pv_power = isc * pv_voltage * 0.9  # derate 10%
+        active = self.fault_injector.snapshot()
+        # PV model: current capability scales with irradiance (I_sc ~5A@1000W/m2, ~40V, derated 10%),
+        # and we step down to the stack voltage
+        pv_power = PV_POWER_PER_WM2 * irradiance_wpm2
         # required stack power for I_ref
-        # compute V_stack for last known I (approx)
-        V_stack_est = self.N * (self.U_rev + self.R_ohm * I_REF)
+        V_stack_est = self.N * self.cell_voltage_at(I_REF)
         required_power = I_REF * V_stack_est
 
         # control decision
@@ -242,31 +427,42 @@ class ElectrolyserTwin:
             else:
                 I_target = 0.0
 
+        # 12. Loose or corroded high-current bolt: the extra contact resistance limits the
+        # reachable current (applied to the target so the effect does not compound per step)
+        if FAULT_LOOSE_BOLT in active:
+            I_target *= 1.0 - 0.25 * self.fault_injector.severity(FAULT_LOOSE_BOLT)
+
+        # 6. DC-DC converter / MPPT failure: the converter delivers only a fraction of the
+        # target and the current drops to it at once (on the target, so it does not compound)
+        if FAULT_DCDC_FAILURE in active:
+            I_target *= max(0.0, 1.0 - self.fault_injector.severity(FAULT_DCDC_FAILURE))
+            self.I_stack = min(self.I_stack, I_target)
+
         # simple first-order approach to change I_stack towards I_target
         tau = 2.0
         self.I_stack += (I_target - self.I_stack) * min(1.0, dt_seconds / tau)
 
         # compute V_stack
-        self.V_stack = self.N * (self.U_rev + self.R_ohm * self.I_stack)
+        self.V_stack = self.N * self.cell_voltage_at(self.I_stack)
         # update cell voltages
         per_cell = self.V_stack / self.N
         self.cell_voltages = [per_cell + random.uniform(-0.02, 0.02) for _ in range(self.N)]
 
         # temperature rises slightly with current
-        self.stack_temp += 0.01 * (abs(self.I_stack) - 1.5) * (dt_seconds / 60.0) + random.uniform(-0.02, 0.02)
-        # stack pressure small random drift
-        self.stack_pressure += random.uniform(-0.005, 0.005)
+        # random-walk terms scale with sqrt(dt) so the drift per second does not depend on the physics step
+        walk = math.sqrt(dt_seconds)
+        self.stack_temp += 0.01 * (abs(self.I_stack) - 1.5) * (dt_seconds / 60.0) + random.uniform(-0.02, 0.02) * walk
 
         # H2 production via Faraday: molar flow (mol/s)
         eta_F = 0.95 * self.eff_variation
         n_dot = eta_F * (self.N * self.I_stack) / (2.0 * FARADAY)  # mol/s
         # Convert mol/s to L/min at conditions: V_molar (m3/mol) = RT/P; convert to liters
-        V_molar_m3 = (R_GAS * TANK_TEMPERATURE_K) / (ATM_PRESSURE_PA)
-        # flow in liters per minute
-        flow_m3_per_s = n_dot * V_molar_m3
+        flow_m3_per_s = n_dot * V_MOLAR_M3
         self.h2_flow_Lpm = flow_m3_per_s * 1000.0 * 60.0
 
-        # oxygen is roughly stoichiometric (half molar to H2)
+        # oxygen is roughly stoichiometric (half molar to H2). With the gas network it is still
+        # metered from production, not from the solved outlet flow: a current transient lifts the
+        # water seal as well, and a healthy stack must not read as blocked
         self.o2_flow_Lpm = self.h2_flow_Lpm / 2.0 * 0.99  # small inefficiency
 
         # integrate tank moles (assume some fraction of H2 goes to tank)
@@ -274,10 +470,24 @@ class ElectrolyserTwin:
         mol_added = n_dot * dt_seconds  # mol added during dt
         # assume fraction f_capture goes to tank (some released to vent, leaks)
         f_capture = 0.9
-        self.tank_moles += mol_added * f_capture
-
-        # recompute tank pressure (ideal gas)
-        self.tank_pressure_pa = (self.tank_moles * R_GAS * TANK_TEMPERATURE_K) / TANK_VOLUME_M3
+        self.h2_captured_mol += mol_added * f_capture
+        if self.gas is None:
+            # stack pressure small random drift
+            self.stack_pressure += random.uniform(-0.005, 0.005) * walk
+            self.tank_moles += mol_added * f_capture
+            # recompute tank pressure (ideal gas)
+            self.tank_pressure_pa = (self.tank_moles * R_GAS * TANK_TEMPERATURE_K) / TANK_VOLUME_M3
+        else:
+            # plant gas network: production enters this stack's nodes, readings come from the
+            # last network solve (PlantSimulator.step solves after all twins, one step behind)
+            net, el = self.gas, self.el
+            net.set_source(f"{el}/h2", n_dot * f_capture)
+            net.set_source(f"{el}/o2", n_dot / 2.0 * 0.99)
+            self.tank_pressure_pa = net.pressure(f"{el}/tank")
+            self.tank_moles = net.moles(f"{el}/tank")
+            # transmitter on the higher-pressure side of the stack
+            p_stack = max(net.pressure(f"{el}/h2"), net.pressure(f"{el}/o2"))
+            self.stack_pressure = p_stack / 1e5 + random.uniform(-0.005, 0.005)
 
         # convert tank pressure to bar for telemetry
         self.tank_pressure_bar = self.tank_pressure_pa / 1e5
@@ -294,91 +504,121 @@ class ElectrolyserTwin:
         self.fault_timer += dt_seconds
         
         # 1. Membrane pinhole
-        if self.fault_injector.is_active(FAULT_MEMBRANE_PINHOLE):
+        if FAULT_MEMBRANE_PINHOLE in active:
             # One or two cell voltages jump 300–800 mV higher
             # H2 flow rate becomes higher than expected (simulated by boosting flow calc)
-            self.cell_voltages[0] += 0.5 
-            if self.N > 1: self.cell_voltages[1] += 0.4
-            self.h2_flow_Lpm *= 1.2
+            sev = self.fault_injector.severity(FAULT_MEMBRANE_PINHOLE)
+            self.cell_voltages[0] += 0.5 * sev
+            if self.N > 1: self.cell_voltages[1] += 0.4 * sev
+            self.h2_flow_Lpm *= 1.0 + 0.2 * sev
 
         # 2. Gas crossover
-        if self.fault_injector.is_active(FAULT_GAS_CROSSOVER):
+        if FAULT_GAS_CROSSOVER in active:
             # H2/O2 flow ratio deviation (>2.1 or <1.9)
             # Normal is ~2.0. Let's make it 2.3
-            self.o2_flow_Lpm = self.h2_flow_Lpm / 2.3
+            self.o2_flow_Lpm = self.h2_flow_Lpm / (2.0 + 0.3 * self.fault_injector.severity(FAULT_GAS_CROSSOVER))
 
         # 3. Cell flooding
-        if self.fault_injector.is_active(FAULT_CELL_FLOODING):
+        if FAULT_CELL_FLOODING in active:
             # One or more cells drop to <1.4 V, high cell-to-cell spread
-            self.cell_voltages[2] = 1.35
-            self.cell_voltages[3] = 1.38
+            sev = self.fault_injector.severity(FAULT_CELL_FLOODING)
+            self.cell_voltages[2] += (1.35 - self.cell_voltages[2]) * sev
+            self.cell_voltages[3] += (1.38 - self.cell_voltages[3]) * sev
             # Others normal-ish
 
         # 4. Cell dry-out
-        if self.fault_injector.is_active(FAULT_CELL_DRYOUT):
+        if FAULT_CELL_DRYOUT in active:
             # All cells climb >2.2 V, temp rising
+            sev = self.fault_injector.severity(FAULT_CELL_DRYOUT)
             for i in range(self.N):
-                self.cell_voltages[i] = max(self.cell_voltages[i], 2.25)
-            self.stack_temp += 5.0 * dt_seconds # Fast rise
+                self.cell_voltages[i] = max(self.cell_voltages[i], 2.2 + 0.05 * sev)
+            self.stack_temp += 5.0 * sev * dt_seconds # Fast rise
 
         # 5. Water pump failure
-        if self.fault_injector.is_active(FAULT_PUMP_FAILURE):
-            self.water_flow = 0.0
+        if FAULT_PUMP_FAILURE in active:
+            self.water_flow *= max(0.0, 1.0 - self.fault_injector.severity(FAULT_PUMP_FAILURE))
             # Temp rises fast if current is high
             if self.I_stack > 10.0:
                 self.stack_temp += 2.0 * dt_seconds
 
-        # 6. DC-DC converter / MPPT failure
-        if self.fault_injector.is_active(FAULT_DCDC_FAILURE):
-            self.I_stack = 0.0
-            self.V_stack = self.N * U_REV # Open circuit voltage approx
+        # 6. DC-DC converter / MPPT failure (current limited above, before the first-order update)
+        if FAULT_DCDC_FAILURE in active:
+            if self.I_stack == 0.0:
+                self.V_stack = self.N * U_REV # Open circuit voltage approx
+            else:
+                self.V_stack = self.N * self.cell_voltage_at(self.I_stack)
             self.cell_voltages = [self.V_stack / self.N] * self.N
 
         # 7. Sudden solar transient damage
-        if self.fault_injector.is_active(FAULT_SOLAR_TRANSIENT):
+        if FAULT_SOLAR_TRANSIENT in active:
             # Spikes > 600 A for < 1 s repeatedly
             if (self.fault_timer % 2.0) < 0.5:
-                self.I_stack = 650.0
+                self.I_stack = 650.0 * self.fault_injector.severity(FAULT_SOLAR_TRANSIENT)
             # This would likely trip safety immediately, but we simulate the value first
 
         # 8. Gas separator liquid level too high/low
-        if self.fault_injector.is_active(FAULT_LEVEL_SENSOR):
+        if FAULT_LEVEL_SENSOR in active:
             # tank_pressure erratic
-            noise = random.uniform(-2.0, 2.0)
+            noise = random.uniform(-2.0, 2.0) * self.fault_injector.severity(FAULT_LEVEL_SENSOR)
             self.tank_pressure_bar += noise
 
         # 9. Irradiance sensor drift (Handled in PlantSimulator or here if local)
         # 10. Individual cell voltage sensor drift
-        if self.fault_injector.is_active(FAULT_VOLTAGE_SENSOR_DRIFT):
-            self.cell_voltages[4] = 0.000 # Stuck at 0
+        if FAULT_VOLTAGE_SENSOR_DRIFT in active:
+            # Stuck at 0 (severity < 1: stuck at that fraction of the true reading)
+            self.cell_voltages[4] *= max(0.0, 1.0 - self.fault_injector.severity(FAULT_VOLTAGE_SENSOR_DRIFT))
 
-        # 11. Stack temperature sensor failure
-        if self.fault_injector.is_active(FAULT_TEMP_SENSOR_FAILURE):
-            self.stack_temp = 0.0
+        # 11. Stack temperature sensor failure: only the reading fails, the stack keeps its temperature
+        if FAULT_TEMP_SENSOR_FAILURE in active:
+            self.stack_temp_reading = 0.0
+        else:
+            self.stack_temp_reading = self.stack_temp
 
         # 12. Loose or corroded high-current bolt
-        if self.fault_injector.is_active(FAULT_LOOSE_BOLT):
-            # 20-30% lower current than expected
-            self.I_stack *= 0.75
+        if FAULT_LOOSE_BOLT in active:
+            # 20-30% lower current than expected (current limited above, before the first-order update)
             # Recalculate V_stack based on new I
-            self.V_stack = self.N * (self.U_rev + self.R_ohm * self.I_stack)
+            self.V_stack = self.N * self.cell_voltage_at(self.I_stack)
             self.cell_voltages = [self.V_stack / self.N] * self.N
 
         # 13. O2-side blockage
-        if self.fault_injector.is_active(FAULT_O2_BLOCKAGE):
-            self.o2_flow_Lpm *= 0.2
+        if self.gas is not None:
+            # partly closed separator outlet: anode pressure rises until the water seal lifts
+            # (takes effect in this step's network solve); the meter on the outlet line only
+            # sees what the restriction lets through
+            opening = 1.0
+            if FAULT_O2_BLOCKAGE in active:
+                opening = max(0.0, 1.0 - 0.8 * self.fault_injector.severity(FAULT_O2_BLOCKAGE))
+                self.o2_flow_Lpm *= opening
+            self.gas.set_opening(f"{self.el}/o2_outlet", opening)
+        elif FAULT_O2_BLOCKAGE in active:
+            sev = self.fault_injector.severity(FAULT_O2_BLOCKAGE)
+            self.o2_flow_Lpm *= max(0.0, 1.0 - 0.8 * sev)
             # Pressure rises? (Simulated locally)
-            self.stack_pressure += 0.5 * dt_seconds
+            self.stack_pressure += 0.5 * sev * dt_seconds
 
-        # 14. MQTT / telemetry dropout (Handled in publish_all)
+        # 14. MQTT / telemetry dropout (Handled in publish_sensor / publish_status)
         
         # 15. Over-pressure event
-        if self.fault_injector.is_active(FAULT_OVER_PRESSURE):
-            self.tank_pressure_bar = 40.0 # Instant spike
-            self.stack_pressure = 40.0
+        if self.gas is not None:
+            # failed regulator on the high-pressure line into the buffer tank: the buffer and the
+            # stack follow within seconds, the shared header and the other buffers over minutes
+            over = FAULT_OVER_PRESSURE in active
+            self.gas.set_opening(f"{self.el}/regulator", 1.0 if over else 0.0)
+            if over:
+                peak = 30.0 + 10.0 * self.fault_injector.severity(FAULT_OVER_PRESSURE)
+                self.gas.set_pressure(f"{self.el}/hp", peak * 1e5)
+        elif FAULT_OVER_PRESSURE in active:
+            peak = 30.0 + 10.0 * self.fault_injector.severity(FAULT_OVER_PRESSURE)
+            self.tank_pressure_bar = peak # Instant spike
+            self.stack_pressure = peak
 
         # --- END FAULT INJECTION ---
 
+        # h2_stored counts H2 captured since start; with a network the buffer also drains to storage
+        stored = self.tank_moles if self.gas is None else self.h2_captured_mol
+        self.kpi.step(dt_seconds, self.V_stack, self.I_stack, self.h2_flow_Lpm, stored)
+
         # safety checks
         self.check_safety()
 
@@ -396,113 +636,145 @@ class ElectrolyserTwin:
             self.tripped = True
             self.trip_reason = "over_pressure"
 
-    def publish_all(self):
+    def sensor_value(self, sensor):
+        if sensor.startswith("cell_"):
+            return self.cell_voltages[int(sensor.split("_")[1]) - 1]
+        return getattr(self, SENSOR_ATTRS[sensor])
+
+    def next_seq(self, key):
+        n = self.seq.get(key, 0)
+        self.seq[key] = n + 1
+        return n
+
+    def publish_sensor(self, sensor, ts=None):
+        client = self.clients.get(sensor_cn(self.el, sensor))
+        if not client:
+            return
+        # the sample is taken (and numbered) even if it never reaches the broker,
+        # so consumers see dropouts as sequence gaps
+        seq = self.next_seq(sensor)
         # 14. MQTT / telemetry dropout
         if self.fault_injector.is_active(FAULT_TELEMETRY_DROPOUT):
             return # Do not publish anything
 
-        # publish per-sensor payloads using the clients dict
-        ts = time.time()
-        # cell voltages
-        for i, v in enumerate(self.cell_voltages, start=1):
-            cn = f"sensor-{self.el}-cell_{i}_voltage"
-            client = self.clients.get(cn)
-            if client:
-                topic = f"electrolyser/plant-A/{self.el}/cell/{i}/voltage"
-                payload = {
-                    "el": self.el,
-                    "sensor": f"cell_{i}_voltage",
-                    "cell": i,
-                    "unit": "V",
-                    "timestamp": ts,
-                    "value": round(v, 4),
-                    "sequence_id": self.seq
-                }
-                publish_json(client, topic, payload)
-        # stack current
-        cn = f"sensor-{self.el}-stack_current"
-        client = self.clients.get(cn)
-        if client:
-            topic = f"electrolyser/plant-A/{self.el}/stack/current"
-            payload = {"el": self.el, "sensor": "stack_current", "unit": "A", "timestamp": ts, "value": round(self.I_stack, 4), "sequence_id": self.seq}
-            publish_json(client, topic, payload)
-        # stack temp/pressure
-        for name, val in [("stack_temperature", self.stack_temp), ("stack_pressure", self.stack_pressure)]:
-            cn = f"sensor-{self.el}-{name}"
-            client = self.clients.get(cn)
-            if client:
-                topic = f"electrolyser/plant-A/{self.el}/stack/{name.split('_')[-1]}"
-                payload = {"el": self.el, "sensor": name, "unit": "C" if "temp" in name else "bar", "timestamp": ts, "value": round(val, 3), "sequence_id": self.seq}
-                publish_json(client, topic, payload)
-        # gas flows
-        for name, val, unit in [("h2_flow_rate", self.h2_flow_Lpm, "L/min"), ("o2_flow_rate", self.o2_flow_Lpm, "L/min")]:
-            cn = f"sensor-{self.el}-{name}"
-            client = self.clients.get(cn)
-            if client:
-                topic = f"electrolyser/plant-A/{self.el}/{ 'h2' if name.startswith('h2') else 'o2'}/flow_rate"
-                payload = {"el": self.el, "sensor": name, "unit": "L/min", "timestamp": ts, "value": round(val, 4), "sequence_id": self.seq}
-                publish_json(client, topic, payload)
-        # tank pressure
-        cn = f"sensor-{self.el}-tank_pressure"
-        client = self.clients.get(cn)
-        if client:
-            topic = f"electrolyser/plant-A/{self.el}/tank/pressure"
-            payload = {"el": self.el, "sensor": "tank_pressure", "unit": "bar", "timestamp": ts, "value": round(self.tank_pressure_bar, 4), "sequence_id": self.seq}
-            publish_json(client, topic, payload)
-        # water_flow
-        cn = f"sensor-{self.el}-water_flow"
-        client = self.clients.get(cn)
-        if client:
-            topic = f"electrolyser/plant-A/{self.el}/water_flow"
-            payload = {"el": self.el, "sensor": "water_flow", "unit": "L/min", "timestamp": ts, "value": round(self.water_flow, 3), "sequence_id": self.seq}
+        if ts is None:
+            ts = time.time()
+        suffix, unit, ndigits = SENSOR_TOPICS[sensor]
+        payload = {"el": self.el, "sensor": sensor}
+        if sensor.startswith("cell_"):
+            payload["cell"] = int(sensor.split("_")[1])
+        payload.update({
+            "unit": unit,
+            "timestamp": ts,
+            "value": round(self.sensor_value(sensor), ndigits),
+            "sequence_id": seq
+        })
+        publish_json(client, f"electrolyser/plant-A/{self.el}/{suffix}", payload)
+
+    def publish_status(self, ts=None):
+        # We do NOT require monitor-local for per-EL status here; instead publish status via the EL stack_current client to a status topic
+        status_client = self.clients.get(sensor_cn(self.el, "stack_current"))
+        if not status_client:
+            return
+        seq = self.next_seq("status")
+        if self.fault_injector.is_active(FAULT_TELEMETRY_DROPOUT):
+            return
+        if ts is None:
+            ts = time.time()
+        status_topic = f"electrolyser/plant-A/{self.el}/status"
+        status_payload = {
+            "el": self.el,
+            "timestamp": ts,
+            "status": "TRIPPED" if self.tripped else "OPERATIONAL",
+            "reason": self.trip_reason if self.tripped else None,
+            "sequence_id": seq
+        }
+        # prune None fields
+        status_payload = {k: v for k, v in status_payload.items() if v is not None}
+        publish_json(status_client, status_topic, status_payload)
+
+    def publish_kpis(self, ts=None):
+        client = self.clients.get("monitor-local")
+        if not client:
+            return
+        if ts is None:
+            ts = time.time()
+        msgs = list(self.kpi.payloads(ts, lambda name: self.next_seq(f"kpi_{name}")))
+        if self.fault_injector.is_active(FAULT_TELEMETRY_DROPOUT):
+            return
+        for topic, payload in msgs:
             publish_json(client, topic, payload)
 
-        # publish status topic
-        cn = f"monitor-local"
-        mon_client = self.clients.get(cn)
-        # We do NOT require monitor-local for per-EL status here; instead publish status via the EL stack_current client to a status topic
-        status_cn = f"sensor-{self.el}-stack_current"
-        status_client = self.clients.get(status_cn)
-        if status_client:
-            status_topic = f"electrolyser/plant-A/{self.el}/status"
-            status_payload = {
-                "el": self.el,
-                "timestamp": ts,
-                "status": "TRIPPED" if self.tripped else "OPERATIONAL",
-                "reason": self.trip_reason if self.tripped else None,
-                "sequence_id": self.seq
-            }
-            # prune None fields
-            status_payload = {k: v for k, v in status_payload.items() if v is not None}
-            publish_json(status_client, status_topic, status_payload)
-
-        self.seq += 1
+    def publish_all(self, ts=None):
+        # publish every sensor plus status with a common timestamp (single-rate mode)
+        if ts is None:
+            ts = time.time()
+        for sensor in SENSOR_TOPICS:
+            self.publish_sensor(sensor, ts)
+        self.publish_status(ts)
 
 class PlantSimulator:
-    def __init__(self, dt=1.0, broker_host="127.0.0.1", broker_port=8883):
+    def __init__(self, dt=1.0, broker_host="127.0.0.1", broker_port=8883, physics_dt=0.01, sensor_rates=None,
+                 stack_model="linear", cell_area_cm2=1.0, topic_aliases=True, checkpoint=None,
+                 checkpoint_interval=10.0, resume=True, shard_by="sensor", gas_network="shared",
+                 profile_dir=None, publish_spread="even", publish_jitter=0.0, io_threads=1):
         self.broker_host = broker_host
         self.broker_port = broker_port
-        self.dt = dt
+        self.dt = dt  # base publish period (s)
+        self.physics_dt = physics_dt  # fixed integration step (s)
+        self.topic_aliases = topic_aliases
+        self.checkpoint_path = checkpoint  # state file for warm restarts (None = off, see checkpoint.py)
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.checkpointer = None
+        # captures requested on the control topic; files land in profile_dir (default <repo>/profiles)
+        self.profiler = LiveProfiler(profile_dir, reply=self.control_reply)
+        # several brokers: devices are spread over them by consistent hashing (see broker_pool.py)
+        brokers = parse_brokers(broker_host, broker_port)
+        self.pool = BrokerPool(brokers) if len(brokers) > 1 else None
+        self.shard_by = shard_by
+        # I/O threads serving every device socket (0: paho's own network thread per client)
+        self.io_threads = io_threads
+        self.reactor = None
+        # per-sensor publish rates (Hz) keyed by sensor name ("stack_current", "irradiance_1", "status", ...)
+        self.sensor_rates = dict(sensor_rates or {})
+        # phase offsets of the publish tasks within their period (see scheduler.py)
+        self.publish_spread = publish_spread
+        self.publish_jitter = publish_jitter
+        self.scheduler = None
         self.electrolysers = {
-            "EL1": ElectrolyserTwin("EL1"),
-            "EL2": ElectrolyserTwin("EL2")
+            "EL1": ElectrolyserTwin("EL1", stack_model=stack_model, cell_area_cm2=cell_area_cm2),
+            "EL2": ElectrolyserTwin("EL2", stack_model=stack_model, cell_area_cm2=cell_area_cm2)
         }
+        # shared: all stacks feed one plant gas network (headers, storage); isolated: a tank each
+        if gas_network not in GAS_NETWORKS:
+            raise ValueError(f"unknown gas network {gas_network!r} (expected one of {GAS_NETWORKS})")
+        h2_rated = N_CELLS * I_REF / (2.0 * FARADAY)  # mol/s at the reference current, sizes the piping
+        self.gas = build_plant_network(list(self.electrolysers), h2_rated, TANK_VOLUME_M3, TANK_TEMPERATURE_K) \
+            if gas_network == "shared" else None
+        for el in self.electrolysers.values():
+            el.gas = self.gas
         # separate two irradiance sensors
         self.irradiance = {1: 800.0, 2: 750.0}
         self.irr_clients = {}
+        self.irr_seq = {1: 0, 2: 0}
         self.stop_event = Event()
         # global time-of-day phase for sine irradiance
         self.t = 0.0
 
     def connect_all(self):
-        # connect electrolyser device clients (pass broker args through)
+        if self.io_threads and self.reactor is None:
+            self.reactor = MqttReactor(self.io_threads)
         # connect electrolyser device clients (pass broker args through)
         for el in self.electrolysers.values():
-            el.connect_clients(broker_host=self.broker_host, broker_port=self.broker_port)
+            el.connect_clients(broker_host=self.broker_host, broker_port=self.broker_port,
+                               topic_aliases=self.topic_aliases, pool=self.pool, shard_by=self.shard_by,
+                               reactor=self.reactor)
             # also create a "monitor-local" client mapping to existing cert monitor-local if present
             try:
                 # Use unique client ID to avoid conflicts
-                mon = make_mqtt_client("monitor-local", broker_host=self.broker_host, broker_port=self.broker_port, client_id=f"monitor-local-{el.el}")
+                mon = make_mqtt_client("monitor-local", broker_host=self.broker_host, broker_port=self.broker_port, client_id=f"monitor-local-{el.el}",
+                                       topic_aliases=self.topic_aliases, pool=self.pool, shard_key=el.el, reactor=self.reactor)
                 el.clients["monitor-local"] = mon
             except Exception:
                 pass
@@ -510,9 +782,11 @@ class PlantSimulator:
         # Connect control listener for faults
         try:
             # Use monitor-local certs but unique client ID
-            ctrl = make_mqtt_client("monitor-local", broker_host=self.broker_host, broker_port=self.broker_port, client_id="plant-sim-control")
+            ctrl = make_mqtt_client("monitor-local", broker_host=self.broker_host, broker_port=self.broker_port, client_id="plant-sim-control",
+                                    reactor=self.reactor)
             ctrl.on_message = self.on_control_message
             ctrl.subscribe("electrolyser/control/faults")
+            ctrl.subscribe(PROFILE_TOPIC)
             self.control_client = ctrl
         except Exception as e:
             print(f"Control client error: {e}")
@@ -521,11 +795,25 @@ class PlantSimulator:
         for i in (1, 2):
             cn = f"sensor-plant-A-irradiance_{i}"
             try:
-                c = make_mqtt_client(cn, broker_host=self.broker_host, broker_port=self.broker_port)
+                c = make_mqtt_client(cn, broker_host=self.broker_host, broker_port=self.broker_port,
+                                     topic_aliases=self.topic_aliases, pool=self.pool, reactor=self.reactor)
                 self.irr_clients[i] = c
             except Exception as e:
                 print("Irr client error", e)
 
+    def publishers(self):
+        for el in self.electrolysers.values():
+            for c in el.clients.values():
+                yield from getattr(c, "connections", lambda: [c])()
+        for c in self.irr_clients.values():
+            yield from getattr(c, "connections", lambda: [c])()
+
+    def report_wire_bytes(self, ts=None):
+        st = combined_stats(self.publishers())
+        if st["clients"]:
+            print(f"[wire] {st['messages']} msgs, {st['per_msg_sent']} B/msg with topic aliases vs "
+                  f"{st['per_msg_full']} B/msg full topics ({st['saved_pct']}% saved, {st['reconnects']} reconnects)")
+
     def disconnect_all(self):
         for el in self.electrolysers.values():
             el.disconnect_clients()
@@ -538,6 +826,10 @@ class PlantSimulator:
         if hasattr(self, 'control_client'):
             self.control_client.loop_stop()
             self.control_client.disconnect()
+        if self.pool:
+            self.pool.stop()
+        if self.reactor:
+            self.reactor.stop()
 
     def update_irradiance(self, dt):
         # a daily sine cycle (period 24*60*60 seconds scaled down)
@@ -553,65 +845,160 @@ class PlantSimulator:
         # We need a way to know if this fault is active. 
         # Since faults are per-EL, we can check EL1's injector for global faults or just pick one.
         # Let's assume if EL1 has FAULT_IRRADIANCE_DRIFT, we drift sensor 1
-        if self.electrolysers["EL1"].fault_injector.is_active(FAULT_IRRADIANCE_DRIFT):
-             self.irradiance[1] += 300.0 # Diverge > 200
+        inj = self.electrolysers["EL1"].fault_injector
+        if inj.is_active(FAULT_IRRADIANCE_DRIFT):
+             self.irradiance[1] += 300.0 * inj.severity(FAULT_IRRADIANCE_DRIFT) # Diverge > 200
 
-    def publish_irradiance(self):
-        ts = time.time()
-        for i, c in self.irr_clients.items():
-            payload = {"el": "PLANT", "sensor": f"irradiance_{i}", "unit": "W/m2", "timestamp": ts, "value": round(self.irradiance[i], 2), "sequence_id": int(self.t)}
-            topic = f"electrolyser/plant-A/irradiance/{i}"
-            publish_json(c, topic, payload)
+    def publish_irradiance_sensor(self, i, ts=None):
+        c = self.irr_clients.get(i)
+        if not c:
+            return
+        if ts is None:
+            ts = time.time()
+        # own counter per sensor: int(self.t) repeats when publishing faster than 1 Hz
+        seq = self.irr_seq[i]
+        self.irr_seq[i] = seq + 1
+        payload = {"el": "PLANT", "sensor": f"irradiance_{i}", "unit": "W/m2", "timestamp": ts, "value": round(self.irradiance[i], 2), "sequence_id": seq}
+        topic = f"electrolyser/plant-A/irradiance/{i}"
+        publish_json(c, topic, payload)
+
+    def publish_irradiance(self, ts=None):
+        if ts is None:
+            ts = time.time()
+        for i in self.irr_clients:
+            self.publish_irradiance_sensor(i, ts)
+
+    def control_reply(self, topic, obj):
+        print(f"[control] {topic}: {json.dumps(obj)}")
+        if getattr(self, "control_client", None) is not None:
+            publish_json(self.control_client, topic, obj)
 
     def on_control_message(self, client, userdata, msg):
         try:
             payload = json.loads(msg.payload)
-            # Format: {"el": "EL1", "fault": "membrane_pinhole", "active": true}
+            if msg.topic == PROFILE_TOPIC:
+                # {"action": "start", "mode": "sample"|"cprofile", "seconds": 10} (see profiler.py)
+                self.profiler.handle(payload)
+                return
+            # Format: {"el": "EL1", "fault": "membrane_pinhole", "active": true, "severity": 1.0}
             el_id = payload.get("el")
             fault = payload.get("fault")
             active = payload.get("active", True)
+            severity = float(payload.get("severity", 1.0))
             
             if el_id in self.electrolysers:
-                self.electrolysers[el_id].fault_injector.set_fault(fault, active)
+                self.electrolysers[el_id].fault_injector.set_fault(fault, active, severity)
             elif el_id == "PLANT":
                 # Apply to all or specific plant sensors
                 # For now apply to EL1 for simplicity if it's a plant-wide thing that affects EL1 logic
                 # Or iterate all
                 for el in self.electrolysers.values():
-                    el.fault_injector.set_fault(fault, active)
+                    el.fault_injector.set_fault(fault, active, severity)
             else:
                 print(f"Unknown EL ID in control msg: {el_id}")
         except Exception as e:
             print(f"Error parsing control msg: {e}")
 
+    def publish_rate(self, sensor):
+        return self.sensor_rates.get(sensor, 1.0 / self.dt)
+
+    def seq_rate(self, key):
+        # publish rate (Hz) behind an electrolyser sequence counter key
+        if key.startswith("kpi_"):
+            return self.sensor_rates.get("kpi", KPI_RATE)
+        return self.publish_rate(key)
+
+    def get_state(self):
+        return {
+            "t": self.t,
+            "irradiance": [self.irradiance[1], self.irradiance[2]],
+            "irr_seq": [self.irr_seq[1], self.irr_seq[2]],
+            "rng": random.getstate(),
+            "electrolysers": {el_id: el.get_state() for el_id, el in self.electrolysers.items()},
+            "gas": self.gas.get_state() if self.gas else None,
+        }
+
+    def set_state(self, state, skip_s=0.0):
+        """Restore get_state(); skip_s advances every sequence counter by that many seconds of samples."""
+        def skipped(rate):
+            return int(math.ceil(skip_s * rate)) + 1 if skip_s > 0 else 0
+
+        self.t = state["t"]
+        self.irradiance = {1: state["irradiance"][0], 2: state["irradiance"][1]}
+        self.irr_seq = {i: n + skipped(self.publish_rate(f"irradiance_{i}"))
+                        for i, n in zip((1, 2), state["irr_seq"])}
+        version, internal, gauss = state["rng"]
+        random.setstate((version, tuple(internal), gauss))
+        for el_id, el_state in state["electrolysers"].items():
+            el = self.electrolysers.get(el_id)
+            if el is None:
+                print(f"[checkpoint] ignoring state of unknown electrolyser {el_id}")
+                continue
+            el.set_state(el_state)
+            for key, n in el.seq.items():
+                el.seq[key] = n + skipped(self.seq_rate(key))
+        if self.gas and state.get("gas"):
+            self.gas.set_state(state["gas"])
+
+    def step(self, dt):
+        # one fixed physics step for the whole plant
+        self.update_irradiance(dt)
+        for idx, el in enumerate(self.electrolysers.values(), start=1):
+            # optionally vary irradiance slightly per electrolyser
+            irr = self.irradiance[1] if idx == 1 else self.irradiance[2]
+            el.update_from_pv(irr, dt)
+        if self.gas:
+            self.gas.step(dt)
+
+    def build_scheduler(self):
+        sched = MultiRateScheduler(physics_dt=self.physics_dt, spread=self.publish_spread, jitter=self.publish_jitter)
+        for i in self.irradiance:
+            sched.add_task(f"irradiance_{i}", self.publish_rate(f"irradiance_{i}"),
+                           lambda ts, i=i: self.publish_irradiance_sensor(i, ts))
+        for el in self.electrolysers.values():
+            for sensor in SENSOR_TOPICS:
+                group = f"{el.el}/{PHASE_GROUPS[sensor]}" if sensor in PHASE_GROUPS else None
+                sched.add_task(f"{el.el}/{sensor}", self.publish_rate(sensor),
+                               lambda ts, el=el, sensor=sensor: el.publish_sensor(sensor, ts), group=group)
+            sched.add_task(f"{el.el}/status", self.publish_rate("status"), el.publish_status)
+            sched.add_task(f"{el.el}/kpi", self.sensor_rates.get("kpi", KPI_RATE), el.publish_kpis,
+                           weight=len(KPI_TOPICS))
+        # housekeeping tasks publish nothing (weight 0): they take no share of the phase slots
+        if self.topic_aliases:
+            sched.add_task("wire_report", 1.0 / 60.0, self.report_wire_bytes, weight=0)
+        if self.checkpointer and self.checkpoint_interval > 0:  # <= 0: only the final save on exit
+            sched.add_task("checkpoint", 1.0 / self.checkpoint_interval, self.checkpointer.task, weight=0)
+        sched.add_task("profiler", 10.0, self.profiler.poll, weight=0)  # cProfile captures start/stop on this thread
+        return sched
+
     def run_loop(self):
+        if self.checkpoint_path:
+            if self.resume:
+                checkpoint.resume(self, self.checkpoint_path)
+            self.checkpointer = checkpoint.Checkpointer(self, self.checkpoint_path)
         print("Plant simulator starting, connecting to broker...")
         self.connect_all()
         print("Connected clients for all devices.")
+        if self.reactor:
+            st = self.reactor.stats()
+            print(f"{st['clients']} device connections served by {st['io_threads']} I/O thread(s)")
+        for el in self.electrolysers.values():
+            el.cell_voltage_at(0.0)  # build lazily created stack tables before the clock starts
+        self.scheduler = self.build_scheduler()
+        self.profiler.target = threading.get_ident()  # the thread that runs the scheduler
+        print(f"Physics step {self.physics_dt * 1000:.1f} ms, {len(self.scheduler.tasks)} publish tasks, "
+              f"phases spread: {self.publish_spread}")
         try:
-            last = time.time()
-            while not self.stop_event.is_set():
-                now = time.time()
-                dt = now - last
-                if dt <= 0:
-                    dt = self.dt
-                last = now
-
-                # update irradiance (fast-day)
-                self.update_irradiance(dt)
-                self.publish_irradiance()
-
-                # update each electrolyser with irradiance (we give each same plant-level irradiance for simplicity)
-                for idx, el in enumerate(self.electrolysers.values(), start=1):
-                    # optionally vary irradiance slightly per electrolyser
-                    irr = self.irradiance[1] if idx == 1 else self.irradiance[2]
-                    el.update_from_pv(irr, dt)
-                    el.publish_all()
-
-                time.sleep(self.dt)
+            self.scheduler.run(self.step, self.stop_event)
         except KeyboardInterrupt:
             print("Stopping plant simulator (KeyboardInterrupt)")
         finally:
+            if self.checkpointer:
+                self.checkpointer.close()
+            self.report_wire_bytes()
+            st = self.scheduler.meter.stats()
+            print(f"[publish] {st['messages']} msgs, mean {st['mean_per_s']} msgs/s, peak {st['peak_per_s']} msgs/s "
+                  f"over {self.physics_dt * 1000:g} ms (peak/mean {st['peak_to_mean']})")
             self.disconnect_all()
             print("Disconnected all clients.")
 
@@ -620,12 +1007,52 @@ class PlantSimulator:
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--dt", type=float, default=1.0, help="simulation timestep (s)")
-    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host (default 127.0.0.1)")
+    parser.add_argument("--dt", type=float, default=1.0, help="base publish period (s) for sensors without an explicit rate")
+    parser.add_argument("--physics-dt", type=float, default=0.01, help="fixed physics integration step (s)")
+    parser.add_argument("--fast-rate", type=float, default=None, help="publish rate (Hz) for fast signals (stack current, cell voltages)")
+    parser.add_argument("--slow-rate", type=float, default=None, help="publish rate (Hz) for slow signals (stack temperature, tank pressure)")
+    parser.add_argument("--sensor-rate", action="append", default=[], metavar="NAME=HZ",
+                        help="per-sensor publish rate override, repeatable (e.g. stack_current=20, irradiance_1=0.5, status=1, kpi=0.2)")
+    parser.add_argument("--stack-model", choices=STACK_MODELS, default="linear",
+                        help="cell voltage model: linear U_rev + R*I, or tabulated polarization curve")
+    parser.add_argument("--cell-area", type=float, default=1.0, help="cell active area (cm2) for --stack-model polarization")
+    parser.add_argument("--no-topic-aliases", action="store_true", help="always publish full topic strings")
+    parser.add_argument("--checkpoint", default=None, metavar="PATH",
+                        help="checkpoint file: resume from it if present, save to it periodically and on exit")
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0, help="seconds between checkpoints (0: only on exit)")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing --checkpoint file (it is overwritten)")
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],host[:port],... to shard devices over several brokers")
+    parser.add_argument("--shard-by", choices=("sensor", "el"), default="sensor",
+                        help="with several brokers: assign each sensor, or each electrolyser, to one broker")
     parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--profile-dir", default=None,
+                        help="where captures requested on electrolyser/control/profile are written (default: profiles/)")
+    parser.add_argument("--gas-network", choices=GAS_NETWORKS, default="shared",
+                        help="shared: stacks, buffers, header and storage solved as one network; isolated: a sealed tank per stack")
+    parser.add_argument("--publish-spread", choices=SPREAD_MODES, default="even",
+                        help="phase offsets of the sensors within their period: even (least-loaded slots), hash (by name), none (all at once)")
+    parser.add_argument("--publish-jitter", type=float, default=0.0,
+                        help="random extra offset per sample, as a fraction of the period (0 = fixed phases)")
+    parser.add_argument("--io-threads", type=int, default=1,
+                        help="threads serving all device sockets (0: one paho network thread per client)")
     args = parser.parse_args()
 
-    sim = PlantSimulator(dt=args.dt, broker_host=args.broker, broker_port=args.port)
+    rates = {}
+    if args.fast_rate:
+        rates.update({s: args.fast_rate for s in FAST_SENSORS})
+    if args.slow_rate:
+        rates.update({s: args.slow_rate for s in SLOW_SENSORS})
+    rates.update(parse_rate_overrides(args.sensor_rate))
+
+    sim = PlantSimulator(dt=args.dt, broker_host=args.broker, broker_port=args.port,
+                         physics_dt=args.physics_dt, sensor_rates=rates,
+                         stack_model=args.stack_model, cell_area_cm2=args.cell_area,
+                         topic_aliases=not args.no_topic_aliases, checkpoint=args.checkpoint,
+                         checkpoint_interval=args.checkpoint_interval, resume=not args.fresh,
+                         shard_by=args.shard_by, gas_network=args.gas_network, profile_dir=args.profile_dir,
+                         publish_spread=args.publish_spread, publish_jitter=args.publish_jitter,
+                         io_threads=args.io_threads)
     sim.run_loop()
 
 if __name__ == "__main__":
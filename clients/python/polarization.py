@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+polarization.py
+Nonlinear PEM cell polarization model, evaluated through a precomputed lookup table.
+
+  V_cell(I, T) = U_rev(T) + eta_act,an + eta_act,cat + eta_ohm + eta_conc
+
+  U_rev(T)   reversible voltage, 1.229 V at 25 °C, -0.9 mV/K
+  eta_act    Butler-Volmer (symmetric form): RT/(alpha F) * asinh(i / 2 i0), with
+             Arrhenius-temperature-dependent exchange current densities
+  eta_ohm    i * (t_mem / sigma(T) + r_contact), Springer membrane conductivity
+             sigma = (0.005139 lambda - 0.00326) exp(1268 (1/303 - 1/T))
+  eta_conc   -RT/(2F) ln(1 - i / i_lim)
+
+i is the current density (A/cm2) for the cell area. The defaults are calibrated so
+a 1 cm2 cell at 1.8 A / 45 °C sits near the 1.95 V of the simulator's linear model;
+real stacks at hundreds of amps set area_cm2 accordingly (e.g. 300 cm2).
+
+The transcendental terms are evaluated once per twin at startup into a
+(sqrt(current) x temperature) grid; per tick, PolarizationTable.cell_voltage() is a
+bilinear interpolation (one sqrt, two index computations, four reads). The sqrt axis
+puts grid points into the steep activation knee at small currents. Currents above
+the grid (approaching i_lim, or fault spikes) are extrapolated with the slope of the
+last grid segment.
+
+Run (prints the curve and the table's interpolation error):
+  python3 clients/python/polarization.py --area 1.0 --temp 45
+"""
+
+import math
+import argparse
+
+FARADAY = 96485.33212  # C/mol
+R_GAS = 8.31446261815324  # J/(mol·K)
+T_REF_K = 298.15
+
+
+class PolarizationModel:
+    def __init__(self, area_cm2=1.0, membrane_um=178.0, water_content=14.0, r_contact=0.02,
+                 i0_anode=1e-4, i0_cathode=0.5, alpha_anode=1.0, alpha_cathode=0.5,
+                 ea_anode=52e3, ea_cathode=18e3, i_lim=4.0, u_scale=1.0, r_scale=1.0):
+        self.area_cm2 = area_cm2
+        self.membrane_cm = membrane_um * 1e-4
+        self.water_content = water_content
+        self.r_contact = r_contact  # ohm*cm2
+        self.i0_anode = i0_anode  # A/cm2 at 25 °C
+        self.i0_cathode = i0_cathode
+        self.alpha_anode = alpha_anode
+        self.alpha_cathode = alpha_cathode
+        self.ea_anode = ea_anode  # J/mol, activation energy of the exchange current density
+        self.ea_cathode = ea_cathode
+        self.i_lim = i_lim  # A/cm2, mass-transport limit
+        # per-twin manufacturing spread (same role as the random U_rev / R_ohm factors of the linear model)
+        self.u_scale = u_scale
+        self.r_scale = r_scale
+
+    def reversible_voltage(self, t_c):
+        return (1.229 - 0.9e-3 * (t_c + 273.15 - T_REF_K)) * self.u_scale
+
+    def conductivity(self, t_c):
+        """Membrane conductivity (S/cm)."""
+        return (0.005139 * self.water_content - 0.00326) * math.exp(1268.0 * (1.0 / 303.0 - 1.0 / (t_c + 273.15)))
+
+    def _i0(self, i0_ref, ea, t_k):
+        return i0_ref * math.exp(-ea / R_GAS * (1.0 / t_k - 1.0 / T_REF_K))
+
+    def overpotentials(self, current, t_c):
+        """(activation, ohmic, concentration) in V for a cell current (A) at t_c (°C)."""
+        t_k = t_c + 273.15
+        i = max(0.0, current) / self.area_cm2
+        rt_f = R_GAS * t_k / FARADAY
+        act = (rt_f / self.alpha_anode * math.asinh(i / (2.0 * self._i0(self.i0_anode, self.ea_anode, t_k)))
+               + rt_f / self.alpha_cathode * math.asinh(i / (2.0 * self._i0(self.i0_cathode, self.ea_cathode, t_k))))
+        ohm = i * (self.membrane_cm / self.conductivity(t_c) + self.r_contact) * self.r_scale
+        conc = -rt_f / 2.0 * math.log(1.0 - min(i / self.i_lim, 0.999))
+        return act, ohm, conc
+
+    def cell_voltage(self, current, t_c):
+        return self.reversible_voltage(t_c) + sum(self.overpotentials(current, t_c))
+
+    def build_table(self, i_max=None, t_min=0.0, t_max=100.0, n_i=256, n_t=41):
+        """Tabulate cell_voltage over [0, i_max] A x [t_min, t_max] °C (default i_max: 95 % of i_lim)."""
+        if i_max is None:
+            i_max = 0.95 * self.i_lim * self.area_cm2
+        return PolarizationTable(self.cell_voltage, i_max, t_min, t_max, n_i, n_t)
+
+
+class PolarizationTable:
+    __slots__ = ("i_max", "t_min", "t_max", "n_i", "n_t", "i_scale", "t_scale", "v", "edge_slope")
+
+    def __init__(self, fn, i_max, t_min, t_max, n_i, n_t):
+        self.i_max, self.t_min, self.t_max = i_max, t_min, t_max
+        self.n_i, self.n_t = n_i, n_t
+        self.i_scale = (n_i - 1) / math.sqrt(i_max)  # grid index = sqrt(I) * i_scale
+        self.t_scale = (n_t - 1) / (t_max - t_min)
+        # flat row-major grid: v[it * n_i + ii]
+        self.v = [fn((ii / self.i_scale) ** 2, t_min + it / self.t_scale) for it in range(n_t) for ii in range(n_i)]
+        # dV/dI (V/A) of the last segment in each temperature row, for currents beyond i_max
+        i_prev = ((n_i - 2) / self.i_scale) ** 2
+        self.edge_slope = [(self.v[it * n_i + n_i - 1] - self.v[it * n_i + n_i - 2]) / (i_max - i_prev)
+                           for it in range(n_t)]
+
+    def cell_voltage(self, current, t_c):
+        over = 0.0
+        if current >= self.i_max:
+            over = current - self.i_max
+            ii, fx = self.n_i - 2, 1.0
+        else:
+            x = math.sqrt(current) * self.i_scale if current > 0.0 else 0.0
+            ii = int(x)
+            fx = x - ii
+        y = (t_c - self.t_min) * self.t_scale
+        if y <= 0.0:
+            y = 0.0
+        elif y >= self.n_t - 1:
+            y = self.n_t - 1.000001
+        it = int(y)
+        fy = y - it
+        v = self.v
+        k = it * self.n_i + ii
+        a = v[k] + (v[k + 1] - v[k]) * fx
+        k += self.n_i
+        b = v[k] + (v[k + 1] - v[k]) * fx
+        if over:
+            a += over * self.edge_slope[it]
+            b += over * self.edge_slope[it + 1]
+        return a + (b - a) * fy
+
+    def max_error(self, fn, steps=97):
+        """Largest |table - fn| over an off-grid sample of the table domain (V)."""
+        err = 0.0
+        for a in range(steps):
+            current = self.i_max * ((a + 0.37) / steps) ** 2
+            for b in range(steps):
+                t_c = self.t_min + (self.t_max - self.t_min) * (b + 0.61) / steps
+                err = max(err, abs(self.cell_voltage(current, t_c) - fn(current, t_c)))
+        return err
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--area", type=float, default=1.0, help="cell active area (cm2)")
+    parser.add_argument("--temp", type=float, default=45.0, help="stack temperature (C)")
+    parser.add_argument("--points", type=int, default=12, help="points printed along the curve")
+    args = parser.parse_args()
+
+    model = PolarizationModel(area_cm2=args.area)
+    table = model.build_table()
+    print(f"{'I (A)':>9} {'i (A/cm2)':>10} {'U_rev':>7} {'act':>7} {'ohm':>7} {'conc':>7} {'V_cell':>8}")
+    for k in range(args.points + 1):
+        current = table.i_max * k / args.points
+        act, ohm, conc = model.overpotentials(current, args.temp)
+        print(f"{current:>9.2f} {current / args.area:>10.3f} {model.reversible_voltage(args.temp):>7.3f} "
+              f"{act:>7.3f} {ohm:>7.3f} {conc:>7.3f} {table.cell_voltage(current, args.temp):>8.4f}")
+    print(f"table {table.n_i}x{table.n_t}, max interpolation error {table.max_error(model.cell_voltage) * 1000:.3f} mV")
+
+if __name__ == "__main__":
+    main()
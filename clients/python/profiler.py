@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+profiler.py
+On-demand profiling of a running plant simulator, driven over the control topic.
+
+When the simulator falls behind (dropped physics steps, late samples) there is no need to
+restart it under a profiler: send a command to electrolyser/control/profile and the live
+process captures for N seconds while the physics loop keeps running.
+
+  {"action": "start", "mode": "sample", "seconds": 10, "interval_ms": 5, "id": "run-1"}
+  {"action": "start", "mode": "cprofile", "seconds": 10}
+  {"action": "stop"}        end the running capture early (its result still follows)
+  {"action": "status"}
+
+Modes:
+  sample    a background thread reads the simulator thread's stack (sys._current_frames)
+            every interval_ms and counts collapsed stacks; writes <dir>/plant-<ts>-<id>.folded,
+            one "frame;frame;...;leaf count" line per stack (flamegraph.pl, speedscope,
+            inferno; frames as "function (file:line)"). Idle time shows up as the scheduler's
+            sleep. The interpreter switch interval is shortened during the capture so samples
+            also land inside short physics steps; cost on the loop: one GIL hand-off per sample.
+  cprofile  deterministic cProfile on the simulator thread; enabled and disabled from a
+            10 Hz scheduler task (cProfile only sees the thread that enables it), so
+            durations are accurate to 0.1 s. Writes <dir>/plant-<ts>-<id>.pstats
+            (python -m pstats, snakeviz). Slows the loop noticeably while it runs.
+
+Files are written by a background thread. Every command is answered on
+electrolyser/control/profile/result (or the command's "reply_to", honoured only below that
+topic). The "id" names the output file, so it is limited to letters, digits, "-" and "_":
+  {"id": "run-1", "status": "started"|"done"|"busy"|"stopping"|"running"|"idle"|"error", "mode": "sample",
+   "path": "/.../profiles/plant-20240101-120000-run-1.folded", "seconds": 10.0,
+   "samples": 1998, "top": [["run (scheduler.py:104)", 0.82], ["flow (gas_network.py:74)", 0.03], ...]}
+"top" holds the five hottest leaf frames (sample: share of samples) or functions by own
+time (cprofile: seconds).
+
+Run (against a live plant_sim.py; waits for the result):
+  python3 clients/python/profiler.py --mode sample --seconds 10
+  python3 clients/python/profiler.py --mode cprofile --seconds 5 --broker 127.0.0.1
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import pstats
+import pathlib
+import cProfile
+import argparse
+import threading
+from threading import Thread, Event, Lock
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+PROFILE_TOPIC = "electrolyser/control/profile"
+RESULT_TOPIC = "electrolyser/control/profile/result"
+MODES = ("sample", "cprofile")
+MAX_SECONDS = 600.0
+REQUEST_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def frame_label(frame):
+    # function (file:current line), as py-spy writes it; the scheduler's idle sleep gets its own line
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno or code.co_firstlineno})"
+
+
+class Capture:
+    def __init__(self, mode, seconds, interval_s, path, request_id, reply_to):
+        self.mode = mode
+        self.seconds = seconds
+        self.interval_s = interval_s
+        self.path = path
+        self.id = request_id
+        self.reply_to = reply_to
+        self.started = None
+        self.elapsed = 0.0
+        self.stop = Event()
+        self.stacks = {}  # sample mode: collapsed stack -> count
+        self.samples = 0
+        self.prof = None  # cprofile mode
+
+
+class LiveProfiler:
+    """Profiles one thread (the simulator loop) on request; reply(topic, obj) announces results."""
+
+    def __init__(self, out_dir=None, reply=None, clock=time.monotonic):
+        self.out_dir = pathlib.Path(out_dir or ROOT / "profiles")
+        self.reply = reply or (lambda topic, obj: print(f"[profile] {json.dumps(obj)}"))
+        self.clock = clock
+        self.target = threading.get_ident()  # thread to profile; run_loop sets its own
+        self.lock = Lock()
+        self.capture = None  # running capture
+        self.pending = None  # cprofile capture waiting for the simulator thread
+
+    # --- control path (MQTT network thread) ---
+    def handle(self, cmd):
+        action = cmd.get("action", "start")
+        request_id = cmd.get("id") or uuid.uuid4().hex[:8]
+        reply_to = cmd.get("reply_to")
+        # anyone who can write the control topic must not make the simulator publish elsewhere
+        if not isinstance(reply_to, str) or not (reply_to == RESULT_TOPIC or reply_to.startswith(RESULT_TOPIC + "/")):
+            reply_to = RESULT_TOPIC
+        if not isinstance(request_id, str) or not REQUEST_ID.fullmatch(request_id):
+            self.reply(reply_to, {"status": "error", "error": "id must be 1-64 of [A-Za-z0-9_-]"})
+            return
+        if action == "start":
+            self.start(cmd.get("mode", "sample"), float(cmd.get("seconds", 10.0)),
+                       float(cmd.get("interval_ms", 5.0)) / 1000.0, request_id, reply_to)
+        elif action == "stop":
+            with self.lock:
+                cap = self.capture or self.pending
+            if cap is None:
+                self.reply(reply_to, {"id": request_id, "status": "idle"})
+            else:
+                cap.stop.set()  # the capture's own result follows once its file is written
+                self.reply(reply_to, {"id": request_id, "status": "stopping", "capture": cap.id})
+        elif action == "status":
+            with self.lock:
+                cap = self.capture or self.pending
+            self.reply(reply_to, {"id": request_id, "status": "running" if cap else "idle",
+                                  **({"capture": cap.id, "mode": cap.mode} if cap else {})})
+        else:
+            self.reply(reply_to, {"id": request_id, "status": "error", "error": f"unknown action {action!r}"})
+
+    def start(self, mode, seconds, interval_s, request_id, reply_to=RESULT_TOPIC):
+        if mode not in MODES or not 0.0 < seconds <= MAX_SECONDS or interval_s <= 0.0:
+            self.reply(reply_to, {"id": request_id, "status": "error",
+                                  "error": f"need mode in {MODES}, 0 < seconds <= {MAX_SECONDS:g}, interval_ms > 0"})
+            return None
+        suffix = "folded" if mode == "sample" else "pstats"
+        path = self.out_dir / f"plant-{time.strftime('%Y%m%d-%H%M%S')}-{request_id}.{suffix}"
+        if not path.resolve().is_relative_to(self.out_dir.resolve()):
+            self.reply(reply_to, {"id": request_id, "status": "error",
+                                  "error": "capture path outside the profile directory"})
+            return None
+        cap = Capture(mode, seconds, interval_s, path, request_id, reply_to)
+        with self.lock:
+            busy = self.capture or self.pending
+            if busy is None:
+                if mode == "sample":
+                    self.capture = cap
+                else:
+                    self.pending = cap  # poll() enables it on the simulator thread
+        if busy is not None:
+            self.reply(reply_to, {"id": request_id, "status": "busy", "capture": busy.id})
+            return None
+        if mode == "sample":
+            cap.started = self.clock()
+            Thread(target=self._sample, args=(cap,), name="profile-sampler", daemon=True).start()
+            self._announce_start(cap)
+        return cap
+
+    def _announce_start(self, cap):
+        self.reply(cap.reply_to, {"id": cap.id, "status": "started", "mode": cap.mode, "seconds": cap.seconds,
+                                  "path": str(cap.path)})
+
+    # --- simulator thread ---
+    def poll(self, ts=None):
+        """Scheduler task: starts and stops cProfile captures on the thread that runs it."""
+        cap = self.capture
+        if cap is not None and cap.mode == "cprofile":
+            if cap.stop.is_set() or self.clock() - cap.started >= cap.seconds:
+                cap.prof.disable()
+                self._finish(cap)
+            return
+        cap = self.pending
+        if cap is not None:
+            with self.lock:
+                self.pending, self.capture = None, cap
+            cap.started = self.clock()
+            cap.prof = cProfile.Profile()
+            cap.prof.enable()
+            self._announce_start(cap)
+
+    # --- sampler thread ---
+    def _sample(self, cap):
+        frames = sys._current_frames
+        deadline = cap.started + cap.seconds
+        stacks = cap.stacks
+        # a busy simulator thread only hands over the GIL every switch interval (5 ms); shorten
+        # it for the capture so samples land inside the physics step, not only at its sleeps
+        switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch, cap.interval_s / 10.0))
+        try:
+            while not cap.stop.wait(cap.interval_s) and self.clock() < deadline:
+                f = frames().get(self.target)
+                labels = []
+                while f is not None:
+                    labels.append(frame_label(f))
+                    f = f.f_back
+                if labels:
+                    key = ";".join(reversed(labels))
+                    stacks[key] = stacks.get(key, 0) + 1
+                    cap.samples += 1
+        finally:
+            sys.setswitchinterval(switch)
+        self._finish(cap)
+
+    # --- results (written off the simulator thread) ---
+    def _finish(self, cap):
+        with self.lock:
+            if self.capture is cap:
+                self.capture = None
+        cap.elapsed = self.clock() - cap.started
+        Thread(target=self._write, args=(cap,), name="profile-writer", daemon=True).start()
+
+    def _write(self, cap):
+        result = {"id": cap.id, "status": "done", "mode": cap.mode, "path": str(cap.path),
+                  "seconds": round(cap.elapsed, 3)}
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            if cap.mode == "sample":
+                with open(cap.path, "w") as f:
+                    for stack, n in sorted(cap.stacks.items(), key=lambda kv: -kv[1]):
+                        f.write(f"{stack} {n}\n")
+                leaves = {}
+                for stack, n in cap.stacks.items():
+                    leaf = stack.rsplit(";", 1)[-1]
+                    leaves[leaf] = leaves.get(leaf, 0) + n
+                top = sorted(leaves.items(), key=lambda kv: -kv[1])[:5]
+                result.update(samples=cap.samples,
+                              top=[[name, round(n / max(1, cap.samples), 3)] for name, n in top])
+            else:
+                stats = pstats.Stats(cap.prof)
+                stats.dump_stats(str(cap.path))
+                rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][2])[:5]  # by own (total) time
+                result.update(calls=sum(v[1] for v in stats.stats.values()),
+                              top=[[f"{func} ({os.path.basename(file)}:{line})", round(v[2], 4)]
+                                   for (file, line, func), v in rows])
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        self.reply(cap.reply_to, result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=MODES, default="sample", help="sampling stacks or cProfile")
+    parser.add_argument("--seconds", type=float, default=10.0, help="capture length")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="sampling interval (sample mode)")
+    parser.add_argument("--stop", action="store_true", help="end the running capture early instead")
+    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host (host[:port],... with several)")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    request_id = uuid.uuid4().hex[:8]
+    done = Event()
+
+    def on_message(client, userdata, msg):
+        reply = json.loads(msg.payload)
+        if reply.get("id") != request_id:
+            return
+        print(json.dumps(reply, indent=2))
+        if reply.get("status") != "started":
+            done.set()
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id=f"profiler-{request_id}")
+    client.on_message = on_message
+    client.subscribe(RESULT_TOPIC, qos=1)
+    cmd = {"action": "stop"} if args.stop else {"action": "start", "mode": args.mode, "seconds": args.seconds,
+                                                "interval_ms": args.interval_ms}
+    time.sleep(0.5)  # let the subscription settle before the (fast) reply can arrive
+    client.publish(PROFILE_TOPIC, json.dumps({**cmd, "id": request_id}), qos=1)
+    # the result is announced once the file has been written
+    if not done.wait(5.0 if args.stop else args.seconds + 30.0):
+        print("no result received (is plant_sim.py running on this broker?)")
+    client.loop_stop()
+    client.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+scheduler.py
+Multi-rate scheduler for the plant digital twin.
+
+The physics is advanced with a small fixed step (default 10 ms) so that fast
+dynamics (first-order current response, solar transient spikes) are resolved,
+while each publish task runs at its own rate. Publishing is therefore decoupled
+from the integration step: raising the physics resolution does not raise MQTT
+traffic, and fast signals (stack current) can be published more often than slow
+ones (tank pressure).
+
+Phase spreading: without it every task is due at t = 0, k*period, so all sensors with
+the same rate publish in the same physics step and the broker sees one burst per tick
+followed by silence. With spread="even" each task gets a fixed phase offset within its
+period, placed greedily (fastest tasks first) in the least-loaded physics-step slot, so
+a tick's messages are spread over the whole period; spread="hash" derives the offset
+from the task name alone (MD5), for separate processes that cannot coordinate. Offsets
+(and the optional per-sample jitter, a fraction of the period) are whole physics steps,
+so every timestamp is exactly the sim time of the state it reports. Tasks given the same
+group (and rate) share one phase, for signals a consumer pairs by timestamp (the fault
+detector's H2/O2 flow ratio); jitter is drawn per group too. BurstMeter counts
+messages per physics-step bin; scheduler.meter.stats() gives the peak-to-mean rate.
+
+Usage:
+  sched = MultiRateScheduler(physics_dt=0.01, spread="even")
+  sched.add_task("EL1/stack_current", 10.0, lambda ts: ...)
+  sched.run(step_fn, stop_event)   # step_fn(dt) advances the physics
+
+Run (peak-to-mean message rate of the plant's task set, virtual clock):
+  python3 clients/python/scheduler.py --seconds 60
+  python3 clients/python/scheduler.py --sensor-rate stack_current=10 --jitter 0.05
+"""
+
+import math
+import time
+import heapq
+import random
+import hashlib
+import argparse
+from threading import Event
+
+SPREAD_MODES = ("even", "hash", "none")
+
+
+def name_phase(name):
+    """Fraction of the period in [0, 1) derived from a name; the same in every process."""
+    return int.from_bytes(hashlib.md5(name.encode()).digest()[:8], "big") / 2.0 ** 64
+
+
+class PublishTask:
+    def __init__(self, name, rate_hz, fn, weight=1, group=None):
+        if rate_hz <= 0:
+            raise ValueError(f"rate for {name} must be > 0 (got {rate_hz})")
+        self.name = name
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.fn = fn
+        self.weight = weight  # messages per run (0: housekeeping), for phase placement and the meter
+        self.group = group or name  # tasks of one group and rate share their phase
+        self.phase = 0.0  # offset of the task's slots within its period (s)
+        self.slot = 0.0  # current slot on the phase grid, seconds since scheduler start
+        self.next_due = 0.0  # slot plus this sample's jitter
+        self.runs = 0
+
+
+class BurstMeter:
+    """Messages per fixed time bin; keeps only the running peak, so memory stays constant."""
+
+    def __init__(self, bin_s=0.01):
+        self.bin_s = bin_s
+        self.messages = 0
+        self.peak = 0  # most messages in one bin
+        self.bin = None
+        self.count = 0
+        self.last = 0.0
+
+    def add(self, t, n=1):
+        if n <= 0:
+            return
+        b = int(t / self.bin_s + 1e-9)
+        if b != self.bin:
+            self.bin, self.count = b, 0
+        self.count += n
+        self.peak = max(self.peak, self.count)
+        self.messages += n
+        self.last = max(self.last, t)
+
+    def stats(self, duration=None):
+        duration = duration or self.last + self.bin_s
+        mean = self.messages / duration if duration > 0 else 0.0
+        peak = self.peak / self.bin_s
+        return {"messages": self.messages, "mean_per_s": round(mean, 2), "peak_per_s": round(peak, 1),
+                "peak_to_mean": round(peak / mean, 1) if mean else 0.0}
+
+
+def spread_phases(tasks, slot_s, max_slots=100_000):
+    """
+    Even placement: each task's offset is the physics-step slot within its period whose
+    positions over the hyperperiod carry the least load (peak first, then total); batches
+    first, then the fastest tasks. Phases are set on the tasks; returns the per-slot load.
+    """
+    units = {}  # (group, period in slots) -> tasks placed together
+    for t in tasks:
+        units.setdefault((t.group, max(1, round(t.period / slot_s))), []).append(t)
+    periods = [p for _, p in units]
+    weights = [sum(t.weight for t in members) for members in units.values()]
+    horizon = 1
+    for p in sorted(set(periods)):
+        horizon = math.lcm(horizon, p)
+        if horizon > max_slots:  # incommensurate rates: approximate over the slowest period
+            horizon = max(periods)
+            break
+    load = [0] * horizon
+    members = list(units.values())
+    for i in sorted(range(len(members)), key=lambda i: (-weights[i], periods[i])):
+        p = periods[i]
+        best = min(range(min(p, horizon)), key=lambda o: (max(load[o::p]), sum(load[o::p])))
+        for j in range(best, horizon, p):
+            load[j] += weights[i]
+        for t in members[i]:
+            t.phase = best * slot_s
+    return load
+
+
+class MultiRateScheduler:
+    def __init__(self, physics_dt=0.01, max_catchup_steps=100,
+                 clock=time.monotonic, wall_clock=time.time, sleep=time.sleep,
+                 spread="none", jitter=0.0, seed=0):
+        if physics_dt <= 0:
+            raise ValueError("physics_dt must be > 0")
+        if spread not in SPREAD_MODES:
+            raise ValueError(f"unknown spread {spread!r} (expected one of {SPREAD_MODES})")
+        if not 0.0 <= jitter < 1.0:
+            raise ValueError("jitter must be a fraction of the period in [0, 1)")
+        self.physics_dt = physics_dt
+        # cap on physics steps per wake-up so a stall cannot spiral (sim time slips instead)
+        self.max_catchup_steps = max_catchup_steps
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.sleep = sleep
+        self.spread = spread
+        self.jitter = jitter
+        # own generator: jitter must not shift the simulator's random stream (checkpoints replay it)
+        self.rng = random.Random(seed)
+        self.draws = {}  # (group, period) -> (slot, jitter) of the latest draw
+        self.meter = BurstMeter(physics_dt)
+        self.tasks = []
+        self.sim_time = 0.0
+        self.steps = 0
+        self.dropped_steps = 0
+
+    def add_task(self, name, rate_hz, fn, weight=1, group=None):
+        """
+        Register fn(ts) to be called rate_hz times per second; ts is the sample's wall-clock time.
+        weight is the number of messages one call publishes (0 for tasks that publish nothing);
+        tasks with the same group and rate are sampled at the same instants.
+        """
+        task = PublishTask(name, rate_hz, fn, weight, group)
+        self.tasks.append(task)
+        return task
+
+    def place(self):
+        """Assign every task its phase offset (whole physics steps) for the spread mode."""
+        if self.spread == "even":
+            spread_phases(self.tasks, self.physics_dt)
+        for t in self.tasks:
+            if self.spread == "hash":
+                t.phase = self._steps(name_phase(t.group) * t.period)
+            elif self.spread == "none":
+                t.phase = 0.0
+
+    def _steps(self, seconds):
+        return round(seconds / self.physics_dt) * self.physics_dt
+
+    def _jitter(self, t):
+        if not self.jitter:
+            return 0.0
+        # one draw per group and slot, so grouped samples stay simultaneous
+        slot, offset = self.draws.get((t.group, t.period), (None, 0.0))
+        if slot is None or abs(slot - t.slot) > 1e-9:
+            offset = self._steps(self.rng.random() * self.jitter * t.period)
+            self.draws[(t.group, t.period)] = (t.slot, offset)
+        return offset
+
+    def _next_event(self, queue):
+        next_step = self.sim_time + self.physics_dt
+        if not queue:
+            return next_step
+        return min(next_step, queue[0][0])
+
+    def run(self, step_fn, stop_event):
+        """
+        Run until stop_event is set. step_fn(dt) is called with the fixed physics step;
+        tasks are fired in order of their due time once the physics has caught up to it.
+        """
+        start = self.clock()
+        # epoch time of the schedule origin, used for payload timestamps
+        wall_start = self.wall_clock()
+        self.sim_time = 0.0
+        ticks = 0  # physics steps taken or dropped; sim_time = ticks * physics_dt does not drift
+        # a wake-up exactly on a due time must see the step ending there despite float rounding
+        eps = self.physics_dt * 1e-6
+        self.place()
+        # due-time heap: (next_due, add order, task); ties fire in the order tasks were added
+        queue = []
+        for i, t in enumerate(self.tasks):
+            t.slot = t.phase
+            t.next_due = t.slot + self._jitter(t)
+            queue.append((t.next_due, i, t))
+        heapq.heapify(queue)
+
+        while not stop_event.is_set():
+            elapsed = self.clock() - start
+
+            # advance physics in fixed steps up to "now"
+            n = 0
+            while (ticks + 1) * self.physics_dt <= elapsed + eps:
+                if n >= self.max_catchup_steps:
+                    # running behind: drop the backlog rather than fall further behind
+                    lag_steps = int((elapsed + eps - self.sim_time) / self.physics_dt)
+                    self.dropped_steps += lag_steps
+                    ticks += lag_steps
+                    self.sim_time = ticks * self.physics_dt
+                    break
+                step_fn(self.physics_dt)
+                ticks += 1
+                self.sim_time = ticks * self.physics_dt
+                self.steps += 1
+                n += 1
+
+            # fire every task that is due, oldest first
+            while queue and queue[0][0] <= elapsed + eps:
+                _, i, t = heapq.heappop(queue)
+                try:
+                    t.fn(wall_start + t.next_due)
+                except Exception as e:
+                    print(f"[scheduler] task {t.name} failed: {e}")
+                t.runs += 1
+                self.meter.add(elapsed, t.weight)
+                t.slot += t.period
+                if t.slot <= elapsed:
+                    # skip missed slots instead of publishing a burst of stale samples
+                    missed = int((elapsed - t.slot) / t.period) + 1
+                    t.slot += missed * t.period
+                t.next_due = t.slot + self._jitter(t)
+                heapq.heappush(queue, (t.next_due, i, t))
+
+            wait = self._next_event(queue) - (self.clock() - start)
+            if wait > 0:
+                self.sleep(wait)
+
+
+def parse_rate_overrides(items):
+    """Parse repeated NAME=HZ command-line options into a dict."""
+    rates = {}
+    for item in items or []:
+        name, sep, hz = item.partition("=")
+        if not sep:
+            raise ValueError(f"expected NAME=HZ, got {item!r}")
+        rates[name.strip()] = float(hz)
+    return rates
+
+
+class VirtualClock:
+    """Clock and sleep for running a schedule faster than real time (benchmarks, tests)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.now += s
+
+
+def measure(tasks, seconds, physics_dt=0.01, spread="even", jitter=0.0):
+    """Run copies of (name, rate_hz, weight) tasks on a virtual clock; returns the meter's stats."""
+    clock = VirtualClock()
+    sched = MultiRateScheduler(physics_dt=physics_dt, clock=clock, wall_clock=lambda: 0.0, sleep=clock.sleep,
+                               spread=spread, jitter=jitter)
+    for name, rate_hz, weight in tasks:
+        sched.add_task(name, rate_hz, lambda ts: None, weight)
+    stop = Event()
+
+    def step(dt):
+        if clock.now + dt > seconds - 1e-9:  # last wake-up before the end: samples in [0, seconds)
+            stop.set()
+
+    sched.run(step, stop)
+    return sched.meter.stats(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=60.0, help="virtual time to run")
+    parser.add_argument("--physics-dt", type=float, default=0.01, help="physics step, also the metering bin (s)")
+    parser.add_argument("--dt", type=float, default=1.0, help="base publish period (s), as in plant_sim.py")
+    parser.add_argument("--sensor-rate", action="append", default=[], metavar="NAME=HZ", help="as in plant_sim.py")
+    parser.add_argument("--jitter", type=float, default=0.0, help="per-sample jitter, fraction of the period")
+    args = parser.parse_args()
+
+    from plant_sim import PlantSimulator
+
+    sim = PlantSimulator(dt=args.dt, physics_dt=args.physics_dt, sensor_rates=parse_rate_overrides(args.sensor_rate),
+                         topic_aliases=False)
+    tasks = [(t.name, t.rate_hz, t.weight) for t in sim.build_scheduler().tasks]
+    print(f"{len(tasks)} tasks, {sum(w * r for _, r, w in tasks):.1f} msgs/s, "
+          f"{args.physics_dt * 1000:g} ms bins, {args.seconds:g} s")
+    for spread in SPREAD_MODES:
+        st = measure(tasks, args.seconds, args.physics_dt, spread, args.jitter)
+        print(f"  {spread:5s} peak {st['peak_per_s']:8.1f} msgs/s  mean {st['mean_per_s']:6.2f} msgs/s  "
+              f"peak/mean {st['peak_to_mean']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
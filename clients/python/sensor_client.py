@@ -6,15 +6,35 @@ Usage examples:
   python sensor_client.py --el EL1 --sensor cell_1_voltage --cn sensor-EL1-cell_1_voltage --unit V
   python sensor_client.py --el EL2 --sensor h2_flow_rate --cn sensor-EL2-h2_flow_rate --unit LPM
   python sensor_client.py --el PLANT --sensor irradiance_1 --cn sensor-plant-A-irradiance_1 --unit W/m2
+
+Publishes with an MQTT v5 topic alias (see topic_alias.py) unless --no-topic-aliases;
+bytes on wire per message with and without the alias are printed on exit.
+
+With several brokers (--broker 127.0.0.1:8883,127.0.0.1:8884) the sensor connects to the one
+that owns its CN on the consistent-hash ring (same assignment as plant_sim.py) and moves
+when that broker is lost or another one joins (see broker_pool.py).
+
+Samples are taken on the wall-clock grid k * period + phase, where the phase is derived from
+the CN (scheduler.name_phase): every sensor process computes its own offset without
+coordination, so a fleet started together does not publish in one burst per second.
+The H2 and O2 flow sensors of one electrolyser share a phase (consumers pair them by
+timestamp). The payload timestamp is the grid time, not the (slightly later) wake-up time.
+--phase-jitter adds a random offset per sample (fraction of the period), --no-phase-spread
+puts every sensor on the whole second.
 """
 import ssl
 import json
+import math
 import time
 import random
 import argparse
 import pathlib
 from paho.mqtt import client as mqtt
 
+from topic_alias import TopicAliasPublisher, combined_stats
+from broker_pool import BrokerPool, parse_brokers
+from scheduler import name_phase
+
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 
 def generate_value(el, sensor):
@@ -44,8 +64,12 @@ def main():
     parser.add_argument("--cn", required=True, help="Client cert CN directory name under certs/clients/")
     parser.add_argument("--cell", type=int, default=None, help="Cell number for cell sensors (1..5)")
     parser.add_argument("--unit", default=None, help="Unit string (V, A, LPM, bar, C, W/m2)")
-    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host")
+    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host, or host[:port],host[:port],...")
     parser.add_argument("--port", type=int, default=8883, help="MQTT TLS port")
+    parser.add_argument("--no-topic-aliases", action="store_true", help="always publish the full topic string")
+    parser.add_argument("--rate", type=float, default=1.0, help="publish rate (Hz)")
+    parser.add_argument("--no-phase-spread", action="store_true", help="publish on the whole period, like every other sensor")
+    parser.add_argument("--phase-jitter", type=float, default=0.0, help="random extra offset per sample, fraction of the period")
     args = parser.parse_args()
 
     # Topic mapping
@@ -81,27 +105,54 @@ def main():
     key = ROOT / f"certs/clients/{args.cn}/client.key"
 
     # MQTT client
-    client = mqtt.Client(client_id=args.cn, protocol=mqtt.MQTTv5)
-    client.tls_set(
-        ca_certs=str(ca),
-        certfile=str(cert),
-        keyfile=str(key),
-        tls_version=ssl.PROTOCOL_TLS_CLIENT,
-    )
-    client.tls_insecure_set(False)
-    client.connect(args.broker, args.port, keepalive=30)
-    client.loop_start()
+    def connect(host, port):
+        client = mqtt.Client(client_id=args.cn, protocol=mqtt.MQTTv5)
+        client.tls_set(
+            ca_certs=str(ca),
+            certfile=str(cert),
+            keyfile=str(key),
+            tls_version=ssl.PROTOCOL_TLS_CLIENT,
+        )
+        client.tls_insecure_set(False)
+        if not args.no_topic_aliases:
+            client = TopicAliasPublisher(client)
+        client.connect(host, port, keepalive=30)
+        client.loop_start()
+        return client
+
+    brokers = parse_brokers(args.broker, args.port)
+    pool = None
+    if len(brokers) > 1:
+        pool = BrokerPool(brokers)
+        client = pool.client(args.cn, connect)
+        print(f"{args.cn} assigned to {client.broker[0]}:{client.broker[1]}")
+    else:
+        client = connect(*brokers[0])
 
+    period = 1.0 / args.rate
+    # flow sensors share a key so both processes sample (and jitter) at the same instants
+    phase_key = f"{args.el}/gas_flow" if args.sensor in ("h2_flow_rate", "o2_flow_rate") else args.cn
+    phase = 0.0 if args.no_phase_spread else name_phase(phase_key) * period
+    jitter = random.Random(phase_key)  # own stream, the same in every process with this key
+    slot = (math.floor((time.time() - phase) / period) + 1) * period + phase
     seq = 0
     try:
         while True:
+            due = slot + (jitter.random() * args.phase_jitter * period if args.phase_jitter else 0.0)
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            slot += period
+            if slot <= time.time():
+                # stalled (suspend, slow broker): skip missed slots instead of a burst of stale samples
+                slot = (math.floor((time.time() - phase) / period) + 1) * period + phase
             value = generate_value(args.el, args.sensor)
             payload = {
                 "el": args.el,
                 "sensor": args.sensor,
                 "cell": args.cell if args.cell is not None else None,
                 "unit": args.unit if args.unit else None,
-                "timestamp": time.time(),
+                "timestamp": round(due, 6),
                 "value": value,
                 "sequence_id": seq,
             }
@@ -110,12 +161,17 @@ def main():
             client.publish(topic, json.dumps(payload), qos=1)
             print(f"{args.cn} → {topic} → {payload}")
             seq += 1
-            time.sleep(1)
     except KeyboardInterrupt:
         print("Exiting publisher")
     finally:
+        if not args.no_topic_aliases:
+            st = combined_stats(client.connections() if pool else [client])
+            print(f"{st['messages']} msgs: {st['per_msg_sent']} B/msg on wire with topic alias, "
+                  f"{st['per_msg_full']} B/msg with full topic ({st['saved_pct']}% saved)")
         client.loop_stop()
         client.disconnect()
+        if pool:
+            pool.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+seq_tracker.py
+Consumer-side sequence-integrity tracking for telemetry streams.
+
+Every payload carries a per-series `sequence_id`. SequenceTracker keeps a compact
+state per series (highest id seen + a sliding bitmap over the last `window` ids)
+and classifies each arrival as in-order, gap, duplicate, reordered, late (older
+than the window) or a publisher reset: two consecutive ids that are both behind the
+stream (already seen, older than the window or below the epoch's first id), so a
+publisher restarting close to its high-water mark is caught too. Loss is derived from
+the bitmap:
+
+  missing = expected - unique received
+  pending = missing ids still inside the window (may yet arrive out of order)
+  lost    = missing - pending
+
+Run as a monitor that publishes per-EL / per-sensor loss statistics:
+  python3 clients/python/seq_tracker.py --interval 10
+  -> electrolyser/monitor/sequence/<EL>   (JSON, one message per EL per interval)
+"""
+
+import json
+import time
+import argparse
+from threading import Lock
+
+DEFAULT_WINDOW = 1024
+
+# observe() results
+OK = "ok"
+GAP = "gap"
+DUPLICATE = "duplicate"
+REORDERED = "reordered"
+LATE = "late"
+RESET = "reset"
+FIRST = "first"
+
+
+class SeriesState:
+    __slots__ = ("el", "sensor", "first", "highest", "bits", "received", "duplicates",
+                 "reordered", "late", "gaps", "max_gap", "resets", "prev_expected", "prev_unique",
+                 "prev_received", "prev_duplicates", "reset_candidate")
+
+    def __init__(self, el=None, sensor=None):
+        self.el = el
+        self.sensor = sensor
+        self.first = None  # first id of the current epoch
+        self.highest = None
+        self.bits = 0  # bit i set <=> id (highest - i) received
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        self.gaps = 0
+        self.max_gap = 0
+        self.resets = 0
+        # totals carried over from epochs closed by a publisher reset
+        self.prev_expected = 0
+        self.prev_unique = 0
+        self.prev_received = 0
+        self.prev_duplicates = 0
+        # (id, was_duplicate) of the last arrival behind the stream; a reset once the next id follows it
+        self.reset_candidate = None
+
+
+class SequenceTracker:
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.series = {}
+
+    def _state(self, key, el=None, sensor=None):
+        st = self.series.get(key)
+        if st is None:
+            st = self.series[key] = SeriesState(el, sensor)
+        return st
+
+    def observe(self, key, seq, el=None, sensor=None):
+        st = self.series.get(key)
+        if st is None:
+            st = self._state(key, el, sensor)
+        st.received += 1
+
+        if st.highest is None:
+            st.first = st.highest = seq
+            st.bits = 1
+            return FIRST
+
+        d = seq - st.highest
+        if d > 0:
+            st.reset_candidate = None
+            st.bits = ((st.bits << d) | 1) & self.mask
+            st.highest = seq
+            if d > 1:
+                st.gaps += 1
+                if d - 1 > st.max_gap:
+                    st.max_gap = d - 1
+                return GAP
+            return OK
+        if d == 0:
+            st.duplicates += 1
+            return DUPLICATE
+
+        back = -d
+        seen = False
+        if back < self.window and seq >= st.first:
+            bit = 1 << back
+            if not st.bits & bit:
+                st.bits |= bit
+                st.reordered += 1
+                st.reset_candidate = None
+                return REORDERED
+            seen = True
+
+        cand = st.reset_candidate
+        if cand is not None and seq == cand[0] + 1:
+            # two consecutive ids behind the stream: the publisher restarted at cand.
+            # Undo the candidate's provisional classification and close the old epoch.
+            if cand[1]:
+                st.duplicates -= 1
+            else:
+                st.late -= 1
+            st.received -= 2
+            expected, unique, _ = self._epoch(st)
+            st.prev_expected += expected
+            st.prev_unique += unique
+            st.prev_received += st.received
+            st.prev_duplicates += st.duplicates
+            st.resets += 1
+            st.received = 2
+            st.duplicates = 0
+            st.first = cand[0]
+            st.highest = seq
+            st.bits = 0b11
+            st.reset_candidate = None
+            return RESET
+
+        # remembered in case it is the first id of a restarted publisher
+        st.reset_candidate = (seq, seen)
+        if seen:
+            st.duplicates += 1
+            return DUPLICATE
+        # older than the window (or the epoch): counted as lost earlier, now recovered
+        # (duplicates no longer detectable)
+        st.late += 1
+        return LATE
+
+    def observe_message(self, topic, payload):
+        """Feed a decoded telemetry payload; returns the observe() result or None if it carries no sequence_id."""
+        seq = payload.get("sequence_id")
+        if type(seq) is not int:
+            return None
+        return self.observe(topic, seq, payload.get("el"), payload.get("sensor", "status"))
+
+    def _epoch(self, st):
+        """(expected, unique, pending) for the current epoch of a series."""
+        if st.highest is None:
+            return 0, 0, 0
+        expected = st.highest - st.first + 1
+        unique = st.received - st.duplicates
+        span = min(self.window, expected)
+        pending = span - (st.bits & ((1 << span) - 1)).bit_count()
+        return expected, unique, pending
+
+    def series_stats(self, key):
+        st = self.series[key]
+        expected, unique, pending = self._epoch(st)
+        expected += st.prev_expected
+        unique += st.prev_unique
+        missing = max(0, expected - unique)
+        lost = max(0, missing - pending)
+        return {
+            "el": st.el,
+            "sensor": st.sensor,
+            "received": st.received + st.prev_received,
+            "expected": expected,
+            "lost": lost,
+            "pending": pending,
+            "loss_ratio": round(lost / expected, 6) if expected else 0.0,
+            "duplicates": st.duplicates + st.prev_duplicates,
+            "reordered": st.reordered,
+            "late": st.late,
+            "gaps": st.gaps,
+            "max_gap": st.max_gap,
+            "resets": st.resets,
+            "highest": st.highest,
+        }
+
+    def stats(self):
+        """Per-series stats plus per-EL aggregates."""
+        series = {k: self.series_stats(k) for k in list(self.series)}
+        by_el = {}
+        for s in series.values():
+            agg = by_el.setdefault(s["el"] or "?", {"series": 0, "received": 0, "expected": 0, "lost": 0,
+                                                    "duplicates": 0, "reordered": 0, "late": 0, "gaps": 0,
+                                                    "resets": 0})
+            agg["series"] += 1
+            for k in ("received", "expected", "lost", "duplicates", "reordered", "late", "gaps", "resets"):
+                agg[k] += s[k]
+        for agg in by_el.values():
+            agg["loss_ratio"] = round(agg["lost"] / agg["expected"], 6) if agg["expected"] else 0.0
+        return {"series": series, "by_el": by_el}
+
+    def summary_lines(self):
+        st = self.stats()
+        lines = []
+        for el, agg in sorted(st["by_el"].items()):
+            lines.append(f"{el}: {agg['received']} msgs, lost {agg['lost']}/{agg['expected']} "
+                         f"({agg['loss_ratio'] * 100:.3f}%), dup {agg['duplicates']}, "
+                         f"reordered {agg['reordered']}, gaps {agg['gaps']}, resets {agg['resets']}")
+        return lines
+
+
+def publish_stats(client, tracker, ts=None):
+    if ts is None:
+        ts = time.time()
+    st = tracker.stats()
+    for el, agg in st["by_el"].items():
+        sensors = {s["sensor"]: {k: s[k] for k in ("received", "expected", "lost", "loss_ratio", "duplicates",
+                                                   "reordered", "late", "gaps", "max_gap", "resets")}
+                   for s in st["series"].values() if s["el"] == el}
+        payload = {"el": el, "timestamp": ts, **agg, "sensors": sensors}
+        client.publish(f"electrolyser/monitor/sequence/{el}", json.dumps(payload), qos=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="reorder window (sequence ids)")
+    parser.add_argument("--interval", type=float, default=10.0, help="stats publish interval (s)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after N seconds")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    tracker = SequenceTracker(window=args.window)
+    # with several brokers (or the shared I/O reactor) callbacks run on more than one thread
+    lock = Lock()
+
+    def on_message(client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload)
+            with lock:
+                tracker.observe_message(msg.topic, payload)
+        except (ValueError, AttributeError):
+            pass
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="sequence-monitor")
+    client.on_message = on_message
+    client.subscribe("electrolyser/plant-A/#", qos=1)
+    print("Sequence monitor running...")
+    start = time.time()
+    try:
+        while args.duration is None or time.time() - start < args.duration:
+            time.sleep(args.interval)
+            with lock:
+                publish_stats(client, tracker)
+                lines = tracker.summary_lines()
+            for line in lines:
+                print(line)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+telemetry_validator.py
+High-throughput schema validation stage for telemetry streams.
+
+The JSON schemas in schemas/ are compiled once into plain Python predicates
+(no per-call schema walk), so a payload check costs a handful of dict/type
+lookups. jsonschema is only consulted for the first failing payload of each
+topic, to record a readable reason. Three payload shapes are recognised:
+  - sensor_reading_v1: what plant_sim.py / sensor_client.py publish (el/sensor/value/sequence_id)
+  - el_status_v1:      electrolyser/plant-A/<EL>/status trip events
+  - telemetry_v1:      site_id/metrics/quality envelope
+
+Use as a subscriber-side filter (ValidationStage.filter / make_filtering_on_message)
+or as a replay-time checker over a JSONL capture ({"topic": ..., "payload": ...} per line).
+
+Run:
+  python3 clients/python/telemetry_validator.py --replay capture.jsonl
+  python3 clients/python/telemetry_validator.py --live --duration 60
+  python3 clients/python/telemetry_validator.py --bench 500000
+"""
+
+import re
+import json
+import time
+import pathlib
+import argparse
+from jsonschema import Draft202012Validator
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+SCHEMA_DIR = ROOT / "schemas"
+SCHEMA_NAMES = ("sensor_reading_v1", "el_status_v1", "telemetry_v1")
+
+# keywords that carry no validation semantics for the compiled checker
+ANNOTATIONS = {"$schema", "$id", "title", "description", "format", "examples", "default", "$comment"}
+SUPPORTED = ANNOTATIONS | {
+    "type", "required", "properties", "additionalProperties", "enum", "const",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "minLength", "maxLength", "pattern", "items",
+}
+
+_TYPE_EXPR = {
+    "object": "type({v}) is dict",
+    "array": "type({v}) is list",
+    "string": "type({v}) is str",
+    "boolean": "type({v}) is bool",
+    "null": "{v} is None",
+    "number": "type({v}) in _NUM",
+    "integer": "(type({v}) is int or (type({v}) is float and {v}.is_integer()))",
+}
+
+_MISSING = object()
+
+
+class _Codegen:
+    """Emits one straight-line Python function per schema (no per-call schema walk)."""
+
+    def __init__(self):
+        self.lines = []
+        self.env = {"_NUM": (int, float), "_MISSING": _MISSING}
+        self.n = 0
+
+    def const(self, obj):
+        self.n += 1
+        name = f"k{self.n}"
+        self.env[name] = obj
+        return name
+
+    def var(self):
+        self.n += 1
+        return f"v{self.n}"
+
+    def fail_if(self, cond, ind):
+        self.lines.append(f"{ind}if {cond}: return False")
+
+    def emit(self, schema, v, ind):
+        unknown = set(schema) - SUPPORTED
+        if unknown:
+            raise ValueError(f"unsupported schema keywords: {sorted(unknown)}")
+
+        t = schema.get("type")
+        if t is not None:
+            types = t if isinstance(t, list) else [t]
+            for x in types:
+                if x not in _TYPE_EXPR:
+                    raise ValueError(f"unsupported type: {x}")
+            self.fail_if("not (" + " or ".join(_TYPE_EXPR[x].format(v=v) for x in types) + ")", ind)
+
+        if "enum" in schema:
+            # bools are tagged so that True does not match 1 (JSON Schema keeps them distinct)
+            allowed = self.const(frozenset((bool, x) if type(x) is bool else x for x in schema["enum"]))
+            self.fail_if(f"((bool, {v}) if type({v}) is bool else {v}) not in {allowed}", ind)
+        if "const" in schema:
+            c = schema["const"]
+            self.fail_if(f"not (type({v}) is type({self.const(c)}) and {v} == {self.const(c)})", ind)
+
+        for kw, op in (("minimum", "<"), ("maximum", ">"), ("exclusiveMinimum", "<="), ("exclusiveMaximum", ">=")):
+            if kw in schema:
+                self.fail_if(f"type({v}) in _NUM and {v} {op} {self.const(schema[kw])}", ind)
+
+        if "minLength" in schema:
+            self.fail_if(f"type({v}) is str and len({v}) < {int(schema['minLength'])}", ind)
+        if "maxLength" in schema:
+            self.fail_if(f"type({v}) is str and len({v}) > {int(schema['maxLength'])}", ind)
+        if "pattern" in schema:
+            search = self.const(re.compile(schema["pattern"]).search)
+            self.fail_if(f"type({v}) is str and {search}({v}) is None", ind)
+
+        if "items" in schema:
+            x = self.var()
+            self.lines.append(f"{ind}if type({v}) is list:")
+            self.lines.append(f"{ind}    for {x} in {v}:")
+            self.emit(schema["items"], x, ind + "        ")
+
+        if "required" in schema or "properties" in schema or "additionalProperties" in schema:
+            required = frozenset(schema.get("required", ()))
+            props = schema.get("properties", {})
+            additional = schema.get("additionalProperties", True)
+            keys = self.var()
+            self.lines.append(f"{ind}if type({v}) is dict:")
+            body = ind + "    "
+            self.lines.append(f"{body}{keys} = {v}.keys()")
+            if required:
+                self.fail_if(f"not {self.const(required)} <= {keys}", body)
+            if additional is False:
+                self.fail_if(f"not {keys} <= {self.const(frozenset(props))}", body)
+            elif isinstance(additional, dict):
+                k = self.var()
+                self.lines.append(f"{body}for {k} in {keys} - {self.const(frozenset(props))}:")
+                self.emit(additional, f"{v}[{k}]", body + "    ")
+            for name, sub in props.items():
+                x = self.var()
+                key = repr(name)
+                if name in required:
+                    self.lines.append(f"{body}{x} = {v}[{key}]")
+                    self.emit(sub, x, body)
+                else:
+                    self.lines.append(f"{body}{x} = {v}.get({key}, _MISSING)")
+                    self.lines.append(f"{body}if {x} is not _MISSING:")
+                    n = len(self.lines)
+                    self.emit(sub, x, body + "    ")
+                    if len(self.lines) == n:
+                        self.lines.append(f"{body}    pass")
+
+
+def compile_schema(schema):
+    """
+    Compile a JSON schema (the subset used in schemas/) into a predicate v -> bool.
+    Raises ValueError on keywords the compiler does not implement, so a schema change
+    can never be silently ignored.
+    """
+    gen = _Codegen()
+    gen.emit(schema, "v", "    ")
+    src = "def check(v):\n" + "\n".join(gen.lines + ["    return True"])
+    exec(compile(src, f"<schema {schema.get('$id', '?')}>", "exec"), gen.env)
+    return gen.env["check"]
+
+
+def load_schemas(names=SCHEMA_NAMES, schema_dir=SCHEMA_DIR):
+    return {n: json.loads((schema_dir / f"{n}.json").read_text()) for n in names}
+
+
+def classify(payload):
+    """Pick the schema for a decoded payload from its shape."""
+    if "site_id" in payload:
+        return "telemetry_v1"
+    if "status" in payload:
+        return "el_status_v1"
+    return "sensor_reading_v1"
+
+
+class ValidationStage:
+    def __init__(self, schemas=None):
+        schemas = schemas if schemas is not None else load_schemas()
+        # compiled once; the jsonschema validators are only used to explain failures
+        self.checkers = {n: compile_schema(s) for n, s in schemas.items()}
+        self.explainers = {n: Draft202012Validator(s) for n, s in schemas.items()}
+        self.stats = {}  # topic -> [messages, violations]
+        self.reasons = {}  # topic -> first violation reason seen
+
+    def _violation(self, topic, reason):
+        if topic not in self.reasons:
+            self.reasons[topic] = reason
+
+    def _explain(self, name, payload):
+        err = next(self.explainers[name].iter_errors(payload), None)
+        if err is None:
+            return f"{name}: rejected"
+        path = "/".join(str(p) for p in err.absolute_path)
+        return f"{name}: {path + ': ' if path else ''}{err.message}"
+
+    def check(self, topic, payload):
+        """
+        Validate one message. payload may be bytes/str (JSON) or an already decoded dict.
+        Returns the decoded dict if valid, else None. Counts are kept per topic.
+        """
+        st = self.stats.get(topic)
+        if st is None:
+            st = self.stats[topic] = [0, 0]
+        st[0] += 1
+        if type(payload) is not dict:
+            try:
+                payload = json.loads(payload)
+            except (ValueError, TypeError):
+                st[1] += 1
+                self._violation(topic, "invalid JSON")
+                return None
+            if type(payload) is not dict:
+                st[1] += 1
+                self._violation(topic, "payload is not a JSON object")
+                return None
+        name = classify(payload)
+        if self.checkers[name](payload):
+            return payload
+        st[1] += 1
+        if topic not in self.reasons:
+            self.reasons[topic] = self._explain(name, payload)
+        return None
+
+    # subscriber-side filter alias
+    filter = check
+
+    def check_batch(self, messages):
+        """
+        Validate an iterable of (topic, payload); returns the list of valid (topic, dict) pairs.
+        Same semantics as check(), with the per-message work inlined for replay/bulk use.
+        """
+        stats = self.stats
+        checkers = self.checkers
+        sensor, status, envelope = (checkers.get(n) for n in SCHEMA_NAMES)
+        loads = json.loads
+        out = []
+        append = out.append
+        for topic, payload in messages:
+            st = stats.get(topic)
+            if st is None:
+                st = stats[topic] = [0, 0]
+            st[0] += 1
+            if type(payload) is not dict:
+                try:
+                    payload = loads(payload)
+                except (ValueError, TypeError):
+                    st[1] += 1
+                    self._violation(topic, "invalid JSON")
+                    continue
+                if type(payload) is not dict:
+                    st[1] += 1
+                    self._violation(topic, "payload is not a JSON object")
+                    continue
+            if "site_id" in payload:
+                ok = envelope(payload)
+            elif "status" in payload:
+                ok = status(payload)
+            else:
+                ok = sensor(payload)
+            if ok:
+                append((topic, payload))
+            else:
+                st[1] += 1
+                if topic not in self.reasons:
+                    self.reasons[topic] = self._explain(classify(payload), payload)
+        return out
+
+    def totals(self):
+        msgs = sum(s[0] for s in self.stats.values())
+        bad = sum(s[1] for s in self.stats.values())
+        return msgs, bad
+
+    def report(self):
+        """Per-topic violation counts (topics with at least one violation), plus totals."""
+        msgs, bad = self.totals()
+        return {
+            "messages": msgs,
+            "violations": bad,
+            "topics": {
+                t: {"messages": s[0], "violations": s[1], "reason": self.reasons.get(t)}
+                for t, s in sorted(self.stats.items()) if s[1]
+            },
+        }
+
+
+def make_filtering_on_message(stage, handler):
+    """Wrap a paho on_message(client, userdata, topic, payload_dict) handler so only valid payloads reach it."""
+    def on_message(client, userdata, msg):
+        payload = stage.check(msg.topic, msg.payload)
+        if payload is not None:
+            handler(client, userdata, msg.topic, payload)
+    return on_message
+
+
+def read_replay(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            payload = rec.get("payload")
+            if isinstance(payload, str):
+                payload = payload.encode()
+            elif isinstance(payload, dict):
+                payload = json.dumps(payload).encode()
+            yield rec.get("topic", ""), payload
+
+
+def synthetic_messages(n):
+    # realistic simulator payloads, with every 1000th one broken
+    msgs = []
+    for i in range(n):
+        topic = f"electrolyser/plant-A/EL{1 + i % 2}/stack/current"
+        p = {"el": f"EL{1 + i % 2}", "sensor": "stack_current", "unit": "A",
+             "timestamp": 1.7e9 + i, "value": 1.8, "sequence_id": i}
+        if i % 1000 == 999:
+            p["value"] = "NaN"
+        msgs.append((topic, json.dumps(p).encode()))
+    return msgs
+
+
+def print_report(stage, elapsed=None):
+    rep = stage.report()
+    rate = f", {rep['messages'] / elapsed:,.0f} msg/s" if elapsed else ""
+    print(f"Checked {rep['messages']} messages, {rep['violations']} violations{rate}")
+    for topic, t in rep["topics"].items():
+        print(f"  {topic}: {t['violations']}/{t['messages']}  ({t['reason']})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--replay", help="JSONL capture file ({\"topic\":..., \"payload\":...} per line)")
+    mode.add_argument("--live", action="store_true", help="validate the live stream on electrolyser/plant-A/#")
+    mode.add_argument("--bench", type=int, metavar="N", help="benchmark N synthetic messages")
+    parser.add_argument("--batch", type=int, default=10000, help="batch size for replay/bench")
+    parser.add_argument("--duration", type=float, default=30.0, help="live mode duration (s)")
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    stage = ValidationStage()
+    t0 = time.perf_counter()
+    if args.live:
+        from plant_sim import make_mqtt_client
+        client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                                  client_id="telemetry-validator")
+        client.on_message = lambda c, u, msg: stage.check(msg.topic, msg.payload)
+        client.subscribe("electrolyser/plant-A/#", qos=1)
+        try:
+            time.sleep(args.duration)
+        except KeyboardInterrupt:
+            pass
+        client.loop_stop()
+        client.disconnect()
+    else:
+        source = read_replay(args.replay) if args.replay else iter(synthetic_messages(args.bench))
+        if args.bench:
+            t0 = time.perf_counter()
+        batch = []
+        for m in source:
+            batch.append(m)
+            if len(batch) >= args.batch:
+                stage.check_batch(batch)
+                batch.clear()
+        stage.check_batch(batch)
+    elapsed = time.perf_counter() - t0
+
+    if args.json:
+        print(json.dumps(stage.report(), indent=2))
+    else:
+        print_report(stage, elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+topic_alias.py
+MQTT v5 topic aliases for the per-device publishers.
+
+Every PUBLISH normally carries the full topic (electrolyser/plant-A/EL1/cell/1/voltage
+is 39 bytes, more than the value it carries). With a topic alias the first PUBLISH on
+a connection sends topic + TopicAlias=n, later ones send an empty topic + TopicAlias=n
+(3 bytes of properties).
+
+TopicAliasPublisher wraps a paho client (created with protocol=MQTTv5, before connect()):
+  - on CONNACK it reads the broker's TopicAliasMaximum (0 = aliases disabled) and
+    starts a fresh mapping; aliases only live as long as one network connection
+  - after a reconnect, QoS>0 messages that paho re-sends and that were queued as
+    alias-only get their full topic back (re-registering the alias), and every topic
+    sends its full name once more before going alias-only again
+  - while disconnected, publishes use the full topic
+  - bytes on wire (MQTT PUBLISH packet size, excluding TLS framing) are counted
+    for the full-topic form and for what was actually sent
+
+Usage:
+  client = TopicAliasPublisher(mqtt.Client(client_id=cn, protocol=mqtt.MQTTv5))
+  client.connect(host, port); client.loop_start()
+  client.publish(topic, payload, qos=1)
+  print(client.stats())
+"""
+
+from threading import Lock
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+
+def _varint_len(n):
+    size = 1
+    while n >= 128:
+        n >>= 7
+        size += 1
+    return size
+
+
+def publish_packet_size(topic_len, payload_len, qos, props_len=0):
+    """Size in bytes of an MQTT v5 PUBLISH packet."""
+    remaining = 2 + topic_len + (2 if qos else 0) + _varint_len(props_len) + props_len + payload_len
+    return 1 + _varint_len(remaining) + remaining
+
+
+ALIAS_PROPS_LEN = 3  # TopicAlias: identifier byte + uint16
+
+
+class TopicAliasPublisher:
+    def __init__(self, client, max_aliases=None):
+        # attributes set here, everything else is forwarded to the wrapped paho client
+        self.__dict__.update(client=client, limit=max_aliases, lock=Lock(), aliases={}, by_alias={},
+                             registered=set(), dropped={}, alias_max=0, user_on_connect=None,
+                             messages=0, bytes_full=0, bytes_sent=0, connects=0)
+        client.on_connect = self._on_connect
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __setattr__(self, name, value):
+        if name == "on_connect":
+            self.__dict__["user_on_connect"] = value  # keep ours, chain theirs
+        elif name in self.__dict__:
+            self.__dict__[name] = value
+        else:
+            setattr(self.client, name, value)
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        with self.lock:
+            broker_max = getattr(properties, "TopicAliasMaximum", 0) if properties is not None else 0
+            self.alias_max = broker_max if self.limit is None else min(self.limit, broker_max)
+            self.connects += 1
+            self.registered = set()
+            # aliases above a (lowered) limit are dropped; remembered to repair queued messages
+            self.dropped = {a: t for t, a in self.aliases.items() if a > self.alias_max}
+            self.aliases = {t: a for t, a in self.aliases.items() if a <= self.alias_max}
+            self.by_alias = {a: t for t, a in self.aliases.items()}
+            # paho re-sends unacknowledged QoS>0 messages right after this callback, with the
+            # topic/properties they were queued with; alias-only ones would be invalid now.
+            # _out_message_mutex, _out_messages and MQTTMessage._topic are private paho state,
+            # written against paho-mqtt 1.6.1 (pinned exactly in requirements.txt)
+            with client._out_message_mutex:
+                for m in client._out_messages.values():
+                    alias = getattr(m.properties, "TopicAlias", None) if m.properties is not None else None
+                    if alias is None:
+                        continue
+                    if not m._topic:
+                        topic = self.by_alias.get(alias) or self.dropped.get(alias)
+                        if topic is None:
+                            continue
+                        m.topic = topic.encode()
+                    if alias > self.alias_max:
+                        m.properties = None  # broker lowered its limit: plain publish
+        if self.user_on_connect:
+            self.user_on_connect(client, userdata, flags, rc, properties)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        payload_len = len(payload) if payload is not None else 0
+        full = publish_packet_size(len(topic.encode()), payload_len, qos)
+        send_topic, alias = topic, None
+        with self.lock:
+            if properties is None and self.client.is_connected():
+                alias = self.aliases.get(topic)
+                if alias is None and len(self.aliases) < self.alias_max:
+                    alias = self.aliases[topic] = len(self.aliases) + 1
+                    self.by_alias[alias] = topic
+                if alias is not None:
+                    if topic in self.registered:
+                        send_topic = ""
+                    else:
+                        self.registered.add(topic)
+            if alias is not None:
+                properties = Properties(PacketTypes.PUBLISH)
+                properties.TopicAlias = alias
+                sent = publish_packet_size(len(send_topic.encode()), payload_len, qos, ALIAS_PROPS_LEN)
+            else:
+                sent = full
+            self.messages += 1
+            self.bytes_full += full
+            self.bytes_sent += sent
+            # enqueue under the lock so a reconnect cannot slip between the alias decision and paho
+            return self.client.publish(send_topic, payload, qos=qos, retain=retain, properties=properties)
+
+    def stats(self):
+        n = self.messages or 1
+        return {
+            "messages": self.messages,
+            "aliases": len(self.aliases),
+            "alias_max": self.alias_max,
+            "reconnects": max(0, self.connects - 1),
+            "bytes_full": self.bytes_full,
+            "bytes_sent": self.bytes_sent,
+            "per_msg_full": round(self.bytes_full / n, 1),
+            "per_msg_sent": round(self.bytes_sent / n, 1),
+            "saved_pct": round(100.0 * (1.0 - self.bytes_sent / self.bytes_full), 1) if self.bytes_full else 0.0,
+        }
+
+
+def combined_stats(clients):
+    """Sum stats() over several publishers; an earlier combined_stats() result counts as its clients."""
+    tot = {"clients": 0, "messages": 0, "bytes_full": 0, "bytes_sent": 0, "reconnects": 0}
+    for c in clients:
+        if isinstance(c, TopicAliasPublisher):
+            s, n = c.stats(), 1
+        elif isinstance(c, dict):
+            s, n = c, c["clients"]
+        else:
+            continue
+        tot["clients"] += n
+        for k in ("messages", "bytes_full", "bytes_sent", "reconnects"):
+            tot[k] += s[k]
+    n = tot["messages"] or 1
+    tot["per_msg_full"] = round(tot["bytes_full"] / n, 1)
+    tot["per_msg_sent"] = round(tot["bytes_sent"] / n, 1)
+    tot["saved_pct"] = round(100.0 * (1.0 - tot["bytes_sent"] / tot["bytes_full"]), 1) if tot["bytes_full"] else 0.0
+    return tot
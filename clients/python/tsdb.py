@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+tsdb.py
+Embedded time-series store: an offline stand-in for InfluxDB, so history can be
+queried from the Python tools (and the fault tester) without the docker stack.
+
+Layout on disk, one directory per series (the MQTT topic, URL-quoted):
+  <dir>/<series>/<first timestamp in us>.seg   append-only segment files
+
+A segment is a sequence of blocks of up to --block-size samples:
+  header  b"TSB1", count, t_first, t_last (int64 us), min, max, sum (float64),
+          timestamp bytes, value bytes, CRC-32 of both
+  times   delta-of-delta of the microsecond timestamps, zigzag varints
+          (a fixed publish rate costs 1 byte per sample)
+  values  XOR with the previous float64; one control byte (identical value, or the
+          number of leading/trailing zero bytes of the XOR) plus the bytes in between
+
+Block headers double as a sparse time index: opening a store reads only the headers
+(one entry per block in memory), a range query bisects to the first block that can
+overlap and decodes just those blocks, and a downsample uses the header's
+min/max/sum/count for blocks that fall entirely into one bucket. Samples arrive in a
+per-series head buffer and are written as a block when it is full or older than
+--flush seconds; the head is queryable too.
+
+Maintenance (maintain(), once a minute in the subscriber):
+  - retention: whole segments older than --retention are deleted
+  - compaction: closed segments made of many small (flush-interval) blocks are
+    rewritten as full blocks
+A torn block at the end of a segment (crash mid-write) is truncated on open.
+
+Run:
+  python3 clients/python/tsdb.py --dir data/tsdb --retention 7d --http-port 8089
+  python3 clients/python/tsdb.py --dir data/tsdb --stats
+  curl 'http://127.0.0.1:8089/downsample?series=electrolyser/plant-A/EL1/stack/current&start=0&step=60&agg=max'
+
+Python:
+  store = TimeSeriesStore("data/tsdb")
+  ts, vals = store.range("electrolyser/plant-A/EL1/stack/current", start, end)
+  buckets, means = store.downsample("electrolyser/plant-A/EL1/stack/current", start, end, step=60)
+"""
+
+import os
+import json
+import math
+import time
+import zlib
+import struct
+import bisect
+import argparse
+from array import array
+from collections import OrderedDict
+from threading import Lock, Event
+from urllib.parse import quote, unquote, urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BLOCK_MAGIC = b"TSB1"
+BLOCK_HEAD = struct.Struct("<4sIqqdddIII")
+SAME = 0x80  # value control byte: identical to the previous value
+AGGS = ("mean", "min", "max", "sum", "count", "first", "last")
+
+
+def to_us(t):
+    return int(round(t * 1e6))
+
+
+# --- block codec ---
+def encode_times(ts):
+    out = bytearray()
+    prev, prev_delta = ts[0], 0
+    for t in ts[1:]:
+        delta = t - prev
+        dod = delta - prev_delta
+        z = dod << 1 if dod >= 0 else ((-dod) << 1) - 1  # zigzag
+        while z >= 0x80:
+            out.append((z & 0x7F) | 0x80)
+            z >>= 7
+        out.append(z)
+        prev, prev_delta = t, delta
+    return bytes(out)
+
+
+def decode_times(t_first, count, data):
+    ts = [t_first]
+    t, delta, pos = t_first, 0, 0
+    for _ in range(count - 1):
+        z = data[pos]
+        pos += 1
+        if z >= 0x80:
+            z &= 0x7F
+            shift = 7
+            while True:
+                b = data[pos]
+                pos += 1
+                z |= (b & 0x7F) << shift
+                if b < 0x80:
+                    break
+                shift += 7
+        if z:
+            delta += (z >> 1) ^ -(z & 1)
+        t += delta
+        ts.append(t)
+    return ts
+
+
+def encode_values(vals):
+    out = bytearray()
+    prev = 0
+    for bits in array("Q", array("d", vals).tobytes()):
+        x = bits ^ prev
+        prev = bits
+        if x == 0:
+            out.append(SAME)
+            continue
+        lead = (64 - x.bit_length()) >> 3
+        trail = ((x & -x).bit_length() - 1) >> 3
+        out.append((lead << 4) | trail)
+        out += (x >> (trail << 3)).to_bytes(8 - lead - trail, "little")
+    return bytes(out)
+
+
+def decode_values(count, data):
+    bits = array("Q")
+    prev, pos = 0, 0
+    from_bytes, put = int.from_bytes, bits.append
+    for _ in range(count):
+        c = data[pos]
+        pos += 1
+        if c != SAME:
+            trail = c & 0x0F
+            end = pos + 8 - (c >> 4) - trail
+            prev ^= from_bytes(data[pos:end], "little") << (trail << 3)
+            pos = end
+        put(prev)
+    return array("d", bits.tobytes()).tolist()
+
+
+def encode_block(ts, vals):
+    tb, vb = encode_times(ts), encode_values(vals)
+    finite = [v for v in vals if not math.isnan(v)] or [math.nan]
+    head = BLOCK_HEAD.pack(BLOCK_MAGIC, len(ts), ts[0], ts[-1], min(finite), max(finite), math.fsum(finite),
+                           len(tb), len(vb), zlib.crc32(vb, zlib.crc32(tb)))
+    return head + tb + vb
+
+
+class BlockRef:
+    """Index entry: one block in a segment file (header fields, no data)."""
+
+    __slots__ = ("path", "offset", "count", "t_first", "t_last", "vmin", "vmax", "vsum", "ts_len", "val_len")
+
+    def __init__(self, path, offset, count, t_first, t_last, vmin, vmax, vsum, ts_len, val_len):
+        self.path, self.offset, self.count = path, offset, count
+        self.t_first, self.t_last = t_first, t_last
+        self.vmin, self.vmax, self.vsum = vmin, vmax, vsum
+        self.ts_len, self.val_len = ts_len, val_len
+
+    @property
+    def size(self):
+        return BLOCK_HEAD.size + self.ts_len + self.val_len
+
+
+def scan_segment(path):
+    """Index a segment file; a torn or corrupt tail is cut off."""
+    refs, offset = [], 0
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while offset < size:
+            head = f.read(BLOCK_HEAD.size)
+            if len(head) < BLOCK_HEAD.size:
+                break
+            magic, count, t0, t1, vmin, vmax, vsum, ts_len, val_len, crc = BLOCK_HEAD.unpack(head)
+            body = f.read(ts_len + val_len)
+            if magic != BLOCK_MAGIC or len(body) != ts_len + val_len \
+                    or zlib.crc32(body[ts_len:], zlib.crc32(body[:ts_len])) != crc:
+                break
+            refs.append(BlockRef(path, offset, count, t0, t1, vmin, vmax, vsum, ts_len, val_len))
+            offset += BLOCK_HEAD.size + ts_len + val_len
+    if offset < size:
+        print(f"[tsdb] {path}: dropping {size - offset} bytes of a torn block")
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+    return refs
+
+
+class Series:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path  # directory
+        self.blocks = []  # BlockRef, ordered by time, non-overlapping
+        self.t_lasts = []  # block t_last values, for bisect
+        self.head_t = []  # unflushed samples (us, value), sorted
+        self.head_v = []
+        self.head_since = None  # monotonic time of the oldest head sample
+        self.segment = None  # active segment path
+        self.segment_t0 = None
+        self.late = 0  # samples older than the flushed data (dropped)
+
+    @property
+    def flushed_until(self):
+        return self.blocks[-1].t_last if self.blocks else None
+
+    def add_blocks(self, refs):
+        self.blocks.extend(refs)
+        self.t_lasts.extend(r.t_last for r in refs)
+
+    def reindex(self):
+        self.blocks.sort(key=lambda r: r.t_first)
+        self.t_lasts = [r.t_last for r in self.blocks]
+
+
+class TimeSeriesStore:
+    def __init__(self, path, block_size=512, segment_s=3600.0, flush_s=5.0, retention_s=None, cache_blocks=256):
+        self.path = str(path)
+        self.block_size = block_size
+        self.segment_us = to_us(segment_s)
+        self.flush_s = flush_s
+        self.retention_s = retention_s
+        self.lock = Lock()
+        self.series = {}
+        self.cache = OrderedDict()  # (path, offset) -> (ts, vals) of decoded blocks, LRU
+        self.cache_blocks = cache_blocks
+        self.samples_in = 0
+        os.makedirs(self.path, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        for entry in sorted(os.listdir(self.path)):
+            sdir = os.path.join(self.path, entry)
+            if not os.path.isdir(sdir):
+                continue
+            s = self.series[unquote(entry)] = Series(unquote(entry), sdir)
+            for name in sorted((n for n in os.listdir(sdir) if n.endswith(".seg")), key=lambda n: int(n[:-4])):
+                seg = os.path.join(sdir, name)
+                s.add_blocks(scan_segment(seg))
+                s.segment, s.segment_t0 = seg, int(name[:-4])
+            s.reindex()
+
+    def _series(self, name):
+        s = self.series.get(name)
+        if s is None:
+            sdir = os.path.join(self.path, quote(name, safe=""))
+            os.makedirs(sdir, exist_ok=True)
+            s = self.series[name] = Series(name, sdir)
+        return s
+
+    # --- write path ---
+    def append(self, name, t, value):
+        """Add one sample (t in epoch seconds)."""
+        t = to_us(t)
+        with self.lock:
+            s = self._series(name)
+            if s.blocks and t <= s.flushed_until:
+                s.late += 1
+                return
+            self.samples_in += 1
+            if not s.head_t or t >= s.head_t[-1]:
+                s.head_t.append(t)
+                s.head_v.append(value)
+            else:
+                i = bisect.bisect_right(s.head_t, t)
+                s.head_t.insert(i, t)
+                s.head_v.insert(i, value)
+            if s.head_since is None:
+                s.head_since = time.monotonic()
+            if len(s.head_t) >= self.block_size:
+                self._flush(s)
+
+    def update(self, topic, payload, recv_ts=None):
+        """Store the numeric value of one telemetry payload (same shapes as lvc.py)."""
+        value = payload.get("value")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        ts = payload.get("timestamp")
+        if not isinstance(ts, (int, float)):
+            ts = recv_ts if recv_ts is not None else time.time()
+        self.append(topic, float(ts), float(value))
+
+    def on_message(self, client, userdata, msg):
+        recv_ts = time.time()
+        try:
+            payload = json.loads(msg.payload)
+        except ValueError:
+            return
+        if isinstance(payload, dict):
+            self.update(msg.topic, payload, recv_ts)
+
+    def _flush(self, s):
+        if not s.head_t:
+            return
+        ts, vals = s.head_t, s.head_v
+        s.head_t, s.head_v, s.head_since = [], [], None
+        for i in range(0, len(ts), self.block_size):
+            self._write_block(s, ts[i:i + self.block_size], vals[i:i + self.block_size])
+
+    def _write_block(self, s, ts, vals):
+        if s.segment is None or ts[0] - s.segment_t0 >= self.segment_us:
+            s.segment_t0 = ts[0]
+            s.segment = os.path.join(s.path, f"{ts[0]}.seg")
+        data = encode_block(ts, vals)
+        with open(s.segment, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        head = BLOCK_HEAD.unpack_from(data)
+        s.add_blocks([BlockRef(s.segment, offset, *head[1:9])])
+
+    def flush(self, max_age_s=0.0):
+        """Write head buffers older than max_age_s as blocks."""
+        now = time.monotonic()
+        with self.lock:
+            for s in self.series.values():
+                if s.head_since is not None and now - s.head_since >= max_age_s:
+                    self._flush(s)
+
+    # --- maintenance ---
+    def expire(self, now=None):
+        """Delete whole segments whose newest sample is older than the retention period."""
+        if self.retention_s is None:
+            return 0
+        cutoff = to_us((time.time() if now is None else now) - self.retention_s)
+        removed = 0
+        with self.lock:
+            for s in self.series.values():
+                by_seg = {}
+                for r in s.blocks:
+                    by_seg.setdefault(r.path, []).append(r)
+                for seg, refs in by_seg.items():
+                    if max(r.t_last for r in refs) < cutoff:
+                        os.remove(seg)
+                        removed += 1
+                        if seg == s.segment:
+                            s.segment = s.segment_t0 = None
+                        self._evict(seg)
+                        s.blocks = [r for r in s.blocks if r.path != seg]
+                s.reindex()
+        return removed
+
+    def compact(self):
+        """Rewrite closed segments that hold more blocks than full blocks would need."""
+        rewritten = 0
+        with self.lock:
+            for s in self.series.values():
+                by_seg = {}
+                for r in s.blocks:
+                    by_seg.setdefault(r.path, []).append(r)
+                for seg, refs in by_seg.items():
+                    if seg == s.segment or len(refs) <= -(-sum(r.count for r in refs) // self.block_size):
+                        continue
+                    ts, vals = [], []
+                    for r in refs:
+                        bt, bv = self._decode(r)
+                        ts += bt
+                        vals += bv
+                    tmp, new_refs = seg + ".tmp", []
+                    with open(tmp, "wb") as f:
+                        for i in range(0, len(ts), self.block_size):
+                            data = encode_block(ts[i:i + self.block_size], vals[i:i + self.block_size])
+                            head = BLOCK_HEAD.unpack_from(data)
+                            new_refs.append(BlockRef(seg, f.tell(), *head[1:9]))
+                            f.write(data)
+                    os.replace(tmp, seg)
+                    self._evict(seg)
+                    s.blocks = [r for r in s.blocks if r.path != seg] + new_refs
+                    s.reindex()
+                    rewritten += 1
+        return rewritten
+
+    def maintain(self, now=None):
+        """Retention and compaction; returns (segments deleted, segments rewritten)."""
+        return self.expire(now), self.compact()
+
+    def close(self):
+        self.flush()
+
+    # --- read path ---
+    def _evict(self, seg):
+        for key in [k for k in self.cache if k[0] == seg]:
+            del self.cache[key]
+
+    def _decode(self, r):
+        key = (r.path, r.offset)
+        hit = self.cache.get(key)
+        if hit is not None:
+            self.cache.move_to_end(key)
+            return hit
+        with open(r.path, "rb") as f:
+            f.seek(r.offset + BLOCK_HEAD.size)
+            body = f.read(r.ts_len + r.val_len)
+        out = (decode_times(r.t_first, r.count, body[:r.ts_len]), decode_values(r.count, body[r.ts_len:]))
+        self.cache[key] = out
+        if len(self.cache) > self.cache_blocks:
+            self.cache.popitem(last=False)
+        return out
+
+    def _chunks(self, s, lo, hi):
+        """(block ref or None, ts, vals) for the flushed blocks and head overlapping [lo, hi] (us)."""
+        i = bisect.bisect_left(s.t_lasts, lo)
+        while i < len(s.blocks) and s.blocks[i].t_first <= hi:
+            r = s.blocks[i]
+            yield r, None, None
+            i += 1
+        if s.head_t and s.head_t[0] <= hi and s.head_t[-1] >= lo:
+            yield None, s.head_t, s.head_v
+
+    def names(self, prefix=None):
+        with self.lock:
+            return sorted(n for n in self.series if prefix is None or n.startswith(prefix))
+
+    def range(self, name, start=None, end=None, limit=None):
+        """Samples with start < t <= end (epoch seconds) as (ts, values); None for an unknown series."""
+        lo = to_us(start) + 1 if start is not None else -(1 << 63)
+        hi = to_us(end) if end is not None else (1 << 63) - 1
+        with self.lock:
+            s = self.series.get(name)
+            if s is None:
+                return None
+            out_t, out_v = [], []
+            for r, ts, vals in self._chunks(s, lo, hi):
+                if r is not None:
+                    ts, vals = self._decode(r)
+                a, b = bisect.bisect_left(ts, lo), bisect.bisect_right(ts, hi)
+                out_t += ts[a:b]
+                out_v += vals[a:b]
+        if limit is not None and len(out_t) > limit:
+            out_t, out_v = out_t[-limit:], out_v[-limit:]  # most recent samples win
+        return [t / 1e6 for t in out_t], out_v
+
+    def latest(self, name):
+        with self.lock:
+            s = self.series.get(name)
+            if s is None:
+                return None
+            if s.head_t:
+                return s.head_t[-1] / 1e6, s.head_v[-1]
+            if not s.blocks:
+                return None
+            ts, vals = self._decode(s.blocks[-1])
+            return ts[-1] / 1e6, vals[-1]
+
+    def downsample(self, name, start, end, step, agg="mean"):
+        """
+        Aggregate start < t <= end into buckets of step seconds aligned to start; returns
+        (bucket start times, values), empty buckets omitted.
+        """
+        if agg not in AGGS:
+            raise ValueError(f"unknown aggregate {agg!r} (expected one of {AGGS})")
+        if step <= 0:
+            raise ValueError("step must be > 0")
+        lo, hi, step_us, origin = to_us(start) + 1, to_us(end), to_us(step), to_us(start)
+        acc = {}  # bucket -> [count, sum, min, max, first, last]
+
+        def add(k, count, total, vmin, vmax, first, last):
+            a = acc.get(k)
+            if a is None:
+                acc[k] = [count, total, vmin, vmax, first, last]
+            else:
+                a[0] += count
+                a[1] += total
+                a[2] = min(a[2], vmin)
+                a[3] = max(a[3], vmax)
+                a[5] = last
+
+        with self.lock:
+            s = self.series.get(name)
+            if s is None:
+                return None
+            for r, ts, vals in self._chunks(s, lo, hi):
+                if r is not None:
+                    k = (r.t_first - origin) // step_us
+                    if r.t_first >= lo and r.t_last <= hi and (r.t_last - origin) // step_us == k \
+                            and agg not in ("first", "last") and not math.isnan(r.vsum):
+                        add(k, r.count, r.vsum, r.vmin, r.vmax, None, None)  # header only, no decode
+                        continue
+                    ts, vals = self._decode(r)
+                a, b = bisect.bisect_left(ts, lo), bisect.bisect_right(ts, hi)
+                while a < b:
+                    # one bucket at a time: its end by bisection, aggregates by the C builtins
+                    k = (ts[a] - origin) // step_us
+                    e = min(b, bisect.bisect_right(ts, origin + (k + 1) * step_us - 1, a, b))
+                    part = vals[a:e]
+                    total = sum(part)
+                    if total != total:  # NaN readings are left out, as in the block headers
+                        part = [v for v in part if v == v]
+                        total = sum(part)
+                    if part:
+                        add(k, len(part), total, min(part), max(part), part[0], part[-1])
+                    a = e
+
+        out_t, out_v = [], []
+        for k in sorted(acc):
+            count, total, vmin, vmax, first, last = acc[k]
+            out_t.append((origin + k * step_us) / 1e6)
+            out_v.append({"mean": total / count, "sum": total, "count": count, "min": vmin, "max": vmax,
+                          "first": first, "last": last}[agg])
+        return out_t, out_v
+
+    def stats(self):
+        with self.lock:
+            blocks = sum(len(s.blocks) for s in self.series.values())
+            stored = sum(r.count for s in self.series.values() for r in s.blocks)
+            head = sum(len(s.head_t) for s in self.series.values())
+            disk = sum(r.size for s in self.series.values() for r in s.blocks)
+            late = sum(s.late for s in self.series.values())
+        return {
+            "series": len(self.series),
+            "blocks": blocks,
+            "samples": stored + head,
+            "unflushed": head,
+            "late_dropped": late,
+            "bytes": disk,
+            "bytes_per_sample": round(disk / stored, 2) if stored else 0.0,
+        }
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _reply(self, code, obj, query_us):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("X-Query-Time-us", f"{query_us:.1f}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            t0 = time.perf_counter()
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            num = lambda k, default=None: float(q[k]) if k in q else default
+            try:
+                series = q.get("series")
+                if url.path == "/series":
+                    code, res = 200, store.names(q.get("prefix"))
+                elif url.path == "/stats":
+                    code, res = 200, store.stats()
+                elif url.path == "/range" and series:
+                    r = store.range(series, num("start"), num("end"), int(q["limit"]) if "limit" in q else None)
+                    code, res = (200, {"t": r[0], "v": r[1]}) if r else (404, None)
+                elif url.path == "/downsample" and series and "step" in q:
+                    r = store.downsample(series, num("start", 0.0), num("end", time.time()), num("step"),
+                                         q.get("agg", "mean"))
+                    code, res = (200, {"t": r[0], "v": r[1]}) if r else (404, None)
+                else:
+                    code, res = 400, {"error": "unknown query"}
+            except ValueError as e:
+                code, res = 400, {"error": str(e)}
+            self._reply(code, res, (time.perf_counter() - t0) * 1e6)
+
+    return Handler
+
+
+def parse_duration(text):
+    """'90', '15m', '12h', '7d' -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default="data/tsdb", help="store directory")
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--http-host", default="127.0.0.1", help="HTTP listen address")
+    parser.add_argument("--http-port", type=int, default=None, help="serve /series, /range, /downsample, /stats")
+    parser.add_argument("--block-size", type=int, default=512, help="samples per block")
+    parser.add_argument("--flush", type=float, default=5.0, help="seconds before a partial block is written")
+    parser.add_argument("--segment", default="1h", help="time span of one segment file")
+    parser.add_argument("--retention", default=None, help="delete segments older than this (e.g. 7d)")
+    parser.add_argument("--stats", action="store_true", help="print store statistics and exit")
+    args = parser.parse_args()
+
+    store = TimeSeriesStore(args.dir, block_size=args.block_size, segment_s=parse_duration(args.segment),
+                            flush_s=args.flush,
+                            retention_s=parse_duration(args.retention) if args.retention else None)
+    if args.stats:
+        print(json.dumps(store.stats(), indent=2))
+        for name in store.names():
+            last = store.latest(name)
+            print(f"  {name}: last {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last[0]))} = {last[1]}"
+                  if last else f"  {name}: empty")
+        return
+
+    from threading import Thread
+    from plant_sim import make_mqtt_client
+
+    client = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                              client_id="tsdb-recorder")
+    client.on_message = store.on_message
+    client.subscribe("electrolyser/plant-A/#", qos=1)
+    server = None
+    if args.http_port:
+        server = ThreadingHTTPServer((args.http_host, args.http_port), make_handler(store))
+        Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Time-series store queries on http://{args.http_host}:{args.http_port}")
+    print(f"Recording electrolyser/plant-A/# into {args.dir}")
+    stop = Event()
+    try:
+        n = 0
+        while not stop.wait(1.0):
+            store.flush(args.flush)
+            n += 1
+            if n % 60 == 0:
+                store.maintain()
+                print(f"[tsdb] {store.stats()}")
+    except KeyboardInterrupt:
+        print("Stopping recorder")
+    finally:
+        if server:
+            server.shutdown()
+        client.loop_stop()
+        client.disconnect()
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+twin_gateway.py
+Conflating WebSocket fan-out gateway for the web digital twin.
+
+Instead of every browser subscribing to the raw per-sensor topics on the broker's
+anonymous WebSocket listener, the gateway subscribes once (mTLS, monitor-local) to
+electrolyser/plant-A/#, keeps the latest state per EL and pushes conflated
+updates to browsers at a fixed UI rate:
+
+  on connect:  {"type": "snapshot", "tick": n, "state": {"EL1": {...}, "EL2": {...}, "PLANT": {...}}}
+  every tick:  {"type": "delta", "tick": n, "changes": {"EL1": {"current": 1.79, "cells": {"3": 1.95}}}}
+
+State keys match web_simulation's INITIAL_STATE (cells/current/voltage/temp/h2/o2/water/tank, irr1/irr2).
+A delta carries only the fields that changed since what that client last received.
+Clients that are up to date share one encoded frame per tick. A slow client is never
+queued for: while its previous frame is still being written, ticks are skipped, and its
+next frame is a single catch-up delta. Clients stuck for longer than --send-timeout
+are disconnected.
+
+Run:
+  python3 clients/python/twin_gateway.py --ws-port 8765 --ui-rate 4
+  (web_simulation: VITE_TWIN_GATEWAY=ws://localhost:8765 npm run dev)
+"""
+
+import json
+import asyncio
+import argparse
+from threading import Lock
+
+import websockets
+
+# sensor name -> key in the per-EL state (cells handled separately)
+SENSOR_KEYS = {
+    "stack_current": "current",
+    "stack_temperature": "temp",
+    "stack_pressure": "pressure",
+    "h2_flow_rate": "h2",
+    "o2_flow_rate": "o2",
+    "water_flow": "water",
+    "tank_pressure": "tank",
+}
+
+
+def state_key(topic, payload):
+    """Map a telemetry message to its flat state key, or None if the twin does not show it."""
+    el = payload.get("el")
+    sensor = payload.get("sensor")
+    if topic.endswith("/status"):
+        return (el, "status") if el else None
+    if not sensor:
+        return None
+    if sensor.startswith("irradiance_"):
+        return ("PLANT", "irr" + sensor.split("_")[-1])
+    if sensor.startswith("cell_"):
+        return (el, "cells", str(payload.get("cell") or sensor.split("_")[1]))
+    key = SENSOR_KEYS.get(sensor)
+    return (el, key) if el and key else None
+
+
+def nest(flat):
+    """{("EL1", "cells", "3"): 1.9} -> {"EL1": {"cells": {"3": 1.9}}}"""
+    out = {}
+    for path, v in flat.items():
+        d = out
+        for p in path[:-1]:
+            d = d.setdefault(p, {})
+        d[path[-1]] = v
+    return out
+
+
+class PlantState:
+    """Latest value per flat key, versioned by the UI tick in which it last changed."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.values = {}
+        self.versions = {}
+        self.dirty = set()
+        self.cells = {}  # el -> {cell: voltage}, for the derived stack voltage
+        self.messages = 0
+
+    def update(self, topic, payload):
+        key = state_key(topic, payload)
+        if key is None:
+            return
+        value = payload.get("status") if key[-1] == "status" else payload.get("value")
+        with self.lock:
+            self.messages += 1
+            if self.values.get(key) != value:
+                self.values[key] = value
+                self.dirty.add(key)
+                if key[1] == "cells" and isinstance(value, (int, float)):
+                    self.cells.setdefault(key[0], {})[key[2]] = value
+
+    def commit(self, tick):
+        """Stamp everything changed since the last tick; returns the flat delta for this tick."""
+        with self.lock:
+            if not self.dirty:
+                return {}
+            # derived stack voltage: sum of the cell voltages of every EL whose cells changed
+            for el in {k[0] for k in self.dirty if k[1] == "cells"}:
+                v = round(sum(self.cells.get(el, {}).values()), 4)
+                if self.values.get((el, "voltage")) != v:
+                    self.values[(el, "voltage")] = v
+                    self.dirty.add((el, "voltage"))
+            changes = {k: self.values[k] for k in self.dirty}
+            for k in self.dirty:
+                self.versions[k] = tick
+            self.dirty.clear()
+            return changes
+
+    def since(self, version):
+        with self.lock:
+            return {k: self.values[k] for k, v in self.versions.items() if v > version}
+
+
+class ClientView:
+    __slots__ = ("ws", "version", "busy", "sent", "skipped")
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.version = -1  # last tick fully delivered to this client
+        self.busy = False
+        self.sent = 0
+        self.skipped = 0
+
+
+class TwinGateway:
+    def __init__(self, ui_rate=4.0, send_timeout=5.0):
+        self.state = PlantState()
+        self.ui_period = 1.0 / ui_rate
+        self.send_timeout = send_timeout
+        self.clients = set()
+        self.tick = 0
+
+    def on_message(self, client, userdata, msg):
+        try:
+            payload = json.loads(msg.payload)
+        except ValueError:
+            return
+        if isinstance(payload, dict):
+            self.state.update(msg.topic, payload)
+
+    async def _send(self, view, frame, tick):
+        view.busy = True
+        try:
+            await asyncio.wait_for(view.ws.send(frame), self.send_timeout)
+            view.version = tick
+            view.sent += 1
+        except asyncio.TimeoutError:
+            print(f"[gateway] client {view.ws.remote_address} stalled > {self.send_timeout}s, closing")
+            self.clients.discard(view)
+            await view.ws.close(code=1013, reason="too slow")
+        except websockets.ConnectionClosed:
+            self.clients.discard(view)
+        finally:
+            view.busy = False
+
+    async def handler(self, ws, path=None):
+        view = ClientView(ws)
+        # snapshot is built from committed state only, so the next shared delta continues from it
+        tick = self.tick
+        snapshot = self.state.since(-1)
+        await ws.send(json.dumps({"type": "snapshot", "tick": tick, "state": nest(snapshot)}))
+        view.version = tick
+        self.clients.add(view)
+        try:
+            async for _ in ws:
+                pass  # browser -> gateway messages are ignored
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(view)
+
+    async def ticker(self):
+        loop = asyncio.get_running_loop()
+        next_t = loop.time()
+        while True:
+            next_t += self.ui_period
+            await asyncio.sleep(max(0.0, next_t - loop.time()))
+            tick = self.tick + 1
+            changes = self.state.commit(tick)
+            self.tick = tick
+            shared = None
+            for view in list(self.clients):
+                if view.busy:
+                    view.skipped += 1  # conflate: picked up by the next catch-up delta
+                    continue
+                if view.version == tick - 1:
+                    if not changes:
+                        view.version = tick
+                        continue
+                    if shared is None:
+                        shared = json.dumps({"type": "delta", "tick": tick, "changes": nest(changes)})
+                    frame = shared
+                else:
+                    # client missed ticks while busy: one delta covering everything since its last frame
+                    catch_up = self.state.since(view.version)
+                    if not catch_up:
+                        view.version = tick
+                        continue
+                    frame = json.dumps({"type": "delta", "tick": tick, "changes": nest(catch_up)})
+                asyncio.ensure_future(self._send(view, frame, tick))
+
+    async def report(self, interval):
+        last = 0
+        while True:
+            await asyncio.sleep(interval)
+            n = self.state.messages
+            skipped = sum(v.skipped for v in self.clients)
+            print(f"[gateway] {len(self.clients)} clients, {(n - last) / interval:.0f} msg/s in, "
+                  f"tick {self.tick}, {skipped} conflated frames")
+            last = n
+
+    async def serve(self, host, port, report_interval=10.0):
+        async with websockets.serve(self.handler, host, port, write_limit=2 ** 16, max_size=2 ** 16):
+            print(f"Twin gateway on ws://{host}:{port} at {1.0 / self.ui_period:g} Hz")
+            await asyncio.gather(self.ticker(), self.report(report_interval))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1",
+                        help="MQTT broker host, or host[:port],... to merge the streams of several brokers")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--ws-host", default="0.0.0.0", help="WebSocket listen address")
+    parser.add_argument("--ws-port", type=int, default=8765, help="WebSocket listen port")
+    parser.add_argument("--ui-rate", type=float, default=4.0, help="browser update rate (Hz)")
+    parser.add_argument("--send-timeout", type=float, default=5.0, help="disconnect clients blocked this long (s)")
+    args = parser.parse_args()
+
+    from plant_sim import make_mqtt_client
+
+    gw = TwinGateway(ui_rate=args.ui_rate, send_timeout=args.send_timeout)
+    mq = make_mqtt_client("monitor-local", broker_host=args.broker, broker_port=args.port,
+                          client_id="twin-gateway")
+    mq.on_message = gw.on_message
+    mq.subscribe("electrolyser/plant-A/#", qos=0)
+    try:
+        asyncio.run(gw.serve(args.ws_host, args.ws_port))
+    except KeyboardInterrupt:
+        print("Stopping gateway")
+    finally:
+        mq.loop_stop()
+        mq.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -61,6 +61,15 @@ topic read electrolyser/plant-A/#
 
 user monitor-local
 topic read electrolyser/#
+# consumer-side monitors (sequence integrity, ...) report here
+topic write electrolyser/monitor/#
+# fault_detector.py raise/clear events
+topic write electrolyser/detections/#
+# derived KPIs (plant_sim.py and kpi.py)
+topic write electrolyser/plant-A/+/kpi/#
+# live profiling: profiler.py commands and the simulator's results (profiler.py)
+topic write electrolyser/control/profile
+topic write electrolyser/control/profile/result/#
 EOF
 
 chmod 700 "$ACLFILE"
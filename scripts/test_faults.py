@@ -4,6 +4,7 @@ test_faults.py
 Automated verification script for electrolyser fault simulation.
 """
 
+import sys
 import json
 import time
 import ssl
@@ -12,6 +13,11 @@ import argparse
 from paho.mqtt import client as mqtt
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "clients" / "python"))
+
+from seq_tracker import SequenceTracker
+from latency import LatencyRecorder
+from tsdb import TimeSeriesStore
 
 # Fault names matching plant_sim.py
 FAULTS = [
@@ -22,13 +28,20 @@ FAULTS = [
 ]
 
 class FaultTester:
-    def __init__(self, broker="127.0.0.1", port=8883):
+    def __init__(self, broker="127.0.0.1", port=8883, latency_out=None, tsdb_dir=None):
         self.broker = broker
         self.port = port
+        self.latency_out = latency_out
+        # optional embedded time-series store (clients/python/tsdb.py): the run's telemetry is kept on disk
+        self.store = TimeSeriesStore(tsdb_dir) if tsdb_dir else None
+        self.fault_started = None
         self.client = None
         self.received_messages = {}
         self.history = {}
         self.running = True
+        # sequence integrity across the whole run (not cleared between faults)
+        self.seq_tracker = SequenceTracker()
+        self.latency = LatencyRecorder()
 
     def connect(self):
         # Use monitor-local certs
@@ -46,6 +59,7 @@ class FaultTester:
         self.client.loop_start()
 
     def on_message(self, client, userdata, msg):
+        recv_ts = time.time()
         try:
             payload = json.loads(msg.payload)
             topic = msg.topic
@@ -56,6 +70,10 @@ class FaultTester:
             if topic not in self.history:
                 self.history[topic] = []
             self.history[topic].append(payload)
+            self.seq_tracker.observe_message(topic, payload)
+            if self.store:
+                self.store.update(topic, payload, recv_ts)
+            self.latency.record_message(topic, payload, recv_ts)
         except:
             pass
 
@@ -74,6 +92,14 @@ class FaultTester:
 
     def get_history(self, topic_suffix):
         # Return all messages for topics ending with suffix
+        if self.store:
+            # readings since the current fault was injected, from the store
+            res = []
+            for t in self.store.names():
+                if t.endswith(topic_suffix):
+                    ts, vals = self.store.range(t, start=self.fault_started)
+                    res.extend({"timestamp": x, "value": v} for x, v in zip(ts, vals))
+            return res
         res = []
         for t, msgs in self.history.items():
             if t.endswith(topic_suffix):
@@ -84,6 +110,7 @@ class FaultTester:
         print(f"\nTesting {fault_name}...")
         self.received_messages.clear()
         self.history = {}
+        self.fault_started = time.time()
         self.inject_fault("EL1", fault_name, True)
         time.sleep(4) # Wait for effect
 
@@ -238,9 +265,30 @@ class FaultTester:
         for f, r in results.items():
             print(f"{f}: {'PASS' if r else 'FAIL'}")
 
+        # telemetry_dropout should show up here as lost sequence ids on EL1 only
+        print("\nSequence integrity:")
+        for line in self.seq_tracker.summary_lines():
+            print(line)
+
+        print("\nPublish-to-receive latency:")
+        for line in self.latency.summary_lines():
+            print(line)
+        if self.latency_out:
+            self.latency.dump(self.latency_out)
+            print(f"Latency report written to {self.latency_out}")
+
         self.client.loop_stop()
         self.client.disconnect()
+        if self.store:
+            self.store.close()
+            print(f"Telemetry stored in {self.store.path}: {self.store.stats()}")
 
 if __name__ == "__main__":
-    tester = FaultTester()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="127.0.0.1", help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=8883, help="MQTT broker port")
+    parser.add_argument("--latency-out", default=None, help="write the latency histogram report (JSON) here")
+    parser.add_argument("--tsdb", default=None, metavar="DIR", help="record the run into an embedded time-series store (clients/python/tsdb.py)")
+    args = parser.parse_args()
+    tester = FaultTester(broker=args.broker, port=args.port, latency_out=args.latency_out, tsdb_dir=args.tsdb)
     tester.run()
@@ -0,0 +1,107 @@
+from broker_pool import BrokerPool, HashRing, MultiBrokerClient, parse_brokers
+from topic_alias import TopicAliasPublisher, combined_stats
+
+A, B, C = ("10.0.0.1", 8883), ("10.0.0.2", 8883), ("10.0.0.3", 8884)
+KEYS = [f"sensor-EL{e}-{s}" for e in (1, 2) for s in range(40)]
+
+
+class FakeClient:
+    """Stands in for a connected paho client on one broker."""
+
+    def __init__(self, broker, alive):
+        self.broker = broker
+        self.alive = alive
+        self.published = []
+        self.subscriptions = []
+        self.on_message = None
+        self.stopped = False
+
+    def is_connected(self):
+        return self.broker in self.alive and not self.stopped
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self.published.append(topic)
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append(topic)
+
+    def loop_stop(self):
+        self.stopped = True
+
+    def disconnect(self):
+        pass
+
+
+def test_parse_brokers():
+    assert parse_brokers("10.0.0.1, 10.0.0.2:8884,10.0.0.1:8883") == [("10.0.0.1", 8883), ("10.0.0.2", 8884)]
+    assert parse_brokers("broker", 1883) == [("broker", 1883)]
+
+
+def test_ring_moves_only_the_lost_brokers_keys():
+    ring = HashRing([A, B, C])
+    before = {k: ring.owner(k) for k in KEYS}
+    assert all(sum(1 for o in before.values() if o == b) > 10 for b in (A, B, C))
+    ring.remove(B)
+    after = {k: ring.owner(k) for k in KEYS}
+    assert all(after[k] == before[k] for k in KEYS if before[k] != B)
+    assert B not in after.values()
+    ring.add(B)
+    assert {k: ring.owner(k) for k in KEYS} == before
+
+
+def test_pool_fails_over_and_rebalances_back():
+    alive = {A, B, C}
+    pool = BrokerPool([A, B, C], grace_s=5.0)
+    pool.probe = lambda broker: broker in alive
+    pool.start = lambda: None  # health checks are driven by the test
+    clients = [pool.client(k, lambda host, port: FakeClient((host, port), alive)) for k in KEYS]
+    home = {sc.key: sc.broker for sc in clients}
+
+    alive.discard(B)
+    pool.check(now=100.0)
+    assert pool.down == set()  # within the grace period
+    pool.check(now=105.0)
+    assert pool.down == {B}
+    for sc in clients:
+        assert sc.broker != B and sc.client.is_connected()
+        assert sc.moves == (1 if home[sc.key] == B else 0)
+
+    alive.add(B)
+    pool.check(now=110.0)
+    assert pool.down == set() and {sc.key: sc.broker for sc in clients} == home
+    sc = next(sc for sc in clients if home[sc.key] == B)
+    sc.publish("electrolyser/plant-A/EL1/stack/current", "{}")
+    assert sc.moves == 2 and sc.connections() == [sc.client]  # plain clients leave no counters behind
+    assert sc.client.published == ["electrolyser/plant-A/EL1/stack/current"]
+
+
+def test_moved_client_keeps_only_its_counters():
+    alive = {A, B}
+    pool = BrokerPool([A, B])
+    pool.start = lambda: None
+    sc = pool.client(KEYS[0], lambda host, port: TopicAliasPublisher(FakeClient((host, port), alive)))
+    topic = "electrolyser/plant-A/EL1/stack/current"
+    sc.publish(topic, "{}", qos=1)
+    first = sc.client
+    for broker in (B if sc.broker == A else A, sc.broker):
+        sc.connect_to(broker)
+        sc.publish(topic, "{}", qos=1)
+    conns = sc.connections()
+    assert conns[0] is sc.client and first not in conns and len(conns) == 2
+    st = combined_stats(conns)
+    assert st["clients"] == 3 and st["messages"] == 3 and st["bytes_full"] == 3 * sc.client.stats()["bytes_full"]
+
+
+def test_multi_broker_client_merges_streams():
+    alive = {A, B}
+    made = {}
+    mc = MultiBrokerClient([A, B], lambda host, port: made.setdefault((host, port), FakeClient((host, port), alive)))
+    got = []
+    mc.on_message = lambda client, userdata, msg: got.append(msg)
+    mc.subscribe("electrolyser/plant-A/#", qos=1)
+    assert all(c.subscriptions == ["electrolyser/plant-A/#"] for c in made.values())
+    made[A].on_message(made[A], None, "m1")
+    made[B].on_message(made[B], None, "m2")
+    assert got == ["m1", "m2"]
+    mc.publish("electrolyser/detections/EL1", "{}")
+    assert sum(len(c.published) for c in made.values()) == 1
@@ -0,0 +1,45 @@
+from array import array
+
+import pytest
+
+from campaign import write_columns, read_columns, run_one
+
+
+def test_column_roundtrip(tmp_path):
+    cols = [("t", array("d", [1.5, 2.5])), ("series", array("H", [0, 3])), ("label", array("I", [0, 1 << 15]))]
+    path = tmp_path / "x.elc"
+    write_columns(path, cols, {"series": ["a", "b", "c", "d"]})
+    header, out = read_columns(path, names={"series", "label"})
+    assert set(out) == {"series", "label"}
+    assert list(out["label"]) == [0, 1 << 15] and header["series"][3] == "d"
+
+
+def test_run_is_labeled_and_reproducible(tmp_path):
+    scenario = {"duration_s": 20, "physics_dt": 0.05, "seed": 7, "start_time": 1000.0,
+                "injections": [{"el": "EL1", "fault": "gas_crossover", "start": 5, "duration": 5, "severity": 2.0}]}
+    r = run_one(scenario, 0, tmp_path)
+    assert r["injections"] == [{"el": "EL1", "fault": "gas_crossover", "start": 5.0, "end": 10.0, "severity": 2.0}]
+    header, cols = read_columns(tmp_path / r["file"])
+    bit = 1 << header["faults"]["gas_crossover"]
+    for t, s, label in zip(cols["t"], cols["series"], cols["label"]):
+        # the fault acts on the physics steps from t=5 s, so it shows in samples taken in (5, 10]
+        on = header["series"][s].startswith("EL1/") and 1005.0 < t <= 1010.0
+        assert bool(label & bit) == on, (t, header["series"][s])
+    first = (tmp_path / r["file"]).read_bytes()
+    run_one(scenario, 0, tmp_path)
+    assert (tmp_path / r["file"]).read_bytes() == first
+
+
+@pytest.mark.parametrize("dt", [0.01, 0.1, 1.0])
+def test_dcdc_failure_current_does_not_depend_on_physics_step(dt):
+    from plant_sim import I_REF, ElectrolyserTwin
+
+    twin = ElectrolyserTwin("EL1")
+    twin.fault_injector.verbose = False
+    for _ in range(int(20 / dt)):
+        twin.update_from_pv(900.0, dt)
+    for severity in (0.5, 0.25, 1.0):
+        twin.fault_injector.set_fault("dcdc_failure", severity=severity)
+        for _ in range(int(20 / dt)):
+            twin.update_from_pv(900.0, dt)
+        assert twin.I_stack == pytest.approx(I_REF * (1.0 - severity), abs=1e-3)
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import checkpoint
+from plant_sim import PlantSimulator
+
+
+def advance(sim, steps, dt=0.05):
+    for _ in range(steps):
+        sim.step(dt)
+
+
+def test_warm_restart_continues_where_the_run_stopped(tmp_path):
+    random.seed(1)
+    sim = PlantSimulator(topic_aliases=False, stack_model="polarization")
+    sim.electrolysers["EL1"].fault_injector.verbose = False
+    sim.electrolysers["EL1"].fault_injector.set_fault("o2_blockage", severity=0.5)
+    advance(sim, 200)
+    sim.electrolysers["EL2"].next_seq("stack_current")
+    sim.irr_seq[1] = 7
+    state = sim.get_state()
+    state.update(version=checkpoint.VERSION, saved_at=1000.0, clean=True)
+    path = tmp_path / "plant.ckpt"
+    checkpoint.save(state, path)
+    advance(sim, 100)
+    expected = sim.get_state()
+
+    random.seed(2)  # the restarted process draws different stack parameters first
+    restarted = PlantSimulator(topic_aliases=False, stack_model="polarization")
+    assert checkpoint.resume(restarted, path, now=1005.0) is not None
+    assert restarted.electrolysers["EL1"].fault_injector.snapshot() == {13}
+    assert restarted.electrolysers["EL2"].seq == {"stack_current": 1} and restarted.irr_seq[1] == 7
+    advance(restarted, 100)
+    assert restarted.get_state() == expected
+
+
+def test_unclean_checkpoint_skips_sequence_ids(tmp_path):
+    sim = PlantSimulator(topic_aliases=False, sensor_rates={"stack_current": 10.0})
+    el = sim.electrolysers["EL1"]
+    el.seq.update({"stack_current": 50, "tank_pressure": 5, "kpi_energy": 2})
+    state = sim.get_state()
+    state.update(version=checkpoint.VERSION, saved_at=1000.0, clean=False)
+    path = tmp_path / "plant.ckpt"
+    checkpoint.save(state, path)
+
+    restarted = PlantSimulator(topic_aliases=False, sensor_rates={"stack_current": 10.0})
+    checkpoint.resume(restarted, path, now=1002.5)
+    # 2.5 s since the checkpoint: at most 25 (+1) current samples, 3 (+1) at 1 Hz, 1 (+1) KPI at 0.1 Hz
+    assert restarted.electrolysers["EL1"].seq == {"stack_current": 76, "tank_pressure": 9, "kpi_energy": 4}
+    assert restarted.irr_seq == {1: 4, 2: 4}
+
+
+def test_corrupt_checkpoint_is_rejected(tmp_path):
+    sim = PlantSimulator(topic_aliases=False)
+    data = bytearray(checkpoint.encode({**sim.get_state(), "version": checkpoint.VERSION}))
+    data[-3] ^= 0xFF
+    with pytest.raises(ValueError):
+        checkpoint.decode(bytes(data))
+    with pytest.raises(ValueError):
+        checkpoint.decode(bytes(data[:20]))
+
+
+def test_zero_interval_only_checkpoints_on_exit(tmp_path):
+    sim = PlantSimulator(topic_aliases=False, checkpoint=tmp_path / "plant.ckpt", checkpoint_interval=0)
+    sim.checkpointer = checkpoint.Checkpointer(sim, sim.checkpoint_path)
+    assert "checkpoint" not in [t.name for t in sim.build_scheduler().tasks]
+    sim.checkpointer.close()
+    assert checkpoint.load(sim.checkpoint_path)["clean"]
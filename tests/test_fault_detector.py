@@ -0,0 +1,49 @@
+from fault_detector import FaultDetector
+
+
+def reading(el, sensor, value, ts, cell=None):
+    p = {"el": el, "sensor": sensor, "value": value, "timestamp": ts}
+    if cell is not None:
+        p["cell"] = cell
+    return p
+
+
+def healthy(det, el, ts, h2=0.065, o2=0.0322):
+    events = []
+    for c in range(1, 6):
+        events += det.process("t", reading(el, f"cell_{c}_voltage", 1.9, ts, c), ts)
+    events += det.process("t", reading(el, "stack_current", 1.8, ts), ts)
+    events += det.process("t", reading(el, "h2_flow_rate", h2, ts), ts)
+    events += det.process("t", reading(el, "o2_flow_rate", o2, ts), ts)
+    return events
+
+
+def test_signature_must_hold_before_raise_and_clears():
+    det = FaultDetector(hold_s=2.0, clear_s=3.0)
+    events = []
+    for t in range(5):
+        events += healthy(det, "EL1", float(t))
+    assert events == []
+
+    # H2/O2 ratio ~2.6: crossover, raised only after the hold time
+    for t in range(5, 15):
+        events += healthy(det, "EL1", float(t), o2=0.025)
+    raised = [e for e in events if e["active"]]
+    assert [e["fault"] for e in raised] == ["gas_crossover"]
+    assert raised[0]["timestamp"] - 5.0 >= 2.0
+
+    for t in range(15, 40):
+        events += healthy(det, "EL1", float(t))
+    assert [(e["fault"], e["active"]) for e in events] == [("gas_crossover", True), ("gas_crossover", False)]
+    assert det.active() == {}
+
+
+def test_dropout_only_when_other_els_report():
+    det = FaultDetector(dropout_s=5.0)
+    healthy(det, "EL1", 0.0)
+    healthy(det, "EL2", 0.0)
+    assert det.sweep(now=10.0) == []  # whole plant silent: not a per-EL fault
+    healthy(det, "EL2", 10.0)
+    events = det.sweep(now=10.5)
+    assert [(e["el"], e["fault"]) for e in events] == [("EL1", "telemetry_dropout")]
+    assert [e["fault"] for e in healthy(det, "EL1", 11.0)] == ["telemetry_dropout"]
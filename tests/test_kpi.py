@@ -0,0 +1,33 @@
+import pytest
+
+from kpi import KpiCalculator, FARADAY, MOLAR_VOLUME_L
+
+
+def ideal_flow_Lpm(n_cells, current):
+    return n_cells * current / (2.0 * FARADAY) * MOLAR_VOLUME_L * 60.0
+
+
+def test_simulator_mode_totals_and_efficiency():
+    calc = KpiCalculator("EL1", n_cells=5)
+    for _ in range(3600):
+        calc.step(1.0, 10.0, 2.0, ideal_flow_Lpm(5, 2.0))
+    k = calc.report()
+    assert k["stack_power"] == pytest.approx(20.0)
+    assert k["energy"] == pytest.approx(0.02)
+    assert k["faraday_efficiency"] == pytest.approx(100.0)
+    # 2 V per cell at 100 % Faraday efficiency -> LHV efficiency 1.253 V / 2 V
+    assert k["stack_efficiency"] == pytest.approx(100.0 * 241.83e3 / (2 * FARADAY) / 2.0)
+    assert k["specific_energy"] == pytest.approx(k["energy"] / k["h2_yield"])
+    # interval KPIs restart after each report
+    assert "stack_efficiency" not in calc.report()
+
+
+def test_subscriber_mode_holds_values_and_skips_gaps():
+    calc = KpiCalculator("EL1", n_cells=2, max_gap_s=5.0)
+    for t in range(11):
+        for c in (1, 2):
+            calc.observe(f"cell_{c}_voltage", 2.0, float(t), c)
+        calc.observe("stack_current", 1.0, float(t))
+    assert calc.energy_J == pytest.approx(40.0)  # 4 W for 10 s
+    calc.observe("stack_current", 1.0, 60.0)  # link dropped for 50 s
+    assert calc.energy_J == pytest.approx(40.0) and calc.skipped_s == pytest.approx(50.0)
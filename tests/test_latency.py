@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from latency import LatencyHistogram, LatencyRecorder, PROBE_TOPIC, topic_class
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    rng = random.Random(7)
+    samples = sorted(rng.expovariate(1 / 0.005) for _ in range(20000))
+    h = LatencyHistogram()
+    for s in samples:
+        h.record(s)
+    for p in (50.0, 99.0, 99.9):
+        exact = samples[int(p / 100 * len(samples)) - 1]
+        assert h.percentile_us(p) / 1e6 == pytest.approx(exact, rel=0.02, abs=2e-6)
+    assert h.max_us == int(round(samples[-1] * 1e6))
+
+
+def test_topic_class_and_skew_detection():
+    assert topic_class("electrolyser/plant-A/EL2/cell/3/voltage") == "cell/+/voltage"
+    assert topic_class("electrolyser/plant-A/irradiance/1") == "irradiance/+"
+
+    rec = LatencyRecorder()
+    rec.record_message(PROBE_TOPIC, {"probe_ts": 100.0}, recv_ts=100.002)
+    rec.record_message("electrolyser/plant-A/EL1/stack/current", {"timestamp": 100.0}, recv_ts=100.003)
+    assert rec.skew_check()["status"] == "ok"
+
+    # publisher clock 50 ms ahead of the consumer
+    rec.record_message("electrolyser/plant-A/EL1/stack/current", {"timestamp": 200.05}, recv_ts=200.003)
+    clock = rec.report()["clock"]
+    assert clock["negative_samples"] == 1 and clock["skew_estimate_ms"] == pytest.approx(49.0, abs=0.1)
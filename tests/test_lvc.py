@@ -0,0 +1,82 @@
+import json
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+from lvc import LastValueCache, RingSeries, make_handler
+
+
+def test_ring_wraps_and_keeps_newest_window():
+    ring = RingSeries(4)
+    for k in range(10):
+        ring.append(float(k), k * 10.0)
+    assert ring.size == 4
+    assert ring.range(None, None) == ([6.0, 7.0, 8.0, 9.0], [60.0, 70.0, 80.0, 90.0])
+    assert ring.point(7.5) == (7.0, 70.0)
+    assert ring.point(9.0) == (9.0, 90.0)
+    assert ring.point(5.9) is None  # older than the window
+    # both bounds inclusive; with a limit the most recent samples win
+    assert ring.range(7.0, 8.5) == ([7.0, 8.0], [70.0, 80.0])
+    assert ring.range(None, 9.0, limit=2) == ([8.0, 9.0], [80.0, 90.0])
+
+    ring.append(3.0, -1.0)
+    assert ring.out_of_order == 1
+    assert ring.range(None, None)[0] == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_cache_latest_and_numeric_series():
+    cache = LastValueCache(window=8)
+    topic = "electrolyser/plant-A/EL1/stack/current"
+    cache.update(topic, {"timestamp": 100.0, "value": 1.8})
+    cache.update(topic, {"timestamp": 101.0, "value": 1.9})
+    cache.update(topic, {"timestamp": 100.5, "value": 1.7})  # late: neither latest nor the window
+    cache.update("electrolyser/plant-A/EL1/status", {"state": "running"}, recv_ts=101.0)
+
+    assert cache.get_latest(topic) == {"timestamp": 101.0, "value": 1.9}
+    assert cache.range(topic) == ([100.0, 101.0], [1.8, 1.9])
+    assert cache.range("electrolyser/plant-A/EL1/status") is None  # event payloads only have a latest
+    assert cache.topics() == ["electrolyser/plant-A/EL1/stack/current", "electrolyser/plant-A/EL1/status"]
+    assert list(cache.snapshot("electrolyser/plant-A/EL1/stack")) == [topic]
+
+
+@pytest.fixture
+def lvc_http():
+    cache = LastValueCache(window=16)
+    for k in range(5):
+        cache.update("electrolyser/plant-A/EL1/tank/pressure", {"timestamp": 10.0 + k, "value": 12.0 + k})
+        cache.update("electrolyser/plant-A/EL2/tank/pressure", {"timestamp": 10.0 + k, "value": 20.0 + k})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(cache))
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(path):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}{path}", timeout=2) as r:
+                return r.status, json.load(r)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield get
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_latest(lvc_http):
+    code, snap = lvc_http("/latest?prefix=electrolyser/plant-A/EL1/")
+    assert code == 200
+    assert snap == {"electrolyser/plant-A/EL1/tank/pressure": {"timestamp": 14.0, "value": 16.0}}
+    code, one = lvc_http("/latest?series=electrolyser/plant-A/EL2/tank/pressure")
+    assert (code, one["value"]) == (200, 24.0)
+    assert lvc_http("/latest?series=electrolyser/plant-A/EL3/tank/pressure")[0] == 404
+
+
+def test_http_point_and_range(lvc_http):
+    series = "series=electrolyser/plant-A/EL1/tank/pressure"
+    assert lvc_http(f"/point?{series}&t=12.5") == (200, {"t": 12.0, "v": 14.0})
+    assert lvc_http(f"/point?{series}&t=9")[0] == 404
+    assert lvc_http(f"/range?{series}&start=11&end=13") == (200, {"t": [11.0, 12.0, 13.0], "v": [13.0, 14.0, 15.0]})
+    assert lvc_http(f"/range?{series}&limit=2") == (200, {"t": [13.0, 14.0], "v": [15.0, 16.0]})
+    assert lvc_http(f"/range?{series}&start=abc")[0] == 400
+    assert lvc_http("/nothing")[0] == 400
@@ -0,0 +1,170 @@
+import socket
+import threading
+import time
+from threading import Thread
+
+from paho.mqtt import client as mqtt
+
+from mqtt_reactor import MqttReactor, ReactorClient
+
+
+class TinyBroker:
+    """Just enough MQTT v5 on plain TCP: CONNACK, PUBACK, PINGRESP; records published topics."""
+
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.conns = []
+        self.connects = 0
+        self.topics = []
+        self.lock = threading.Lock()
+        Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.conns.append(conn)
+            Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        buf = b""
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            while len(buf) >= 2:
+                length, mult, i = 0, 1, 1
+                while True:
+                    if i >= len(buf):
+                        break
+                    length += (buf[i] & 0x7F) * mult
+                    mult *= 128
+                    i += 1
+                    if not buf[i - 1] & 0x80:
+                        break
+                else:
+                    break
+                if len(buf) < i + length:
+                    break
+                head, body, buf = buf[0], buf[i:i + length], buf[i + length:]
+                self.handle(conn, head, body)
+
+    def handle(self, conn, head, body):
+        kind = head & 0xF0
+        if kind == 0x10:
+            with self.lock:
+                self.connects += 1
+            conn.sendall(b"\x20\x03\x00\x00\x00")
+        elif kind == 0x30:
+            n = int.from_bytes(body[:2], "big")
+            with self.lock:
+                self.topics.append(body[2:2 + n].decode())
+            if (head >> 1) & 3:
+                conn.sendall(b"\x40\x02" + body[2 + n:4 + n])
+        elif kind == 0xC0:
+            conn.sendall(b"\xd0\x00")
+
+    def drop_all(self):
+        with self.lock:
+            conns, self.conns = self.conns, []
+        for c in conns:
+            c.shutdown(socket.SHUT_RDWR)
+            c.close()
+
+
+def wait_until(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def connect_clients(reactor, broker, n):
+    clients = []
+    for i in range(n):
+        c = ReactorClient(reactor, client_id=f"sensor-{i}", protocol=mqtt.MQTTv5)
+        c.connect("127.0.0.1", broker.port, keepalive=30)
+        c.loop_start()
+        clients.append(c)
+    assert wait_until(lambda: all(c.is_connected() for c in clients))
+    return clients
+
+
+def test_one_thread_serves_many_clients():
+    broker = TinyBroker()
+    reactor = MqttReactor(threads=1)
+    clients = connect_clients(reactor, broker, 40)
+    infos = [c.publish(f"electrolyser/plant-A/EL1/s{i}", str(k), qos=1)
+             for k in range(5) for i, c in enumerate(clients)]
+    assert wait_until(lambda: len(broker.topics) == 200 and all(info.is_published() for info in infos))
+    # no paho network thread per client; the reconnect thread only starts on a lost connection
+    assert [t.name for t in threading.enumerate() if "mqtt" in t.name] == ["mqtt-io-0"]
+    assert reactor.stats() == {"io_threads": 1, "clients": 40, "sockets": 40}
+    for c in clients:
+        c.loop_stop()
+        c.disconnect()
+    assert reactor.stats()["sockets"] == 0
+    reactor.stop()
+
+
+class RacingClient(ReactorClient):
+    """Queues a publish right after loop_write() found nothing left to write, the way
+    another thread's publish() can land before the write interest is dropped."""
+
+    race = None
+    writing = False
+
+    def loop_write(self, max_packets=1):
+        self.writing = True
+        try:
+            return super().loop_write(max_packets)
+        finally:
+            self.writing = False
+
+    def want_write(self):
+        pending = super().want_write()
+        if not pending and self.writing and self.race:
+            topic, self.race = self.race, None
+            self.publish(topic, "1", qos=1)
+        return pending
+
+
+def test_publish_racing_write_unregister_is_not_lost():
+    broker = TinyBroker()
+    reactor = MqttReactor(threads=1)
+    c = RacingClient(reactor, client_id="sensor-race", protocol=mqtt.MQTTv5)
+    c.connect("127.0.0.1", broker.port, keepalive=30)
+    c.loop_start()
+    assert wait_until(c.is_connected)
+    c.race = "electrolyser/plant-A/EL1/s2"
+    c.publish("electrolyser/plant-A/EL1/s1", "1", qos=1)
+    assert wait_until(lambda: len(broker.topics) == 2, timeout=2.0)
+    c.loop_stop()
+    c.disconnect()
+    reactor.stop()
+
+
+def test_dropped_connections_reconnect():
+    broker = TinyBroker()
+    reactor = MqttReactor(threads=2, reconnect_min_s=0.05)
+    clients = connect_clients(reactor, broker, 6)
+    assert [l.assigned for l in reactor.loops] == [3, 3]
+    broker.drop_all()
+    assert wait_until(lambda: broker.connects == 12 and all(c.is_connected() for c in clients))
+    for i, c in enumerate(clients):
+        c.publish(f"electrolyser/plant-A/EL2/s{i}", "1", qos=1)
+    assert wait_until(lambda: len(broker.topics) == 6)
+    for c in clients:
+        c.loop_stop()
+        c.disconnect()
+    reactor.stop()
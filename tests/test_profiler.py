@@ -0,0 +1,65 @@
+import time
+import pstats
+from threading import Event
+
+from profiler import LiveProfiler, RESULT_TOPIC
+
+
+def busy_physics(seconds):
+    end = time.monotonic() + seconds
+    x = 0.0
+    while time.monotonic() < end:
+        x += sum(i * 0.5 for i in range(200))
+    return x
+
+
+def collect(replies, done):
+    def reply(topic, obj):
+        replies.append((topic, obj))
+        if obj["status"] in ("done", "error"):
+            done.set()
+    return reply
+
+
+def test_sampling_capture_writes_collapsed_stacks(tmp_path):
+    replies, done = [], Event()
+    prof = LiveProfiler(tmp_path, reply=collect(replies, done))
+    prof.handle({"action": "start", "mode": "sample", "seconds": 0.3, "interval_ms": 2, "id": "s1"})
+    prof.handle({"action": "start", "mode": "cprofile", "seconds": 1, "id": "s2"})
+    busy_physics(0.5)  # this thread is the profiled "simulator"
+    assert done.wait(5.0)
+    statuses = [(obj["id"], obj["status"]) for _, obj in replies]
+    assert statuses == [("s1", "started"), ("s2", "busy"), ("s1", "done")]
+    topic, result = replies[-1]
+    assert topic == RESULT_TOPIC and result["samples"] > 20
+    lines = open(result["path"]).read().splitlines()
+    assert any("busy_physics (test_profiler.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.split(";")[-1] == result["top"][0][0] and int(count) > 0
+
+
+def test_cprofile_capture_runs_on_the_polling_thread(tmp_path):
+    replies, done = [], Event()
+    prof = LiveProfiler(tmp_path, reply=collect(replies, done))
+    prof.handle({"action": "start", "mode": "cprofile", "seconds": 30, "reply_to": RESULT_TOPIC + "/ops", "id": "c1"})
+    for i in range(20):  # scheduler loop: physics plus the profiler's poll task
+        busy_physics(0.01)
+        prof.poll()
+        if i == 10:
+            prof.handle({"action": "stop", "id": "c2"})
+    assert done.wait(5.0)
+    assert [obj["status"] for _, obj in replies] == ["started", "stopping", "done"]
+    assert [topic for topic, _ in replies] == [RESULT_TOPIC + "/ops", RESULT_TOPIC, RESULT_TOPIC + "/ops"]
+    stats = pstats.Stats(replies[-1][1]["path"])
+    assert any(func == "busy_physics" for _, _, func in stats.stats)
+    assert replies[-1][1]["seconds"] < 5.0
+
+
+def test_unsafe_id_and_reply_topic_are_refused(tmp_path):
+    replies = []
+    prof = LiveProfiler(tmp_path / "profiles", reply=lambda topic, obj: replies.append((topic, obj)))
+    prof.handle({"action": "start", "mode": "sample", "seconds": 1, "id": "../../escape"})
+    prof.handle({"action": "status", "id": "s1", "reply_to": "electrolyser/control/faults"})
+    assert replies[0] == (RESULT_TOPIC, {"status": "error", "error": "id must be 1-64 of [A-Za-z0-9_-]"})
+    assert replies[1] == (RESULT_TOPIC, {"id": "s1", "status": "idle"})
+    assert prof.capture is None and not list(tmp_path.rglob("*"))
@@ -0,0 +1,71 @@
+from threading import Event
+
+import pytest
+
+from scheduler import MultiRateScheduler, VirtualClock, measure, name_phase, parse_rate_overrides
+
+
+def run_for(sched, clock, seconds, step_fn):
+    stop = Event()
+
+    def step(dt):
+        step_fn(dt)
+        if clock.now >= seconds:
+            stop.set()
+
+    sched.run(step, stop)
+
+
+def test_physics_steps_decoupled_from_publish_rates():
+    clock = VirtualClock()
+    sched = MultiRateScheduler(physics_dt=0.01, clock=clock, wall_clock=lambda: 1000.0, sleep=clock.sleep)
+    fast, slow = [], []
+    sched.add_task("stack_current", 10.0, fast.append)
+    sched.add_task("tank_pressure", 0.5, slow.append)
+    steps = []
+    run_for(sched, clock, 4.0, steps.append)
+
+    assert abs(len(steps) - 400) <= 1
+    assert all(dt == 0.01 for dt in steps)
+    assert 40 <= len(fast) <= 41
+    assert slow[:2] == [1000.0, 1002.0]
+    # timestamps are the scheduled sample times, not the wake-up times
+    assert fast[1] - fast[0] == pytest.approx(0.1)
+
+
+def test_even_spread_staggers_sensors_on_exact_sample_times():
+    clock = VirtualClock()
+    sched = MultiRateScheduler(physics_dt=0.01, clock=clock, wall_clock=lambda: 1000.0, sleep=clock.sleep,
+                               spread="even")
+    fired = {}
+    for n in range(10):
+        sched.add_task(f"EL1/cell_{n}", 1.0, lambda ts, n=n: fired.setdefault(n, []).append((ts, sched.sim_time)))
+    h2 = sched.add_task("EL1/h2_flow_rate", 1.0, lambda ts: None, group="EL1/gas_flow")
+    o2 = sched.add_task("EL1/o2_flow_rate", 1.0, lambda ts: None, group="EL1/gas_flow")
+    run_for(sched, clock, 3.0, lambda dt: None)
+
+    phases = sorted(t.phase for t in sched.tasks)
+    assert len(set(round(p, 6) for p in phases)) == 11  # one physics step each, the flow pair shares one
+    assert h2.phase == o2.phase
+    for n, samples in fired.items():
+        ts = [t for t, _ in samples]
+        assert ts[1] - ts[0] == pytest.approx(1.0)
+        # the sample carries the sim time of the state it reports
+        assert all(t - 1000.0 == pytest.approx(sim) for t, sim in samples)
+    assert sched.meter.peak == 2
+
+
+def test_spread_cuts_peak_to_mean_message_rate():
+    tasks = [(f"EL{e}/s{n}", 1.0, 1) for e in (1, 2) for n in range(12)] + [("EL1/kpi", 0.1, 7)]
+    burst = measure(tasks, 20.0, spread="none")
+    even = measure(tasks, 20.0, spread="even")
+    hashed = measure(tasks, 20.0, spread="hash")
+    assert burst["messages"] == even["messages"] == hashed["messages"] == 24 * 20 + 2 * 7
+    assert burst["peak_to_mean"] > 4 * even["peak_to_mean"]
+    assert hashed["peak_to_mean"] < burst["peak_to_mean"]
+    assert 0.0 <= name_phase("sensor-EL1-stack_current") < 1.0
+
+
+def test_parse_rate_overrides():
+    assert parse_rate_overrides(["stack_current=20", "tank_pressure = 0.2"]) == {
+        "stack_current": 20.0, "tank_pressure": 0.2}
@@ -15,3 +15,50 @@ def test_minimal_valid():
     }
     validate(payload, SCHEMA)
 
+
+def test_compiled_validator_matches_jsonschema():
+    from jsonschema import Draft202012Validator
+    from telemetry_validator import compile_schema, load_schemas
+
+    schemas = load_schemas()
+    cases = [
+        {"el": "EL1", "sensor": "cell_1_voltage", "cell": 1, "unit": "V", "timestamp": 1.7e9, "value": 2.01, "sequence_id": 3},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": 2, "sequence_id": 0},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": "2", "sequence_id": 0},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": True, "sequence_id": 0},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": 1.0, "sequence_id": -1},
+        {"el": "EL9x", "sensor": "stack_current", "timestamp": 1.7e9, "value": 1.0, "sequence_id": 1},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": 1.0},
+        {"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": 1.0, "sequence_id": 1, "extra": 1},
+        {"el": "EL1", "timestamp": 1.7e9, "status": "TRIPPED", "reason": "low_water", "sequence_id": 4},
+        {"el": "EL1", "timestamp": 1.7e9, "status": "BROKEN", "sequence_id": 4},
+    ]
+    for name, schema in schemas.items():
+        check = compile_schema(schema)
+        ref = Draft202012Validator(schema)
+        for payload in cases:
+            assert check(payload) == ref.is_valid(payload), (name, payload)
+
+
+def test_validation_stage_counts_violations_per_topic():
+    from telemetry_validator import ValidationStage
+
+    stage = ValidationStage()
+    good = json.dumps({"el": "EL1", "sensor": "stack_current", "unit": "A", "timestamp": 1.7e9,
+                       "value": 1.8, "sequence_id": 1}).encode()
+    bad = json.dumps({"el": "EL1", "sensor": "stack_current", "timestamp": 1.7e9, "value": None,
+                      "sequence_id": 2}).encode()
+    status = json.dumps({"el": "EL1", "timestamp": 1.7e9, "status": "OPERATIONAL", "sequence_id": 0})
+    valid = stage.check_batch([
+        ("electrolyser/plant-A/EL1/stack/current", good),
+        ("electrolyser/plant-A/EL1/stack/current", bad),
+        ("electrolyser/plant-A/EL1/status", status),
+        ("electrolyser/plant-A/EL1/water_flow", b"not json"),
+    ])
+    assert len(valid) == 2
+    assert stage.check("electrolyser/plant-A/EL1/stack/current", good) is not None
+
+    rep = stage.report()
+    assert rep["messages"] == 5 and rep["violations"] == 2
+    assert rep["topics"]["electrolyser/plant-A/EL1/stack/current"]["violations"] == 1
+    assert rep["topics"]["electrolyser/plant-A/EL1/water_flow"]["reason"] == "invalid JSON"
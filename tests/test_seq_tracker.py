@@ -0,0 +1,67 @@
+from seq_tracker import SequenceTracker, GAP, DUPLICATE, REORDERED, RESET, LATE
+
+
+def feed(tracker, seqs, key="electrolyser/plant-A/EL1/stack/current"):
+    return [tracker.observe(key, s, "EL1", "stack_current") for s in seqs]
+
+
+def test_in_order_stream_has_no_loss():
+    t = SequenceTracker(window=64)
+    feed(t, range(1000))
+    s = t.series_stats("electrolyser/plant-A/EL1/stack/current")
+    assert s["expected"] == 1000 and s["lost"] == 0 and s["duplicates"] == 0 and s["gaps"] == 0
+
+
+def test_gap_duplicate_and_reorder():
+    t = SequenceTracker(window=64)
+    res = feed(t, [0, 1, 2, 5, 5, 3, 6])
+    assert res[3] == GAP and res[4] == DUPLICATE and res[5] == REORDERED
+    s = t.series_stats("electrolyser/plant-A/EL1/stack/current")
+    # id 4 is missing but still inside the window
+    assert s["expected"] == 7 and s["pending"] == 1 and s["lost"] == 0
+    assert s["duplicates"] == 1 and s["reordered"] == 1 and s["max_gap"] == 2
+
+    # once the window has moved past it, id 4 counts as lost; a straggler is recovered as late
+    feed(t, range(7, 200))
+    assert t.series_stats("electrolyser/plant-A/EL1/stack/current")["lost"] == 1
+    assert feed(t, [4]) == [LATE]
+    assert t.series_stats("electrolyser/plant-A/EL1/stack/current")["lost"] == 0
+
+
+def test_publisher_reset_and_per_el_totals():
+    t = SequenceTracker(window=32)
+    feed(t, list(range(100)) + list(range(0, 10)))
+    s = t.series_stats("electrolyser/plant-A/EL1/stack/current")
+    assert s["resets"] == 1 and s["expected"] == 110 and s["lost"] == 0 and s["late"] == 0
+
+    feed(t, [0, 1, 50], key="electrolyser/plant-A/EL1/water_flow")
+    by_el = t.stats()["by_el"]["EL1"]
+    assert by_el["series"] == 2 and by_el["gaps"] == 1
+    assert feed(t, [0], key="x") == ["first"]
+
+
+def test_reset_inside_the_window():
+    # restart before the old stream has moved a window past the new ids
+    t = SequenceTracker(window=64)
+    res = feed(t, list(range(40)) + list(range(0, 10)))
+    assert res[40] == DUPLICATE and res[41] == RESET
+    s = t.series_stats("electrolyser/plant-A/EL1/stack/current")
+    assert s["resets"] == 1 and s["duplicates"] == 0 and s["expected"] == 50 and s["lost"] == 0
+
+    # received and duplicates stay cumulative across the reset, like expected
+    t = SequenceTracker(window=128)
+    res = feed(t, list(range(100)) + [5] + list(range(5, 20)))
+    assert res[102] == RESET
+    s = t.series_stats("electrolyser/plant-A/EL1/stack/current")
+    assert s["received"] == 116 and s["duplicates"] == 1 and s["expected"] == 115 and s["lost"] == 0
+    assert s["received"] - s["duplicates"] == s["expected"]
+
+    # consumer joined mid-stream: a drop below the first id seen is a reset too
+    t = SequenceTracker(window=64)
+    res = feed(t, list(range(500, 520)) + [0, 1, 2])
+    assert res[20:] == [LATE, RESET, "ok"]
+    assert t.series_stats("electrolyser/plant-A/EL1/stack/current")["late"] == 0
+
+    # a single redelivered id is still just a duplicate
+    t = SequenceTracker(window=64)
+    assert feed(t, [0, 1, 2, 3, 1, 4])[4:] == [DUPLICATE, "ok"]
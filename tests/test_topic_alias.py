@@ -0,0 +1,104 @@
+import socket
+import struct
+import threading
+import time
+
+from paho.mqtt import client as mqtt
+
+from topic_alias import TopicAliasPublisher, publish_packet_size
+
+TOPIC = "electrolyser/plant-A/EL1/cell/1/voltage"
+
+
+class FakeBroker:
+    """Just enough MQTT v5: CONNACK with TopicAliasMaximum, records PUBLISH; QoS 1 is only acked
+    from the second connection on, so the first one drops with messages in flight."""
+
+    def __init__(self, alias_max):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.alias_max = alias_max
+        self.conns = []
+        self.publishes = []  # (connection no, topic, alias, packet size); topic None = unknown alias
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            conn, _ = self.sock.accept()
+            self.conns.append(conn)
+            threading.Thread(target=self.handle, args=(conn, len(self.conns)), daemon=True).start()
+
+    def read(self, conn, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                raise OSError("closed")
+            buf += chunk
+        return buf
+
+    def handle(self, conn, n):
+        aliases = {}
+        try:
+            while True:
+                head = self.read(conn, 1)[0]
+                rl, mult, size = 0, 1, 1
+                while True:
+                    b = self.read(conn, 1)[0]
+                    rl, mult, size = rl + (b & 127) * mult, mult * 128, size + 1
+                    if b < 128:
+                        break
+                body = self.read(conn, rl)
+                if head >> 4 == 1:  # CONNECT
+                    props = b"\x22" + struct.pack("!H", self.alias_max)
+                    conn.sendall(bytes([0x20, 3 + len(props), 0, 0, len(props)]) + props)
+                elif head >> 4 == 3:  # PUBLISH
+                    tl = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + tl].decode()
+                    qos = (head >> 1) & 3
+                    i = 2 + tl + (2 if qos else 0)
+                    props = body[i + 1:i + 1 + body[i]]
+                    alias = struct.unpack("!H", props[1:3])[0] if props[:1] == b"\x23" else None
+                    if alias is not None:
+                        topic = aliases.setdefault(alias, topic) if topic else aliases.get(alias)
+                    self.publishes.append((n, topic, alias, size + rl))
+                    if qos and n > 1:
+                        conn.sendall(b"\x40\x02" + body[2 + tl:4 + tl])
+        except OSError:
+            pass
+
+
+def wait_for(cond, timeout=3.0):
+    end = time.time() + timeout
+    while not cond() and time.time() < end:
+        time.sleep(0.02)
+    assert cond()
+
+
+def test_alias_assigned_and_remapped_after_reconnect():
+    broker = FakeBroker(alias_max=10)
+    client = TopicAliasPublisher(mqtt.Client(client_id="t", protocol=mqtt.MQTTv5))
+    client.reconnect_delay_set(0.05, 0.1)
+    client.connect("127.0.0.1", broker.port)
+    client.loop_start()
+    try:
+        wait_for(lambda: client.alias_max == 10)
+        for _ in range(3):
+            client.publish(TOPIC, '{"value": 1.9}', qos=1)
+        wait_for(lambda: len(broker.publishes) == 3)
+        assert [p[:3] for p in broker.publishes] == [(1, TOPIC, 1)] * 3
+        sizes = [p[3] for p in broker.publishes]
+        payload_len = len('{"value": 1.9}')
+        assert sizes[1] == publish_packet_size(0, payload_len, 1, 3) < publish_packet_size(len(TOPIC), payload_len, 1)
+
+        # connection lost with three unacknowledged messages: they are re-sent on the new
+        # connection, and none of them may rely on the old connection's alias
+        broker.conns[0].shutdown(socket.SHUT_RDWR)
+        wait_for(lambda: client.stats()["reconnects"] == 1 and len(broker.publishes) >= 6)
+        client.publish(TOPIC, '{"value": 2.0}', qos=1)
+        wait_for(lambda: len(broker.publishes) == 7)
+        assert all(p[1] == TOPIC for p in broker.publishes)
+        st = client.stats()
+        assert st["messages"] == 4 and st["bytes_sent"] < st["bytes_full"]
+    finally:
+        client.loop_stop()
@@ -0,0 +1,71 @@
+import os
+import math
+import random
+
+from tsdb import TimeSeriesStore, encode_block, BLOCK_HEAD, decode_times, decode_values
+
+TOPIC = "electrolyser/plant-A/EL1/stack/current"
+
+
+def test_block_codec_roundtrip():
+    rng = random.Random(3)
+    ts = [1_700_000_000_000_000 + i * 100_000 + rng.choice((0, 0, 0, 17, -250)) for i in range(300)]
+    vals = [round(rng.uniform(-5, 5), 4) if i % 7 else 1.8 for i in range(300)]
+    vals[10], vals[11] = math.inf, -0.0
+    data = encode_block(ts, vals)
+    head = BLOCK_HEAD.unpack_from(data)
+    ts_len, val_len = head[7], head[8]
+    body = data[BLOCK_HEAD.size:]
+    assert decode_times(ts[0], len(ts), body[:ts_len]) == ts
+    out = decode_values(len(vals), body[ts_len:ts_len + val_len])
+    assert out == vals and math.copysign(1, out[11]) == -1
+
+
+def test_range_downsample_and_reopen(tmp_path):
+    store = TimeSeriesStore(tmp_path, block_size=64)
+    t0 = 1_700_000_000.0
+    expected = [(t0 + i * 0.5, float(i % 50)) for i in range(1000)]
+    for t, v in expected:
+        store.append(TOPIC, t, v)
+    store.update("electrolyser/plant-A/EL1/status", {"status": "TRIPPED", "timestamp": t0})  # not numeric
+    ts, vals = store.range(TOPIC, t0 + 10, t0 + 20)
+    assert list(zip(ts, vals)) == expected[21:41]  # start exclusive, end inclusive
+
+    # unflushed head (last 1000 % 64 samples) is visible before and after close()
+    assert store.latest(TOPIC) == expected[-1]
+    store.close()
+    reopened = TimeSeriesStore(tmp_path, block_size=64)
+    assert reopened.names() == [TOPIC]
+    assert reopened.range(TOPIC, t0 - 1, t0 + 1000) == tuple(map(list, zip(*expected)))
+    for agg in ("mean", "max", "count", "last"):
+        b, v = reopened.downsample(TOPIC, t0 - 1, t0 + 500, 60.0, agg)
+        naive = {}
+        for t, x in expected:
+            naive.setdefault(int((t - (t0 - 1)) // 60.0), []).append(x)
+        want = {"mean": lambda xs: sum(xs) / len(xs), "max": max, "count": len, "last": lambda xs: xs[-1]}[agg]
+        assert v == [want(naive[k]) for k in sorted(naive)], agg
+        assert b[0] == t0 - 1
+
+
+def test_compaction_retention_and_torn_tail(tmp_path):
+    store = TimeSeriesStore(tmp_path, block_size=100, segment_s=100.0, retention_s=150.0)
+    for i in range(400):
+        store.append(TOPIC, 1000.0 + i, float(i))
+        if i % 10 == 9:
+            store.flush()  # small blocks, as written by the flush interval
+    store.flush()
+    assert store.stats()["blocks"] == 40
+    assert store.compact() == 3  # every segment but the active one
+    assert store.stats()["blocks"] == 3 + 10
+    assert store.range(TOPIC)[1] == [float(i) for i in range(400)]
+    assert store.expire(now=1400.0) == 2  # segments ending before t=1250
+    assert store.range(TOPIC)[0][0] == 1200.0
+
+    # a block torn by a crash is cut off on open; the samples before it survive
+    seg = store.series[TOPIC].segment
+    with open(seg, "ab") as f:
+        f.write(b"TSB1\x05\x00")
+    size = os.path.getsize(seg)
+    reopened = TimeSeriesStore(tmp_path)
+    assert os.path.getsize(seg) == size - 6
+    assert reopened.range(TOPIC)[1] == [float(i) for i in range(200, 400)]
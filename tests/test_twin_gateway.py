@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from twin_gateway import PlantState, TwinGateway
+
+
+def reading(el, sensor, value, cell=None):
+    p = {"el": el, "sensor": sensor, "value": value, "timestamp": 0.0}
+    if cell is not None:
+        p["cell"] = cell
+    return p
+
+
+class FakeWs:
+    """Records frames as they are handed to send(); sends block while the gate is closed."""
+
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self, blocked=False):
+        self.frames = []
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+        self.closed = asyncio.Event()
+
+    async def send(self, frame):
+        self.frames.append(frame)
+        await self.gate.wait()
+
+    async def close(self, code=1000, reason=""):
+        self.closed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.closed.wait()
+        raise StopAsyncIteration
+
+    def decoded(self):
+        return [json.loads(f) for f in self.frames]
+
+
+def test_commit_versions_changes_and_derives_stack_voltage():
+    st = PlantState()
+    for c in range(1, 6):
+        st.update("t", reading("EL1", f"cell_{c}_voltage", 2.0, cell=c))
+    st.update("t", reading("EL1", "stack_current", 1.8))
+    st.update("electrolyser/plant-A/EL1/status", {"el": "EL1", "status": "OPERATIONAL"})
+    st.update("t", reading("EL1", "unknown_sensor", 3.0))  # not shown by the twin
+    first = st.commit(1)
+    assert first[("EL1", "voltage")] == 10.0
+    assert first[("EL1", "status")] == "OPERATIONAL"
+    assert len(first) == 8
+
+    st.update("t", reading("EL1", "stack_current", 1.8))  # unchanged value: nothing to send
+    assert st.commit(2) == {}
+    st.update("t", reading("EL1", "cell_3_voltage", 1.5, cell=3))
+    st.update("t", reading("PLANT", "irradiance_1", 800.0))
+    assert st.commit(3) == {("EL1", "cells", "3"): 1.5, ("EL1", "voltage"): 9.5, ("PLANT", "irr1"): 800.0}
+
+    assert set(st.since(1)) == {("EL1", "cells", "3"), ("EL1", "voltage"), ("PLANT", "irr1")}
+    assert st.since(3) == {}
+    assert len(st.since(-1)) == 9
+
+
+async def next_tick(gw):
+    tick = gw.tick
+    while gw.tick == tick:
+        await asyncio.sleep(0.001)
+    for _ in range(3):
+        await asyncio.sleep(0)  # let the sends scheduled by this tick start
+
+
+async def conflation():
+    gw = TwinGateway(ui_rate=50.0)
+    gw.state.update("t", reading("EL1", "stack_current", 1.7))
+    gw.state.commit(0)
+    fast, slow = FakeWs(), FakeWs()
+    handlers = [asyncio.ensure_future(gw.handler(ws)) for ws in (fast, slow)]
+    ticker = asyncio.ensure_future(gw.ticker())
+    await asyncio.sleep(0)
+
+    gw.state.update("t", reading("EL1", "stack_current", 1.8))
+    slow.gate.clear()
+    await next_tick(gw)
+    # both clients were up to date: the same encoded frame goes to each
+    assert fast.frames[1] is slow.frames[1]
+    assert json.loads(fast.frames[1])["changes"] == {"EL1": {"current": 1.8}}
+
+    gw.state.update("t", reading("EL1", "stack_temperature", 46.0))
+    await next_tick(gw)
+    gw.state.update("t", reading("EL1", "cell_3_voltage", 1.9, cell=3))
+    await next_tick(gw)
+    assert len(fast.frames) == 4 and len(slow.frames) == 2
+    view = next(v for v in gw.clients if v.ws is slow)
+    assert view.skipped == 2
+
+    slow.gate.set()
+    await next_tick(gw)
+    # one catch-up delta with everything changed while the client was busy
+    assert len(slow.frames) == 3
+    assert slow.decoded()[2]["changes"] == {"EL1": {"temp": 46.0, "cells": {"3": 1.9}, "voltage": 1.9}}
+    assert len(fast.frames) == 4  # nothing new for the up-to-date client
+
+    assert fast.decoded()[0] == {"type": "snapshot", "tick": 0, "state": {"EL1": {"current": 1.7}}}
+    ticker.cancel()
+    for ws in (fast, slow):
+        await ws.close()
+    await asyncio.gather(*handlers)
+    assert not gw.clients
+
+
+def test_ticker_conflates_busy_clients():
+    asyncio.run(conflation())
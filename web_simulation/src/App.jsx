@@ -9,11 +9,55 @@ const INITIAL_STATE = {
   PLANT: { irr1: 0, irr2: 0 }
 };
 
+// Optional conflating gateway (clients/python/twin_gateway.py), e.g. ws://localhost:8765.
+// When set, the twin receives per-EL snapshots/deltas instead of raw MQTT topics.
+const GATEWAY_URL = import.meta.env.VITE_TWIN_GATEWAY;
+
+// Recursively merge a gateway delta into the current state
+const mergeDelta = (prev, changes) => {
+  const next = { ...prev };
+  for (const [key, value] of Object.entries(changes)) {
+    next[key] = value && typeof value === 'object' && !Array.isArray(value)
+      ? mergeDelta(prev[key] || {}, value)
+      : value;
+  }
+  return next;
+};
+
 function App() {
   const [data, setData] = useState(INITIAL_STATE);
   const [status, setStatus] = useState('CONNECTING');
 
   useEffect(() => {
+    if (GATEWAY_URL) {
+      let ws;
+      let retry;
+      let closed = false;
+      const connect = () => {
+        ws = new WebSocket(GATEWAY_URL);
+        ws.onopen = () => setStatus('CONNECTED');
+        ws.onmessage = (event) => {
+          try {
+            const msg = JSON.parse(event.data);
+            if (msg.type === 'snapshot') setData(mergeDelta(INITIAL_STATE, msg.state));
+            else if (msg.type === 'delta') setData(prev => mergeDelta(prev, msg.changes));
+          } catch (e) {
+            console.error('Parse error', e);
+          }
+        };
+        ws.onclose = () => {
+          setStatus('OFFLINE');
+          if (!closed) retry = setTimeout(connect, 1000);
+        };
+      };
+      connect();
+      return () => {
+        closed = true;
+        clearTimeout(retry);
+        ws.close();
+      };
+    }
+
     // Connect to Mosquitto over WebSockets
     const client = mqtt.connect('ws://localhost:9001', {
       clientId: 'react-twin-' + Math.random().toString(16).substr(2, 8),